@@ -9,7 +9,7 @@ import os
 db = SQLAlchemy()
 migrate = Migrate()
 
-def create_app():
+def create_app(test_config=None):
     # Absolute paths for templates and static files
     template_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'templates'))
     static_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'static'))
@@ -24,9 +24,23 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{database_path}"
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Allow tests and benchmarks to point the app at their own database
+    if test_config:
+        app.config.update(test_config)
+
+    # USDA reference tables get their own read-only bind (see app/usda_db.py)
+    from app.usda_db import configure_usda_bind, init_usda_bind
+    configure_usda_bind(app)
+
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
+    init_usda_bind(app, db)
+
+    # Recipe, store and plan deletes cascade in the database (see app/models.py)
+    from app.database_utils import enable_sqlite_foreign_keys
+    with app.app_context():
+        enable_sqlite_foreign_keys(db.engine)
 
     # Register blueprints
     from app.routes import recipes_routes
@@ -40,6 +54,37 @@ def create_app():
     from app.routes import grocery_routes
     app.register_blueprint(grocery_routes, url_prefix='/grocery')
 
+    # Opt-in per-request profiling (see app/profiler.py)
+    from app.profiler import init_profiler
+    init_profiler(app)
+
+    # `flask import-plan` (see app/plan_import.py)
+    from app import plan_import
+    plan_import.init_app(app)
+
+    # `flask canonicalize-ingredients` (see app/canonical.py)
+    from app import canonical
+    canonical.init_app(app)
+
+    # `flask train-categorizer` (see app/categorizer.py)
+    from app import categorizer
+    categorizer.init_app(app)
+
+    # `flask build-nutrient-matrix` and the mapped matrix (see app/nutrient_matrix.py)
+    from app import nutrient_matrix
+    nutrient_matrix.init_app(app)
+
+    # `flask rebuild-recipe-nutrition` (see app/recipe_nutrition.py)
+    from app import recipe_nutrition
+    recipe_nutrition.init_app(app)
+
+    # `flask rebuild-recipe-signatures` and `flask find-duplicate-recipes` (see app/recipe_duplicates.py)
+    from app import recipe_duplicates
+    recipe_duplicates.init_app(app)
+
+    # `flask refresh-similar-recipes` (see app/similar_recipes.py)
+    from app import similar_recipes
+    similar_recipes.init_app(app)
 
     return app
 
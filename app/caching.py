@@ -0,0 +1,72 @@
+"""
+HTTP conditional request helpers.
+
+Endpoints compute a cheap validator (an ETag and optionally a Last-Modified
+timestamp) from row versions before loading the full payload. When the
+client's If-None-Match / If-Modified-Since headers still match, a bodiless
+304 is returned and the payload is never built.
+"""
+import hashlib
+
+from flask import Response, jsonify, request
+from sqlalchemy import func
+from werkzeug.http import is_resource_modified
+
+from app.models import db, MealSlot, Recipe
+
+
+def make_etag(*parts):
+    """Hash the given version parts into an ETag value."""
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Let browsers keep the body but revalidate on every use
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    """Return a 304 response if the request's validators still match, otherwise None."""
+    if not request.if_none_match and not request.if_modified_since:
+        return None
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return _set_validators(Response(status=304), etag, last_modified)
+
+
+def conditional_json(payload, etag, last_modified=None):
+    """jsonify `payload` and attach the validators."""
+    return _set_validators(jsonify(payload), etag, last_modified)
+
+
+def recipe_listing_version():
+    """(count, latest updated_at) over all recipes, in one query."""
+    return db.session.query(func.count(Recipe.id), func.max(Recipe.updated_at)).one()
+
+
+def plan_version(weekly_plan):
+    """
+    Validator parts for data derived from a weekly plan and its recipes.
+
+    Returns:
+        tuple: (etag, last_modified)
+    """
+    # Deleting a recipe empties its slots without touching the plan, which
+    # only the count of filled slots records
+    slot_count, filled_slots, last_slot_id, recipes_updated = (
+        db.session.query(
+            func.count(MealSlot.id), func.count(MealSlot.recipe_id), func.max(MealSlot.id), func.max(Recipe.updated_at)
+        )
+        .outerjoin(Recipe, Recipe.id == MealSlot.recipe_id)
+        .filter(MealSlot.weekly_plan_id == weekly_plan.id)
+        .one()
+    )
+    plan_updated = weekly_plan.updated_at or weekly_plan.created_at
+    last_modified = max(filter(None, [plan_updated, recipes_updated]), default=None)
+    etag = make_etag('plan', weekly_plan.id, plan_updated, slot_count, filled_slots, last_slot_id, recipes_updated)
+    return etag, last_modified
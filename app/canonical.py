@@ -0,0 +1,192 @@
+"""
+Canonical ingredients.
+
+Every Ingredient row points at a CanonicalIngredient, so "Garlic",
+"garlic" and "Garlic cloves" are one grocery line and aggregation groups
+on an integer id. The normalization below runs when ingredients are saved
+(resolve_canonical_ids), never when lists are read:
+
+    1. lowercase, keep only letters, digits, hyphens and apostrophes
+    2. map whole-name synonyms ("scallions" -> "green onion")
+    3. drop trailing form words ("garlic cloves" -> "garlic")
+    4. singularize the last word ("tomatoes" -> "tomato")
+
+Rows saved before canonical ids existed are given one by the
+backfill_canonical_ids migration. `flask canonicalize-ingredients --all`
+re-resolves every row after the rules above change.
+"""
+import re
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, case, func, insert, or_, update
+
+from app.models import db, CanonicalIngredient, Food, Ingredient
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*")
+
+# Whole-name synonyms, applied before and after singularizing
+SYNONYMS = {
+    "scallion": "green onion",
+    "spring onion": "green onion",
+    "coriander leaf": "cilantro",
+    "garbanzo bean": "chickpea",
+    "confectioners' sugar": "powdered sugar",
+    "confectioners sugar": "powdered sugar",
+    "icing sugar": "powdered sugar",
+    "courgette": "zucchini",
+    "aubergine": "eggplant",
+    "bicarbonate of soda": "baking soda",
+}
+
+# Trailing words that describe how an item is counted rather than what it is
+FORM_WORDS = {"clove", "cloves", "sprig", "sprigs", "stalk", "stalks", "head", "heads", "bunch", "bunches"}
+
+# Words that look plural but are not, or have irregular singulars
+SINGULAR_EXCEPTIONS = {
+    "asparagus": "asparagus", "couscous": "couscous", "hummus": "hummus", "molasses": "molasses",
+    "grits": "grits", "swiss": "swiss", "brussels": "brussels", "leaves": "leaf", "halves": "half",
+}
+
+
+def singularize(word):
+    if word in SINGULAR_EXCEPTIONS:
+        return SINGULAR_EXCEPTIONS[word]
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes', 'sses')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def canonical_key(item_name):
+    """Normalized key shared by every spelling of an ingredient."""
+    words = WORD_PATTERN.findall((item_name or '').lower())
+    if not words:
+        return (item_name or '').strip().lower()
+    phrase = SYNONYMS.get(' '.join(words), ' '.join(words))
+
+    words = phrase.split()
+    while len(words) > 1 and words[-1] in FORM_WORDS:
+        words.pop()
+    words[-1] = singularize(words[-1])
+    phrase = ' '.join(words)
+    return SYNONYMS.get(phrase, phrase)
+
+
+def resolve_canonical_ids(item_names):
+    """
+    Canonical ids for many raw names, creating the missing ones.
+
+    One SELECT finds existing keys and one INSERT ... RETURNING adds the
+    rest; a new canonical ingredient is displayed with the first spelling
+    that created it. It gets its USDA food from the next
+    `flask rebuild-recipe-nutrition` (match_usda_foods), not here.
+
+    Returns:
+        dict: {item_name: canonical_id}
+    """
+    keys = {name: canonical_key(name) for name in dict.fromkeys(item_names) if name}
+    if not keys:
+        return {}
+
+    ids = dict(
+        db.session.query(CanonicalIngredient.key, CanonicalIngredient.id)
+        .filter(CanonicalIngredient.key.in_(set(keys.values())))
+    )
+    missing = {}
+    for name, key in keys.items():
+        if key not in ids:
+            missing.setdefault(key, name.strip()[:100])
+    if missing:
+        ids.update(db.session.execute(
+            insert(CanonicalIngredient).returning(CanonicalIngredient.key, CanonicalIngredient.id),
+            [{'key': key, 'name': name} for key, name in missing.items()]
+        ).all())
+    return {name: ids[key] for name, key in keys.items()}
+
+
+def match_usda_foods(keys):
+    """
+    USDA foods for canonical keys, in one query.
+
+    A food matches when the first comma-separated part of its description
+    has the same canonical key ("Tomatoes, red, raw" for "tomato"); the
+    shortest such description wins, as USDA lists the plainest form first.
+    No index serves lower(description) LIKE, so this scans the food table;
+    it runs from the rebuild command, never while saving a recipe.
+
+    Returns:
+        dict: {key: fdc_id} for the keys that matched.
+    """
+    keys = set(keys)
+    # Prefixes of the first word, short enough to survive singularizing ("berr" for "berries")
+    words = {key.split()[0] for key in keys if key}
+    prefixes = {word[:max(3, len(word) - 1)] for word in words if WORD_PATTERN.fullmatch(word)}
+    if not prefixes:
+        return {}
+    description = func.lower(Food.description)
+    candidates = db.session.query(Food.fdc_id, Food.description).filter(
+        or_(*[description.like(f"{prefix}%") for prefix in sorted(prefixes)])
+    )
+
+    best = {}
+    for fdc_id, text in candidates:
+        key = canonical_key(text.split(',')[0])
+        if key in keys and (key not in best or (len(text), fdc_id) < best[key]):
+            best[key] = (len(text), fdc_id)
+    return {key: fdc_id for key, (_, fdc_id) in best.items()}
+
+
+def grocery_item_group():
+    """
+    GROUP BY columns for one grocery line: the canonical id, or the raw
+    name for the few rows without one (ingredients with an empty name).
+    """
+    return Ingredient.canonical_id, case((Ingredient.canonical_id.is_(None), Ingredient.item_name))
+
+
+def grocery_item_name():
+    """Display name of a grocery line; needs an outer join to CanonicalIngredient."""
+    return func.coalesce(func.min(CanonicalIngredient.name), func.min(Ingredient.item_name))
+
+
+@click.command('canonicalize-ingredients')
+@click.option('--all', 'everything', is_flag=True, help="Re-resolve every ingredient, e.g. after changing the rules.")
+@with_appcontext
+def canonicalize_ingredients_command(everything):
+    """Set canonical ids on ingredients saved without one."""
+    query = db.session.query(Ingredient.item_name).distinct()
+    if not everything:
+        query = query.filter(Ingredient.canonical_id.is_(None))
+    names = [name for (name,) in query]
+    canonical_ids = resolve_canonical_ids(names)
+
+    ingredient = Ingredient.__table__
+    statement = update(ingredient).where(ingredient.c.item_name == bindparam('raw_name'))
+    if not everything:
+        statement = statement.where(ingredient.c.canonical_id.is_(None))
+    if canonical_ids:
+        db.session.execute(
+            statement.values(canonical_id=bindparam('new_canonical_id')),
+            [{'raw_name': name, 'new_canonical_id': canonical_id} for name, canonical_id in canonical_ids.items()]
+        )
+    # Canonical ids feed grocery aggregation and section assignment, so every
+    # stored or in-memory copy derived from them is rebuilt
+    from app.plan_aggregates import invalidate_plan_aggregates
+    from app.recipe_catalogue import record_recipe_changes
+    from app.store_layouts import invalidate_store_layouts
+    from app.typeahead import invalidate_typeahead
+    record_recipe_changes()
+    invalidate_plan_aggregates(all_plans=True)
+    db.session.commit()
+    invalidate_store_layouts()
+    invalidate_typeahead()
+    click.echo(f"Resolved {len(canonical_ids)} ingredient names to {len(set(canonical_ids.values()))} canonical ingredients")
+
+
+def init_app(app):
+    """Register the canonicalize-ingredients command."""
+    app.cli.add_command(canonicalize_ingredients_command)
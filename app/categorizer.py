@@ -0,0 +1,201 @@
+"""
+Naive Bayes ingredient categorizer.
+
+Predicts the store section of ingredient names the store has no assignment
+for. Features are the words of the normalized name plus the character
+trigrams of each word, so plurals and spelling variants ("tomatoes",
+"cherry tomato") share evidence. The model is trained from the labeled
+`category` column of ingredient_parsing_data.csv and from existing
+IngredientSection assignments (by section name), and predicts a whole list
+with one matrix product.
+
+Retrain and save with:
+    flask --app run train-categorizer [--csv path]
+
+The saved model (CATEGORIZER_MODEL_PATH, default instance/categorizer.npz)
+is loaded on first use; without one, a model is trained in memory.
+"""
+import csv
+import logging
+import os
+import re
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.models import db, Ingredient, IngredientSection, Section
+from app.store_layouts import normalize_item_name
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+def features(item_name):
+    """Word and character trigram features of an ingredient name."""
+    tokens = []
+    for word in WORD_PATTERN.findall(normalize_item_name(item_name)):
+        tokens.append(f"w:{word}")
+        padded = f" {word} "
+        tokens.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return tokens
+
+
+class NaiveBayesCategorizer:
+    """Multinomial naive Bayes over name features with Laplace smoothing."""
+
+    def __init__(self, classes, vocabulary, log_prior, log_likelihood):
+        self.classes = list(classes)
+        self.vocabulary = {feature: index for index, feature in enumerate(vocabulary)}
+        self.log_prior = log_prior
+        self.log_likelihood = log_likelihood  # (classes, features)
+
+    @classmethod
+    def train(cls, examples, alpha=1.0):
+        """
+        Fit the model.
+
+        Args:
+            examples (iterable[tuple]): (item_name, section_name) pairs.
+        """
+        examples = [(name, label) for name, label in examples if name and label]
+        if not examples:
+            raise ValueError("No training examples")
+
+        classes = sorted({label for _, label in examples})
+        class_index = {label: index for index, label in enumerate(classes)}
+        vocabulary = sorted({feature for name, _ in examples for feature in features(name)})
+        feature_index = {feature: index for index, feature in enumerate(vocabulary)}
+
+        counts = np.zeros((len(classes), len(vocabulary)))
+        class_counts = np.zeros(len(classes))
+        for name, label in examples:
+            row = class_index[label]
+            class_counts[row] += 1
+            for feature in features(name):
+                counts[row, feature_index[feature]] += 1
+
+        log_prior = np.log(class_counts / class_counts.sum())
+        smoothed = counts + alpha
+        log_likelihood = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+        return cls(classes, vocabulary, log_prior, log_likelihood)
+
+    def _matrix(self, item_names):
+        rows, columns = [], []
+        for row, name in enumerate(item_names):
+            for feature in features(name):
+                column = self.vocabulary.get(feature)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+        matrix = np.zeros((len(item_names), len(self.vocabulary)))
+        np.add.at(matrix, (rows, columns), 1)
+        return matrix
+
+    def predict(self, item_names):
+        """
+        Predict sections for many names in one batch.
+
+        Returns:
+            list[tuple]: (section_name, confidence) per name, where confidence
+                is the posterior probability of the predicted section.
+        """
+        item_names = list(item_names)
+        if not item_names:
+            return []
+        matrix = self._matrix(item_names)
+        # Trigrams of one word are far from independent; dividing by the square
+        # root of the feature count keeps confidences from all rounding to 1.
+        feature_counts = np.maximum(matrix.sum(axis=1, keepdims=True), 1)
+        scores = (matrix @ self.log_likelihood.T) / np.sqrt(feature_counts) + self.log_prior
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return [
+            (self.classes[index], float(probabilities[row, index]))
+            for row, index in enumerate(best)
+        ]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f, classes=np.array(self.classes), vocabulary=np.array(vocabulary),
+                log_prior=self.log_prior, log_likelihood=self.log_likelihood
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data['classes'].tolist(), data['vocabulary'].tolist(),
+                data['log_prior'], data['log_likelihood']
+            )
+
+
+def training_examples(csv_path):
+    """(item_name, section_name) pairs from the labeled CSV and the database."""
+    examples = []
+    if csv_path and os.path.exists(csv_path):
+        with open(csv_path, encoding='utf-8-sig', newline='') as f:
+            examples.extend((row['name'], row['category']) for row in csv.DictReader(f))
+    else:
+        logger.warning(f"Categorizer training file not found: {csv_path}")
+
+    examples.extend(
+        db.session.query(Ingredient.item_name, Section.name)
+        .join(IngredientSection, IngredientSection.ingredient_id == Ingredient.id)
+        .join(Section, Section.id == IngredientSection.section_id)
+        .all()
+    )
+    return examples
+
+
+def _config(app):
+    app.config.setdefault(
+        'CATEGORIZER_TRAINING_CSV', os.path.join(os.path.dirname(app.root_path), 'ingredient_parsing_data.csv')
+    )
+    app.config.setdefault('CATEGORIZER_MODEL_PATH', os.path.join(app.instance_path, 'categorizer.npz'))
+    return app.config
+
+
+def get_categorizer():
+    """The app's categorizer, loaded from disk or trained on first use."""
+    categorizer = current_app.extensions.get('categorizer')
+    if categorizer is None:
+        config = _config(current_app)
+        if os.path.exists(config['CATEGORIZER_MODEL_PATH']):
+            categorizer = NaiveBayesCategorizer.load(config['CATEGORIZER_MODEL_PATH'])
+        else:
+            categorizer = NaiveBayesCategorizer.train(training_examples(config['CATEGORIZER_TRAINING_CSV']))
+        current_app.extensions['categorizer'] = categorizer
+    return categorizer
+
+
+@click.command('train-categorizer')
+@click.option('--csv', 'csv_path', help="Labeled CSV (defaults to ingredient_parsing_data.csv).")
+@with_appcontext
+def train_categorizer_command(csv_path):
+    """Retrain the ingredient categorizer and save it."""
+    config = _config(current_app)
+    examples = training_examples(csv_path or config['CATEGORIZER_TRAINING_CSV'])
+    try:
+        categorizer = NaiveBayesCategorizer.train(examples)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    categorizer.save(config['CATEGORIZER_MODEL_PATH'])
+    current_app.extensions['categorizer'] = categorizer
+    click.echo(
+        f"Trained on {len(examples)} examples ({len(categorizer.classes)} sections, "
+        f"{len(categorizer.vocabulary)} features); saved to {config['CATEGORIZER_MODEL_PATH']}"
+    )
+
+
+def init_app(app):
+    """Register the train-categorizer command."""
+    _config(app)
+    app.cli.add_command(train_categorizer_command)
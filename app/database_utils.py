@@ -1,4 +1,23 @@
-from app.models import db, Recipe, Ingredient
+from collections import defaultdict
+from sqlalchemy import Float, case, cast, event, func, insert, literal, select, tuple_, update
+from app.canonical import grocery_item_group, grocery_item_name
+from app.models import db, CanonicalIngredient, Recipe, Ingredient, IngredientSection, MealSlot, Section
+
+def enable_sqlite_foreign_keys(engine):
+    """
+    Turn on foreign key enforcement for every new connection of a SQLite
+    engine. SQLite ignores foreign keys, including their ON DELETE actions,
+    unless each connection asks for them.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _enable_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys = ON")
+        cursor.close()
+
 
 def add_recipe_to_database(name, instructions, ingredients):
     """
@@ -26,3 +45,307 @@ def add_recipe_to_database(name, instructions, ingredients):
         db.session.rollback()
         print(f"Error adding recipe: {e}")
         raise
+
+
+def servings_factor(slot_servings, recipe_servings):
+    """Scale factor for cooking `slot_servings` of a recipe written for `recipe_servings`."""
+    if slot_servings and recipe_servings:
+        return float(slot_servings) / recipe_servings
+    return 1.0
+
+
+def sum_plan_ingredients(weekly_plan_id):
+    """
+    Sum a weekly plan's ingredients by (canonical ingredient, unit) in a single query.
+
+    Recipes used in several meal slots are counted once per slot, and each
+    slot scales its recipe by slot servings / recipe servings inside the SUM.
+    Missing units are reported as "unitless" and missing quantities as 0.
+
+    Returns:
+        dict: {(item_name, unit): quantity} ordered by the first meal slot using each item.
+    """
+    unit = func.coalesce(func.nullif(Ingredient.unit, ''), 'unitless')
+    factor = func.coalesce(cast(MealSlot.servings, Float) / func.nullif(Recipe.servings, 0), 1.0)
+    rows = (
+        db.session.query(grocery_item_name(), unit, func.sum(func.coalesce(Ingredient.quantity, 0) * factor))
+        .join(MealSlot, MealSlot.recipe_id == Ingredient.recipe_id)
+        .join(Recipe, Recipe.id == Ingredient.recipe_id)
+        .outerjoin(CanonicalIngredient, CanonicalIngredient.id == Ingredient.canonical_id)
+        .filter(MealSlot.weekly_plan_id == weekly_plan_id)
+        .group_by(*grocery_item_group(), unit)
+        .order_by(func.min(MealSlot.id), func.min(Ingredient.id))
+        .all()
+    )
+    return {(name, unit): quantity for name, unit, quantity in rows}
+
+
+def iter_plan_grocery_rows(weekly_plan_id, store_id=None, batch_size=500):
+    """
+    Stream a plan's aggregated grocery list grouped by store section.
+
+    Same totals as sum_plan_ingredients, but rows are fetched from the cursor
+    in batches instead of being loaded at once. Each item is placed in the
+    store section of the lowest-numbered IngredientSection assignment of any
+    ingredient with the same canonical id; items without one come last with a
+    section of None.
+
+    Yields:
+        tuple: (section_name, item_name, unit, quantity) ordered by section
+            order, then by the first meal slot using each item.
+    """
+    unit = func.coalesce(func.nullif(Ingredient.unit, ''), 'unitless')
+    factor = func.coalesce(cast(MealSlot.servings, Float) / func.nullif(Recipe.servings, 0), 1.0)
+    item_sections = (
+        select(Ingredient.canonical_id, func.min(Section.id).label('section_id'))
+        .join(IngredientSection, IngredientSection.ingredient_id == Ingredient.id)
+        .join(Section, Section.id == IngredientSection.section_id)
+        .where(Section.store_id == store_id, Ingredient.canonical_id.isnot(None))
+        .group_by(Ingredient.canonical_id)
+        .subquery()
+    )
+    statement = (
+        select(Section.name, grocery_item_name(), unit, func.sum(func.coalesce(Ingredient.quantity, 0) * factor))
+        .join(MealSlot, MealSlot.recipe_id == Ingredient.recipe_id)
+        .join(Recipe, Recipe.id == Ingredient.recipe_id)
+        .outerjoin(CanonicalIngredient, CanonicalIngredient.id == Ingredient.canonical_id)
+        .outerjoin(item_sections, item_sections.c.canonical_id == Ingredient.canonical_id)
+        .outerjoin(Section, Section.id == item_sections.c.section_id)
+        .where(MealSlot.weekly_plan_id == weekly_plan_id)
+        .group_by(Section.id, *grocery_item_group(), unit)
+        .order_by(Section.id.is_(None), Section.order, Section.id, func.min(MealSlot.id), func.min(Ingredient.id))
+    )
+    for row in db.session.execute(statement.execution_options(yield_per=batch_size)):
+        yield tuple(row)
+
+
+def planned_meals(meals):
+    """
+    (recipe_id, servings) for every meal that has a recipe.
+
+    Raises:
+        ValueError: If a recipe ID or servings value is not numeric.
+    """
+    return [
+        (int(meal['recipe_id']), float(meal['servings']) if meal.get('servings') else None)
+        for meal in meals if meal.get('recipe_id')
+    ]
+
+
+def meal_multipliers(planned, recipe_servings):
+    """
+    Collapse planned meals into one multiplier per recipe.
+
+    Args:
+        planned (list[tuple]): (recipe_id, servings) pairs from planned_meals.
+        recipe_servings (dict): {recipe_id: servings}; recipes missing from it are skipped.
+
+    Returns:
+        tuple: ({recipe_id: multiplier}, {recipe_id: position of its first meal})
+    """
+    multipliers, first_meal = defaultdict(float), {}
+    for position, (recipe_id, servings) in enumerate(planned):
+        if recipe_id not in recipe_servings:
+            continue
+        multipliers[recipe_id] += servings_factor(servings, recipe_servings[recipe_id])
+        first_meal.setdefault(recipe_id, position)
+    return multipliers, first_meal
+
+
+def sum_meal_ingredients(meals):
+    """
+    Sum the ingredients of an unsaved list of meals.
+
+    Meals are collapsed into one multiplier per recipe (number of meals,
+    scaled by each meal's optional 'servings'), which is applied inside a
+    single SUM ... GROUP BY over the recipes' ingredients. Ingredients
+    without a name, quantity or unit are skipped.
+
+    Args:
+        meals (list[dict]): Meal dictionaries with an optional 'recipe_id' and 'servings'.
+
+    Returns:
+        dict: {(item_name, unit): quantity} ordered by the first meal using each item.
+
+    Raises:
+        ValueError: If a recipe ID or servings value is not numeric.
+    """
+    planned = planned_meals(meals)
+    if not planned:
+        return {}
+
+    recipe_servings = dict(
+        db.session.query(Recipe.id, Recipe.servings).filter(Recipe.id.in_({recipe_id for recipe_id, _ in planned}))
+    )
+    multipliers, first_meal = meal_multipliers(planned, recipe_servings)
+    if not multipliers:
+        return {}
+
+    rows = (
+        db.session.query(
+            grocery_item_name(), Ingredient.unit,
+            func.sum(Ingredient.quantity * case(multipliers, value=Ingredient.recipe_id))
+        )
+        .outerjoin(CanonicalIngredient, CanonicalIngredient.id == Ingredient.canonical_id)
+        .filter(
+            Ingredient.recipe_id.in_(multipliers.keys()),
+            Ingredient.item_name != '', Ingredient.quantity.isnot(None), Ingredient.unit != ''
+        )
+        .group_by(*grocery_item_group(), Ingredient.unit)
+        .order_by(func.min(case(first_meal, value=Ingredient.recipe_id)), func.min(Ingredient.id))
+        .all()
+    )
+    return {(name, unit): quantity for name, unit, quantity in rows}
+
+
+RECIPE_FIELDS = ('name', 'cook_time', 'servings', 'instructions', 'ingredients')
+
+
+def fetch_recipes(recipe_ids, fields=RECIPE_FIELDS):
+    """
+    Load many recipes with one IN query for recipes and one for ingredients.
+
+    Args:
+        recipe_ids (list[int]): Recipe IDs, in the order they should be returned.
+        fields (iterable[str]): Subset of RECIPE_FIELDS to include; 'id' is always included.
+            Ingredients are only queried when 'ingredients' is requested.
+
+    Returns:
+        tuple: (list of recipe dicts, list of IDs that were not found)
+    """
+    columns = [field for field in RECIPE_FIELDS if field in fields and field != 'ingredients']
+    rows = (
+        db.session.query(Recipe.id, *[getattr(Recipe, column) for column in columns])
+        .filter(Recipe.id.in_(set(recipe_ids)))
+        .all()
+    )
+    recipes = {row[0]: {'id': row[0], **dict(zip(columns, row[1:]))} for row in rows}
+
+    if 'ingredients' in fields and recipes:
+        for recipe in recipes.values():
+            recipe['ingredients'] = []
+        ingredients = (
+            Ingredient.query
+            .filter(Ingredient.recipe_id.in_(recipes.keys()))
+            .order_by(Ingredient.recipe_id, Ingredient.id)
+        )
+        for ingredient in ingredients:
+            recipes[ingredient.recipe_id]['ingredients'].append(ingredient.to_dict())
+
+    found = [recipes[recipe_id] for recipe_id in dict.fromkeys(recipe_ids) if recipe_id in recipes]
+    missing = [recipe_id for recipe_id in dict.fromkeys(recipe_ids) if recipe_id not in recipes]
+    return found, missing
+
+
+def parse_plan_meals(meals):
+    """
+    Index meal slot payloads by (day, meal_type).
+
+    Returns:
+        dict: {(day, meal_type): {'recipe_id': ..., 'servings': ...}}
+
+    Raises:
+        ValueError: If a slot is malformed or a (day, meal_type) pair repeats.
+    """
+    slots = {}
+    for meal in meals:
+        try:
+            key = (meal['day'], meal['meal_type'])
+            values = {
+                'recipe_id': int(meal['recipe_id']) if meal.get('recipe_id') else None,
+                'servings': int(meal['servings']) if meal.get('servings') else None,
+            }
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Invalid meal slot: {meal}")
+        if key in slots:
+            raise ValueError(f"Duplicate meal slot: {key[0]} {key[1]}")
+        slots[key] = values
+    return slots
+
+
+def save_plan_slots(weekly_plan_id, slots, is_new=False):
+    """
+    Make a plan's meal slots match `slots` (as returned by parse_plan_meals).
+
+    Existing slots are matched by (day, meal_type); inserts, updates and
+    deletes are each sent as a single statement.
+
+    Returns:
+        dict: Number of slots inserted, updated and deleted.
+    """
+    existing = {}
+    if not is_new:
+        existing = {
+            (day, meal_type): (slot_id, recipe_id, servings)
+            for slot_id, day, meal_type, recipe_id, servings in db.session.query(
+                MealSlot.id, MealSlot.day, MealSlot.meal_type, MealSlot.recipe_id, MealSlot.servings
+            ).filter(MealSlot.weekly_plan_id == weekly_plan_id)
+        }
+
+    new_rows, updated_rows = [], []
+    for (day, meal_type), values in slots.items():
+        if (day, meal_type) not in existing:
+            new_rows.append({'weekly_plan_id': weekly_plan_id, 'day': day, 'meal_type': meal_type, **values})
+            continue
+        slot_id, recipe_id, servings = existing[(day, meal_type)]
+        if (recipe_id, servings) != (values['recipe_id'], values['servings']):
+            updated_rows.append({'id': slot_id, **values})
+    stale_ids = [existing[key][0] for key in set(existing) - set(slots)]
+
+    if updated_rows:
+        db.session.execute(update(MealSlot), updated_rows)
+    if stale_ids:
+        MealSlot.query.filter(MealSlot.id.in_(stale_ids)).delete(synchronize_session=False)
+    if new_rows:
+        db.session.execute(
+            insert(MealSlot).execution_options(render_nulls=True),  # Keep empty slots in the same batch
+            new_rows
+        )
+    return {'inserted': len(new_rows), 'updated': len(updated_rows), 'deleted': len(stale_ids)}
+
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def shifted_day(day_column, day_shift):
+    """
+    SQL expression moving weekday names `day_shift` days forward.
+
+    Capitalized and lowercase names are shifted; any other value is kept as is.
+    """
+    if day_shift % len(DAYS_OF_WEEK) == 0:
+        return day_column
+    mapping = {}
+    for index, day in enumerate(DAYS_OF_WEEK):
+        target = DAYS_OF_WEEK[(index + day_shift) % len(DAYS_OF_WEEK)]
+        mapping[day] = target
+        mapping[day.lower()] = target.lower()
+    return case(mapping, value=day_column, else_=day_column)
+
+
+def copy_plan_slots(source_plan_id, target_plan_id, day_shift=0, overrides=None):
+    """
+    Copy one plan's meal slots into another with a single INSERT ... SELECT.
+
+    Args:
+        day_shift (int): Days to move every copied slot forward (wrapping around the week).
+        overrides (dict): {(day, meal_type): {'recipe_id': ..., 'servings': ...}} slots,
+            keyed by their day in the copy, that replace copied slots or are added.
+    """
+    overrides = overrides or {}
+    day = shifted_day(MealSlot.day, day_shift)
+    columns = ['weekly_plan_id', 'day', 'meal_type', 'recipe_id', 'servings']
+
+    source = (
+        select(literal(target_plan_id), day, MealSlot.meal_type, MealSlot.recipe_id, MealSlot.servings)
+        .where(MealSlot.weekly_plan_id == source_plan_id)
+    )
+    if overrides:
+        source = source.where(tuple_(day, MealSlot.meal_type).not_in(list(overrides)))
+    db.session.execute(insert(MealSlot).from_select(columns, source))
+
+    if overrides:
+        db.session.execute(insert(MealSlot).execution_options(render_nulls=True), [
+            {'weekly_plan_id': target_plan_id, 'day': day_name, 'meal_type': meal_type, **values}
+            for (day_name, meal_type), values in overrides.items()
+        ])
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from app import db
 from datetime import datetime
+from app.usda_db import USDA_BIND
 
 
 db = SQLAlchemy()
@@ -11,8 +12,13 @@ class Recipe(db.Model):
     cook_time = db.Column(db.Integer, nullable=True)
     servings = db.Column(db.Integer, nullable=True)
     instructions = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Bumped on every save
     ingredients = db.relationship(
-        'Ingredient', backref='recipe', lazy=True, cascade="all, delete-orphan"
+        'Ingredient', backref='recipe', lazy=True, cascade="all, delete-orphan", passive_deletes=True
+    )
+
+    __table_args__ = (
+        db.Index('ix_recipe_name_lower', db.func.lower(name)),  # Case-insensitive name lookups
     )
 
     def to_dict(self):
@@ -26,14 +32,34 @@ class Recipe(db.Model):
         }
 
 
+class RecipeChange(db.Model):
+    """Append-only log of recipe writes; its id is the change counter read by app/recipe_catalogue.py."""
+    __tablename__ = 'recipe_change'
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipe_id = db.Column(db.Integer, nullable=True)  # NULL when every recipe may have changed
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 from fractions import Fraction
 
+class CanonicalIngredient(db.Model):
+    """One shopping item shared by every spelling of it (see app/canonical.py)."""
+    __tablename__ = 'canonical_ingredient'
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(100), nullable=False, unique=True)  # Normalized name
+    name = db.Column(db.String(100), nullable=False)  # Display name: the first spelling saved
+    fdc_id = db.Column(db.Integer, nullable=True)  # Matched USDA Food (another database, so no foreign key)
+
+
 class Ingredient(db.Model):
     __tablename__ = 'ingredient'
 
     id = db.Column(db.Integer, primary_key=True)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), nullable=False, index=True)
     item_name = db.Column(db.String(100), nullable=False)
+    canonical_id = db.Column(db.Integer, db.ForeignKey('canonical_ingredient.id'), nullable=True, index=True)  # Set on save
     quantity = db.Column(db.Float, nullable=True)  # Allows NULL values
     original_quantity = db.Column(db.String(50), nullable=True)  # Stores the original input
     unit = db.Column(db.String(50), nullable=True)
@@ -41,12 +67,17 @@ class Ingredient(db.Model):
     descriptor = db.Column(db.String(100), nullable=True)
     additional_descriptor = db.Column(db.String(100), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_ingredient_normalized_name', db.func.lower(db.func.trim(item_name))),  # Name-based section assignment
+    )
+
     def to_dict(self):
         """Convert the Ingredient object into a dictionary."""
         return {
         'id': self.id,
         'recipe_id': self.recipe_id,
         'item_name': self.item_name,
+        'canonical_id': self.canonical_id,
         'quantity': self.original_quantity,
         'unit': self.unit,
         'size': self.size,
@@ -55,16 +86,40 @@ class Ingredient(db.Model):
     }
 class Food(db.Model):
     __tablename__ = 'food'
+    __bind_key__ = USDA_BIND
 
     fdc_id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(255), nullable=False)
 
 class MeasureUnit(db.Model):
     __tablename__ = 'measure_unit'
+    __bind_key__ = USDA_BIND
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
 
+class FoodPortion(db.Model):
+    """USDA gram weights of household measures ("1 cup", "1 medium") of a food."""
+    __tablename__ = 'food_portion'
+    __bind_key__ = USDA_BIND
+
+    id = db.Column(db.Integer, primary_key=True)
+    fdc_id = db.Column(db.Integer, nullable=False)
+    amount = db.Column(db.Float, nullable=True)  # Number of measure units weighing gram_weight
+    measure_unit_id = db.Column(db.Integer, nullable=False)
+    gram_weight = db.Column(db.Float, nullable=True)
+
+class Nutrient(db.Model):
+    """USDA nutrient amounts in long format: one row per (food, nutrient)."""
+    __tablename__ = 'nutrient'
+    __bind_key__ = USDA_BIND
+
+    nutrient_id = db.Column(db.Integer, primary_key=True)
+    food_id = db.Column(db.Integer, nullable=False)  # Food.fdc_id
+    name = db.Column(db.Text, nullable=False)
+    unit_name = db.Column(db.String(20), nullable=False)  # USDA unit, e.g. "KCAL", "kJ", "G"
+    amount_per_100g = db.Column(db.Float, nullable=True)
+
 class WeeklyPlan(db.Model):
     __tablename__ = 'weekly_plan'
 
@@ -72,27 +127,34 @@ class WeeklyPlan(db.Model):
     name = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
-    meals = db.relationship('MealSlot', backref='weekly_plan', lazy=True, cascade="all, delete-orphan")
+    is_template = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # Reusable starting point, hidden from the plan list
+    meals = db.relationship(
+        'MealSlot', backref='weekly_plan', lazy=True, cascade="all, delete-orphan", passive_deletes=True
+    )
 
     @property
     def ingredient_count(self):
-        ingredients = set()
-        for meal in self.meals:
-            if meal.recipe_id:
-                recipe = Recipe.query.get(meal.recipe_id)
-                if recipe:
-                    for ingredient in recipe.ingredients:
-                        ingredients.add(ingredient.item_name)
-        return len(ingredients)
+        """Number of distinct ingredient names across the plan's recipes."""
+        return (
+            db.session.query(db.func.count(db.distinct(Ingredient.item_name)))
+            .join(MealSlot, MealSlot.recipe_id == Ingredient.recipe_id)
+            .filter(MealSlot.weekly_plan_id == self.id)
+            .scalar()
+        )
 
 class MealSlot(db.Model):
     __tablename__ = 'meal_slot'
 
     id = db.Column(db.Integer, primary_key=True)
-    weekly_plan_id = db.Column(db.Integer, db.ForeignKey('weekly_plan.id'), nullable=False)
+    weekly_plan_id = db.Column(
+        db.Integer, db.ForeignKey('weekly_plan.id', ondelete='CASCADE'), nullable=False, index=True
+    )
     day = db.Column(db.String(20), nullable=False)
     meal_type = db.Column(db.String(20), nullable=False)  # e.g., "breakfast", "lunch", "dinner"
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), nullable=True)
+    recipe_id = db.Column(
+        db.Integer, db.ForeignKey('recipe.id', ondelete='SET NULL'), nullable=True, index=True
+    )  # Emptied when the recipe is deleted
+    servings = db.Column(db.Integer, nullable=True)  # Overrides the recipe's servings when set
 
     def to_dict(self):
         return {
@@ -100,15 +162,106 @@ class MealSlot(db.Model):
             'day': self.day,
             'meal_type': self.meal_type,
             'recipe_id': self.recipe_id,
+            'servings': self.servings,
         }
     
+class RecipeNutrition(db.Model):
+    """Per-serving nutrient totals of a recipe, recomputed when it is saved (see app/recipe_nutrition.py)."""
+    __tablename__ = 'recipe_nutrition'
+
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), primary_key=True)
+    calories = db.Column(db.Float, nullable=False, index=True)  # kcal
+    protein = db.Column(db.Float, nullable=False, index=True)  # g
+    fat = db.Column(db.Float, nullable=False, index=True)  # g
+    carbohydrate = db.Column(db.Float, nullable=False, index=True)  # g
+    matched_ingredients = db.Column(db.Integer, nullable=False)  # Ingredients with a USDA food and a gram weight
+    ingredient_count = db.Column(db.Integer, nullable=False)
+
+class RecipeSignature(db.Model):
+    """MinHash signature of a recipe's ingredients and title, recomputed when it is saved (see app/recipe_duplicates.py)."""
+    __tablename__ = 'recipe_signature'
+
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)  # NUM_PERM little-endian uint32 values
+
+class RecipeSignatureBand(db.Model):
+    """LSH bucket of one band of a recipe's signature; recipes sharing a bucket are duplicate candidates."""
+    __tablename__ = 'recipe_signature_band'
+    __table_args__ = (db.Index('ix_recipe_signature_band_bucket', 'band', 'bucket'),)
+
+    recipe_id = db.Column(
+        db.Integer, db.ForeignKey('recipe_signature.recipe_id', ondelete='CASCADE'), primary_key=True
+    )
+    band = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.BigInteger, nullable=False)
+
+class RecipeNeighbor(db.Model):
+    """One of a recipe's most similar recipes by shared ingredients (see app/similar_recipes.py)."""
+    __tablename__ = 'recipe_neighbor'
+
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)  # 0 is the most similar
+    # No foreign key: rows naming a deleted recipe tell the next refresh which lists to recompute
+    neighbor_id = db.Column(db.Integer, nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+
+class RecipeNeighborRefresh(db.Model):
+    """Log of recipe_neighbor refreshes; the latest one's change_id is where the next one starts."""
+    __tablename__ = 'recipe_neighbor_refresh'
+
+    id = db.Column(db.Integer, primary_key=True)
+    change_id = db.Column(db.Integer, nullable=False)  # Last recipe_change covered
+    k = db.Column(db.Integer, nullable=False)
+    metric = db.Column(db.String(20), nullable=False)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PlanGroceryItem(db.Model):
+    """Stored grocery list aggregate for a weekly plan, maintained by meal slot edits."""
+    __tablename__ = 'plan_grocery_item'
+    __table_args__ = (db.UniqueConstraint('weekly_plan_id', 'item_name', 'unit'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    weekly_plan_id = db.Column(
+        db.Integer, db.ForeignKey('weekly_plan.id', ondelete='CASCADE'), nullable=False, index=True
+    )
+    item_name = db.Column(db.String(100), nullable=False)
+    unit = db.Column(db.String(50), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    occurrences = db.Column(db.Integer, nullable=False)  # Ingredient rows contributing; the item is dropped at 0
+
+    def to_dict(self):
+        return {
+            'item_name': self.item_name,
+            'unit': self.unit,
+            'quantity': round(self.quantity, 2),
+        }
+
+class StoreChange(db.Model):
+    """Append-only log of store, section and assignment writes; its id is the change counter read by app/store_layouts.py."""
+    __tablename__ = 'store_change'
+
+    id = db.Column(db.Integer, primary_key=True)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class Store(db.Model):
     __tablename__ = 'store'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     is_default = db.Column(db.Boolean, default=False)
-    sections = db.relationship('Section', backref='store', cascade='all, delete-orphan', lazy=True)
+    sections = db.relationship(
+        'Section', backref='store', cascade='all, delete-orphan', lazy=True, order_by='Section.order',
+        passive_deletes=True
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'is_default': bool(self.is_default),
+            'sections': [section.to_dict() for section in self.sections],
+        }
 
 
 class Section(db.Model):
@@ -116,18 +269,33 @@ class Section(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     order = db.Column(db.Integer, nullable=False)  # For custom ordering
-    store_id = db.Column(db.Integer, db.ForeignKey('store.id'), nullable=False)
+    store_id = db.Column(db.Integer, db.ForeignKey('store.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'order': self.order,
+        }
 
 
 class IngredientSection(db.Model):
     __tablename__ = 'ingredient_section'
     id = db.Column(db.Integer, primary_key=True)
-    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredient.id'), nullable=False)  # Use 'ingredient'
-    section_id = db.Column(db.Integer, db.ForeignKey('section.id'), nullable=False)  # Already correct
+    ingredient_id = db.Column(
+        db.Integer, db.ForeignKey('ingredient.id', ondelete='CASCADE'), nullable=False, index=True
+    )  # Use 'ingredient'
+    section_id = db.Column(
+        db.Integer, db.ForeignKey('section.id', ondelete='CASCADE'), nullable=False, index=True
+    )  # Already correct
 
-    # Define the relationship
-    section = db.relationship('Section', backref='ingredient_sections', lazy=True)
-    ingredient = db.relationship('Ingredient', backref='ingredient_sections', lazy=True)
+    # Define the relationship; rows go away with their ingredient or section in the database
+    section = db.relationship(
+        'Section', backref=db.backref('ingredient_sections', passive_deletes=True), lazy=True
+    )
+    ingredient = db.relationship(
+        'Ingredient', backref=db.backref('ingredient_sections', passive_deletes=True), lazy=True
+    )
 
 
 
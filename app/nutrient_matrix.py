@@ -0,0 +1,223 @@
+"""
+Memory-mapped foods x nutrients matrix.
+
+The USDA `nutrient` table is long format (food_id, name, unit_name,
+amount_per_100g), so reading all nutrients of a few foods means pivoting
+rows on every request. A build step pivots it once into three .npy files:
+
+    values.npy     float32 [foods, nutrients] amounts per 100 g, NaN where USDA has no value
+    food_ids.npy   int64 [foods], sorted; row i holds food_ids[i]
+    nutrients.npy  str [nutrients, 2]; column j holds nutrients[j] as (name, unit)
+
+Columns are keyed by name and unit, as USDA lists some nutrients, such as
+Energy in KCAL and in kJ, under one name.
+
+Each worker maps values.npy read-only (np.load(mmap_mode='r')) when the app
+starts, so all workers share the OS page cache instead of holding copies,
+and a lookup is a binary search over food_ids plus row slicing.
+
+Rebuild with:
+    flask --app run build-nutrient-matrix
+
+Every build goes to its own directory in NUTRIENT_MATRIX_DIR (default
+instance/nutrient_matrix), and the CURRENT file, replaced atomically once
+the build is complete, names the one to open. A worker therefore never
+mixes files of two builds. Running workers keep the mapping they opened
+until they restart; the previous build is kept for them, older ones are
+removed.
+"""
+import logging
+import os
+import shutil
+import tempfile
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from app.models import db, Nutrient
+
+logger = logging.getLogger(__name__)
+
+VALUES_FILE = 'values.npy'
+FOOD_IDS_FILE = 'food_ids.npy'
+NUTRIENTS_FILE = 'nutrients.npy'
+CURRENT_FILE = 'CURRENT'
+BUILD_PREFIX = 'build-'
+
+
+def _current_build(directory):
+    """Path of the build CURRENT names, or None if nothing has been built."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return os.path.join(directory, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def _switch_build(directory, build):
+    """Point CURRENT at `build`, then remove the builds before the previous one."""
+    previous = _current_build(directory)
+    tmp_path = os.path.join(directory, CURRENT_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(os.path.basename(build))
+    os.replace(tmp_path, os.path.join(directory, CURRENT_FILE))
+
+    keep = {os.path.basename(build), previous and os.path.basename(previous)}
+    for name in os.listdir(directory):
+        if name.startswith(BUILD_PREFIX) and name not in keep:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)  # Still mapped on Windows
+
+
+def build_nutrient_matrix(directory, batch_size=10000):
+    """
+    Pivot the nutrient table into a new build in `directory` and make it current.
+
+    Nutrient rows are streamed in batches, so memory use is the matrix
+    itself. A (food, name, unit) listed twice keeps its last amount.
+
+    Returns:
+        tuple: (number of foods, number of nutrients)
+    """
+    food_ids = np.array(
+        [food_id for (food_id,) in db.session.query(Nutrient.food_id).distinct().order_by(Nutrient.food_id)],
+        dtype=np.int64
+    )
+    nutrients = [
+        tuple(nutrient) for nutrient in
+        db.session.query(Nutrient.name, Nutrient.unit_name).distinct().order_by(Nutrient.name, Nutrient.unit_name)
+    ]
+    columns = {nutrient: column for column, nutrient in enumerate(nutrients)}
+
+    values = np.full((len(food_ids), len(nutrients)), np.nan, dtype=np.float32)
+    rows = db.session.execute(
+        select(Nutrient.food_id, Nutrient.name, Nutrient.unit_name, Nutrient.amount_per_100g)
+        .order_by(Nutrient.nutrient_id)
+        .execution_options(yield_per=batch_size)
+    )
+    for batch in rows.partitions():
+        batch_food_ids, names, units, amounts = zip(*batch)
+        row_positions = np.searchsorted(food_ids, np.array(batch_food_ids, dtype=np.int64))
+        column_positions = np.fromiter(
+            (columns[nutrient] for nutrient in zip(names, units)), dtype=np.int64, count=len(batch)
+        )
+        values[row_positions, column_positions] = np.array(amounts, dtype=np.float32)  # None becomes NaN
+
+    os.makedirs(directory, exist_ok=True)
+    build = tempfile.mkdtemp(prefix=BUILD_PREFIX, dir=directory)
+    try:
+        np.save(os.path.join(build, FOOD_IDS_FILE), food_ids)
+        np.save(os.path.join(build, NUTRIENTS_FILE), np.array(nutrients, dtype=str).reshape(len(nutrients), 2))
+        np.save(os.path.join(build, VALUES_FILE), values)
+    except BaseException:
+        shutil.rmtree(build, ignore_errors=True)
+        raise
+    _switch_build(directory, build)
+    return len(food_ids), len(nutrients)
+
+
+class NutrientMatrix:
+    """Read-only view of a built matrix; `values` is memory-mapped."""
+
+    def __init__(self, values, food_ids, nutrients):
+        self.values = values
+        self.food_ids = food_ids
+        self.nutrients = [tuple(nutrient) for nutrient in nutrients]
+        self.columns = {nutrient: column for column, nutrient in enumerate(self.nutrients)}
+
+    @classmethod
+    def open(cls, directory):
+        """Map the current build in `directory`; returns None if it has not been built."""
+        build = _current_build(directory)
+        if build is None:
+            return None
+        paths = [os.path.join(build, filename) for filename in (VALUES_FILE, FOOD_IDS_FILE, NUTRIENTS_FILE)]
+        return cls(np.load(paths[0], mmap_mode='r'), np.load(paths[1]), np.load(paths[2]).tolist())
+
+    def nutrient_keys(self, names):
+        """
+        (name, unit) columns of nutrient names, every unit of each.
+
+        Raises:
+            KeyError: If a nutrient name is unknown.
+        """
+        keys = []
+        for name in names:
+            found = [nutrient for nutrient in self.nutrients if nutrient[0] == name]
+            if not found:
+                raise KeyError(name)
+            keys.extend(found)
+        return keys
+
+    def rows(self, food_ids):
+        """Row positions of `food_ids`, -1 for foods without nutrients."""
+        food_ids = np.asarray(food_ids, dtype=np.int64)
+        positions = np.searchsorted(self.food_ids, food_ids)
+        found = positions < len(self.food_ids)
+        found[found] = self.food_ids[positions[found]] == food_ids[found]
+        return np.where(found, positions, -1)
+
+    def lookup(self, food_ids, nutrients=None):
+        """
+        Nutrients per 100 g of each food.
+
+        Args:
+            food_ids (list[int]): Foods to look up.
+            nutrients (list[tuple]): (name, unit) columns to include; all when None.
+
+        Returns:
+            dict: {food_id: {(name, unit): amount}}; foods without data are left
+                out and missing amounts are skipped.
+
+        Raises:
+            KeyError: If a nutrient is unknown.
+        """
+        names = [tuple(nutrient) for nutrient in nutrients] if nutrients else self.nutrients
+        columns = np.array([self.columns[name] for name in names], dtype=np.int64)
+        positions = self.rows(food_ids)
+        found = positions >= 0
+        block = self.values[positions[found]][:, columns]  # Copies only the requested rows
+        return {
+            int(food_id): {
+                # USDA reports at most 3 decimals; rounding drops float32 noise
+                name: round(float(amount), 3) for name, amount in zip(names, amounts) if not np.isnan(amount)
+            }
+            for food_id, amounts in zip(np.asarray(food_ids)[found], block)
+        }
+
+
+def _config(app):
+    app.config.setdefault('NUTRIENT_MATRIX_DIR', os.path.join(app.instance_path, 'nutrient_matrix'))
+    return app.config
+
+
+def get_nutrient_matrix():
+    """The current app's mapped matrix, or None if it has not been built."""
+    matrix = current_app.extensions.get('nutrient_matrix')
+    if matrix is None:
+        matrix = NutrientMatrix.open(_config(current_app)['NUTRIENT_MATRIX_DIR'])
+        if matrix is not None:
+            current_app.extensions['nutrient_matrix'] = matrix
+    return matrix
+
+
+@click.command('build-nutrient-matrix')
+@with_appcontext
+def build_nutrient_matrix_command():
+    """Pivot the USDA nutrient table into the memory-mapped matrix."""
+    directory = _config(current_app)['NUTRIENT_MATRIX_DIR']
+    foods, nutrients = build_nutrient_matrix(directory)
+    current_app.extensions['nutrient_matrix'] = NutrientMatrix.open(directory)
+    click.echo(f"Built a {foods} x {nutrients} nutrient matrix in {directory}")
+
+
+def init_app(app):
+    """Register the build-nutrient-matrix command and map an existing matrix."""
+    directory = _config(app)['NUTRIENT_MATRIX_DIR']
+    matrix = NutrientMatrix.open(directory)
+    if matrix is not None:
+        app.extensions['nutrient_matrix'] = matrix
+        logger.info(f"Mapped {len(matrix.food_ids)} x {len(matrix.nutrients)} nutrient matrix from {directory}")
+    app.cli.add_command(build_nutrient_matrix_command)
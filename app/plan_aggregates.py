@@ -0,0 +1,186 @@
+"""
+Stored grocery list aggregates for weekly plans.
+
+A plan's aggregate (plan_grocery_item rows) is built from its meal slots the
+first time a slot is edited, then kept current by apply_slot_change, which
+only reads the ingredients of the slot's old and new recipe. Writes that
+change recipes or replace a plan's slots wholesale call
+invalidate_plan_aggregates instead, and the aggregate is rebuilt lazily.
+
+Items are keyed like the plan grocery list: (canonical item name, unit)
+with empty units reported as "unitless" and missing quantities counted as 0.
+"""
+from collections import defaultdict
+
+from sqlalchemy import Float, cast, delete, func, insert, literal, select, tuple_, update
+
+from app.database_utils import servings_factor
+from app.canonical import grocery_item_group, grocery_item_name
+from app.models import db, CanonicalIngredient, Ingredient, MealSlot, PlanGroceryItem, Recipe
+
+# Quantities closer to zero than this are treated as zero
+EPSILON = 1e-9
+
+_unit = func.coalesce(func.nullif(Ingredient.unit, ''), 'unitless')
+
+
+def ensure_plan_aggregate(weekly_plan_id):
+    """Build the stored aggregate for a plan unless one already exists."""
+    if db.session.query(PlanGroceryItem.id).filter_by(weekly_plan_id=weekly_plan_id).first():
+        return
+
+    factor = func.coalesce(cast(MealSlot.servings, Float) / func.nullif(Recipe.servings, 0), 1.0)
+    rows = (
+        db.session.query(
+            grocery_item_name(), _unit,
+            func.sum(func.coalesce(Ingredient.quantity, 0) * factor), func.count(Ingredient.id)
+        )
+        .join(MealSlot, MealSlot.recipe_id == Ingredient.recipe_id)
+        .join(Recipe, Recipe.id == Ingredient.recipe_id)
+        .outerjoin(CanonicalIngredient, CanonicalIngredient.id == Ingredient.canonical_id)
+        .filter(MealSlot.weekly_plan_id == weekly_plan_id)
+        .group_by(*grocery_item_group(), _unit)
+        .all()
+    )
+    if rows:
+        db.session.execute(insert(PlanGroceryItem), [
+            {'weekly_plan_id': weekly_plan_id, 'item_name': name, 'unit': unit,
+             'quantity': quantity, 'occurrences': occurrences}
+            for name, unit, quantity, occurrences in rows
+        ])
+
+
+def copy_plan_aggregate(source_plan_id, target_plan_id):
+    """Copy a plan's stored aggregate, if any, to a plan with identical meals."""
+    db.session.execute(insert(PlanGroceryItem).from_select(
+        ['weekly_plan_id', 'item_name', 'unit', 'quantity', 'occurrences'],
+        select(
+            literal(target_plan_id), PlanGroceryItem.item_name, PlanGroceryItem.unit,
+            PlanGroceryItem.quantity, PlanGroceryItem.occurrences
+        ).where(PlanGroceryItem.weekly_plan_id == source_plan_id)
+    ))
+
+
+def recipe_vectors(recipe_ids):
+    """
+    Ingredient vectors for a few recipes in one query.
+
+    Returns:
+        dict: {recipe_id: (recipe_servings, {(item_name, unit): (quantity, occurrences)})}
+            Recipes that do not exist are absent.
+    """
+    rows = (
+        db.session.query(
+            Recipe.id, Recipe.servings, grocery_item_name(), _unit,
+            func.sum(func.coalesce(Ingredient.quantity, 0)), func.count(Ingredient.id)
+        )
+        .outerjoin(Ingredient, Ingredient.recipe_id == Recipe.id)
+        .outerjoin(CanonicalIngredient, CanonicalIngredient.id == Ingredient.canonical_id)
+        .filter(Recipe.id.in_(recipe_ids))
+        .group_by(Recipe.id, Recipe.servings, *grocery_item_group(), _unit)
+        .all()
+    )
+    vectors = {}
+    for recipe_id, servings, name, unit, quantity, occurrences in rows:
+        _, items = vectors.setdefault(recipe_id, (servings, {}))
+        if occurrences:
+            items[(name, unit)] = (quantity, occurrences)
+    return vectors
+
+
+def apply_slot_change(slot, recipe_id, servings):
+    """
+    Point `slot` at a new recipe/servings and update its plan's stored aggregate.
+
+    The old recipe's scaled ingredient vector is subtracted and the new one
+    added, so the work is proportional to the two recipes' ingredients.
+
+    Returns:
+        dict: {'added': [...], 'removed': [...], 'changed': [...]} grocery items.
+
+    Raises:
+        LookupError: If `recipe_id` does not exist.
+    """
+    vectors = recipe_vectors({rid for rid in (slot.recipe_id, recipe_id) if rid})
+    if recipe_id and recipe_id not in vectors:
+        raise LookupError(f"Recipe ID {recipe_id} not found")
+
+    delta = defaultdict(lambda: [0.0, 0])
+    for rid, slot_servings, sign in ((slot.recipe_id, slot.servings, -1), (recipe_id, servings, 1)):
+        if rid not in vectors:
+            continue
+        recipe_servings, items = vectors[rid]
+        factor = servings_factor(slot_servings, recipe_servings)
+        for key, (quantity, occurrences) in items.items():
+            delta[key][0] += sign * quantity * factor
+            delta[key][1] += sign * occurrences
+
+    slot.recipe_id = recipe_id
+    slot.servings = servings
+
+    keys = sorted(key for key, (quantity, occurrences) in delta.items() if abs(quantity) > EPSILON or occurrences)
+    result = {'added': [], 'removed': [], 'changed': []}
+    if not keys:
+        return result
+
+    existing = {
+        (name, unit): (item_id, quantity, occurrences)
+        for item_id, name, unit, quantity, occurrences in db.session.query(
+            PlanGroceryItem.id, PlanGroceryItem.item_name, PlanGroceryItem.unit,
+            PlanGroceryItem.quantity, PlanGroceryItem.occurrences
+        ).filter(
+            PlanGroceryItem.weekly_plan_id == slot.weekly_plan_id,
+            tuple_(PlanGroceryItem.item_name, PlanGroceryItem.unit).in_(keys)
+        )
+    }
+    new_rows, updated_rows, removed_ids = [], [], []
+    for key in keys:
+        quantity_delta, occurrence_delta = delta[key]
+        name, unit = key
+        if key not in existing:
+            if occurrence_delta > 0:
+                new_rows.append({
+                    'weekly_plan_id': slot.weekly_plan_id, 'item_name': name, 'unit': unit,
+                    'quantity': quantity_delta, 'occurrences': occurrence_delta,
+                })
+                result['added'].append({'item_name': name, 'unit': unit, 'quantity': round(quantity_delta, 2)})
+            continue
+
+        item_id, quantity, occurrences = existing[key]
+        if occurrences + occurrence_delta <= 0:
+            removed_ids.append(item_id)
+            result['removed'].append({'item_name': name, 'unit': unit, 'quantity': round(quantity, 2)})
+            continue
+        updated_rows.append({
+            'id': item_id, 'quantity': quantity + quantity_delta, 'occurrences': occurrences + occurrence_delta,
+        })
+        if abs(quantity_delta) > EPSILON:
+            result['changed'].append({
+                'item_name': name, 'unit': unit,
+                'quantity': round(quantity + quantity_delta, 2), 'previous_quantity': round(quantity, 2),
+            })
+
+    # One statement per kind of change, however many items the recipes share
+    if updated_rows:
+        db.session.execute(update(PlanGroceryItem), updated_rows)
+    if removed_ids:
+        db.session.execute(delete(PlanGroceryItem).where(PlanGroceryItem.id.in_(removed_ids)))
+    if new_rows:
+        db.session.execute(insert(PlanGroceryItem), new_rows)
+    return result
+
+
+def invalidate_plan_aggregates(weekly_plan_ids=None, recipe_ids=None, all_plans=False):
+    """Drop stored aggregates for the given plans and for plans using the given recipes, or for every plan."""
+    if all_plans:
+        PlanGroceryItem.query.delete(synchronize_session=False)
+        return
+    conditions = []
+    if weekly_plan_ids:
+        conditions.append(PlanGroceryItem.weekly_plan_id.in_(weekly_plan_ids))
+    if recipe_ids:
+        conditions.append(PlanGroceryItem.weekly_plan_id.in_(
+            select(MealSlot.weekly_plan_id).where(MealSlot.recipe_id.in_(recipe_ids))
+        ))
+    if conditions:
+        PlanGroceryItem.query.filter(db.or_(*conditions)).delete(synchronize_session=False)
@@ -0,0 +1,311 @@
+"""
+Weekly plan generator that keeps the grocery list short.
+
+Fills every (day, meal_type) slot with a recipe, subject to
+
+    max_cook_time   minutes, for every slot or per meal type; recipes without
+                    a cook time only fit slots without a limit
+    no repeats      each recipe at most once (unless allow_repeats)
+    required        recipes that must be in the plan
+    excluded        recipes that must not
+
+and minimizes one of
+
+    items       distinct grocery items (canonical ingredients) to buy
+    leftovers   the unused part of each item and unit bought in whole units,
+                e.g. 2.25 cups of milk leaves 0.75 cup
+
+with the other as a tie-breaker.
+
+Day and meal type do not change the grocery list, so a plan is scored as
+the set of its recipes. The search is simulated annealing over single-slot
+replacements: PlanScorer keeps per-item counts and per (item, unit) totals
+for the current plan, so the effect of replacing one recipe is computed
+from the two recipes' ingredients alone and tens of thousands of candidate
+plans are evaluated per second.
+
+Recipe ingredient sets are cached on the app (`app.extensions['plan_generator']`)
+and reloaded when the recipe_change counter moves.
+"""
+import math
+import random
+import threading
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.database_utils import DAYS_OF_WEEK
+from app.models import db, Ingredient, Recipe, RecipeChange
+
+MEAL_TYPES = ["breakfast", "lunch", "dinner"]  # As sent by the planner page (static/js/index.js)
+OBJECTIVES = ('items', 'leftovers')
+
+DEFAULT_ITERATIONS = 20000
+MAX_ITERATIONS = 500000
+GREEDY_SAMPLE = 50  # Candidates tried per slot when building the starting plan
+TIE_BREAK = 1e-3  # Weight of the other objective
+
+_lock = threading.Lock()
+
+
+class RecipeSets:
+    """Per-recipe ingredient sets, encoded as integer item and (item, unit) codes."""
+
+    def __init__(self, version, recipes, ingredients):
+        """
+        Args:
+            version (int): Last recipe_change id reflected.
+            recipes: (id, name, cook_time) rows.
+            ingredients: (recipe_id, canonical_id, unit, quantity) rows.
+        """
+        self.version = version
+        self.ids = [recipe_id for recipe_id, _, _ in recipes]
+        self.names = [name for _, name, _ in recipes]
+        self.cook_times = [cook_time for _, _, cook_time in recipes]
+        self.index = {recipe_id: position for position, recipe_id in enumerate(self.ids)}
+
+        items, amounts = {}, {}
+        self.items = [set() for _ in self.ids]
+        quantities = [{} for _ in self.ids]
+        for recipe_id, canonical_id, unit, quantity in ingredients:
+            position = self.index.get(recipe_id)
+            if position is None or canonical_id is None:  # Only nameless ingredients lack a canonical id
+                continue
+            item = items.setdefault(canonical_id, len(items))
+            self.items[position].add(item)
+            if quantity:
+                key = amounts.setdefault((item, unit or ''), len(amounts))
+                quantities[position][key] = quantities[position].get(key, 0.0) + quantity
+        self.items = [tuple(recipe_items) for recipe_items in self.items]
+        self.amounts = [tuple(recipe_quantities.items()) for recipe_quantities in quantities]
+        self.n_items, self.n_amounts = len(items), len(amounts)
+
+    @classmethod
+    def load(cls, version):
+        recipes = db.session.query(Recipe.id, Recipe.name, Recipe.cook_time).order_by(Recipe.id).all()
+        ingredients = db.session.query(
+            Ingredient.recipe_id, Ingredient.canonical_id, Ingredient.unit, Ingredient.quantity
+        ).all()
+        return cls(version, recipes, ingredients)
+
+
+def get_recipe_sets():
+    """The current app's RecipeSets, reloaded when recipes have changed."""
+    counter = db.session.query(func.max(RecipeChange.id)).scalar() or 0
+    state = current_app.extensions.setdefault('plan_generator', {})
+    sets = state.get('sets')
+    if sets is None or sets.version != counter:
+        with _lock:
+            sets = state.get('sets')
+            if sets is None or sets.version != counter:
+                sets = state['sets'] = RecipeSets.load(counter)
+    return sets
+
+
+def _leftover(total):
+    """Unused part of the whole units bought for `total`."""
+    return math.ceil(total - 1e-9) - total if total > 1e-9 else 0.0
+
+
+class PlanScorer:
+    """Grocery items and leftovers of a changing set of recipes, updated per recipe."""
+
+    def __init__(self, sets):
+        self.sets = sets
+        self.counts = [0] * sets.n_items
+        self.totals = [0.0] * sets.n_amounts
+        self.items = 0
+        self.leftover = 0.0
+
+    def add(self, recipe):
+        for item in self.sets.items[recipe]:
+            if not self.counts[item]:
+                self.items += 1
+            self.counts[item] += 1
+        for key, quantity in self.sets.amounts[recipe]:
+            total = self.totals[key]
+            self.leftover += _leftover(total + quantity) - _leftover(total)
+            self.totals[key] = total + quantity
+
+    def remove(self, recipe):
+        for item in self.sets.items[recipe]:
+            self.counts[item] -= 1
+            if not self.counts[item]:
+                self.items -= 1
+        for key, quantity in self.sets.amounts[recipe]:
+            total = self.totals[key]
+            self.leftover += _leftover(total - quantity) - _leftover(total)
+            self.totals[key] = total - quantity
+
+    def replace_delta(self, old, new):
+        """(change in items, change in leftover) if `old` were replaced by `new`, without applying it."""
+        if old == new:
+            return 0, 0.0
+        counts, sets = self.counts, self.sets
+        change = {}
+        if old is not None:
+            for item in sets.items[old]:
+                change[item] = -1
+        for item in sets.items[new]:
+            change[item] = change.get(item, 0) + 1
+        items = sum((counts[item] + step > 0) - (counts[item] > 0) for item, step in change.items() if step)
+
+        amounts = {}
+        if old is not None:
+            for key, quantity in sets.amounts[old]:
+                amounts[key] = -quantity
+        for key, quantity in sets.amounts[new]:
+            amounts[key] = amounts.get(key, 0.0) + quantity
+        totals = self.totals
+        leftover = sum(_leftover(totals[key] + step) - _leftover(totals[key]) for key, step in amounts.items())
+        return items, leftover
+
+
+def _objective(objective, items, leftover):
+    if objective == 'leftovers':
+        return leftover + TIE_BREAK * items
+    return items + TIE_BREAK * leftover
+
+
+def _cook_time_limit(max_cook_time, meal_type):
+    if isinstance(max_cook_time, dict):
+        return max_cook_time.get(meal_type)
+    return max_cook_time
+
+
+def _slot_names(values, default, label, allowed=None):
+    """Validated list of day or meal type names; `default` when None."""
+    if values is None:
+        return list(default)
+    if not isinstance(values, list) or not all(isinstance(value, str) and value.strip() for value in values):
+        raise ValueError(f"{label.capitalize()} must be a list of names")
+    unknown = [value for value in values if allowed is not None and value not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown {label}: {', '.join(unknown)}")
+    duplicates = [value for position, value in enumerate(values) if value in values[:position]]
+    if duplicates:
+        raise ValueError(f"Duplicate {label}: {', '.join(dict.fromkeys(duplicates))}")
+    return values
+
+
+def generate_plan(days=None, meal_types=None, max_cook_time=None, required=(), excluded=(),
+                  allow_repeats=False, objective='items', iterations=DEFAULT_ITERATIONS, seed=None):
+    """
+    Choose a recipe for every (day, meal_type) slot.
+
+    Args:
+        days (list[str]): Days from DAYS_OF_WEEK, each at most once; every day when None.
+        meal_types (list[str]): Distinct meal types; MEAL_TYPES when None.
+        max_cook_time (int | dict): Limit for every slot, or {meal_type: limit}.
+        required (list[int]): Recipe ids that must be used.
+        excluded (list[int]): Recipe ids that must not be used.
+        objective (str): 'items' or 'leftovers'.
+        iterations (int): Candidate plans evaluated by the local search.
+        seed (int): Makes the search repeatable.
+
+    Returns:
+        dict: {'meals': [{'day', 'meal_type', 'recipe_id', 'recipe_name'}],
+               'grocery_items', 'leftover', 'evaluated'}
+
+    Raises:
+        ValueError: On malformed, unknown or repeated days and meal types, unknown
+            recipes or objective, or constraints no plan satisfies.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Objective must be one of {', '.join(OBJECTIVES)}")
+    days = _slot_names(days, DAYS_OF_WEEK, 'days', allowed=DAYS_OF_WEEK)
+    meal_types = _slot_names(meal_types, MEAL_TYPES, 'meal types')
+    slots = [(day, meal_type) for day in days for meal_type in meal_types]
+    if not slots:
+        raise ValueError("The plan has no slots")
+
+    sets = get_recipe_sets()
+    unknown = [recipe_id for recipe_id in list(required) + list(excluded) if recipe_id not in sets.index]
+    if unknown:
+        raise ValueError(f"Unknown recipes: {', '.join(map(str, unknown))}")
+    excluded = {sets.index[recipe_id] for recipe_id in excluded}
+    required = [sets.index[recipe_id] for recipe_id in dict.fromkeys(required)]
+    if set(required) & excluded:
+        raise ValueError("A recipe cannot be both required and excluded")
+
+    def fits(recipe, meal_type):
+        limit = _cook_time_limit(max_cook_time, meal_type)
+        cook_time = sets.cook_times[recipe]
+        return limit is None or (cook_time is not None and cook_time <= limit)
+
+    eligible = {
+        meal_type: [recipe for recipe in range(len(sets.ids)) if recipe not in excluded and fits(recipe, meal_type)]
+        for meal_type in meal_types
+    }
+    rng = random.Random(seed)
+    scorer = PlanScorer(sets)
+    plan = [None] * len(slots)
+    used = {}
+
+    def place(slot, recipe):
+        if plan[slot] is not None:
+            scorer.remove(plan[slot])
+            used[plan[slot]] -= 1
+        plan[slot] = recipe
+        scorer.add(recipe)
+        used[recipe] = used.get(recipe, 0) + 1
+
+    # Required recipes go in the first free slot they fit and stay there
+    locked = set()
+    for recipe in required:
+        slot = next((slot for slot, (_, meal_type) in enumerate(slots)
+                     if slot not in locked and fits(recipe, meal_type)), None)
+        if slot is None:
+            raise ValueError(f"Required recipe {sets.ids[recipe]} fits no free slot")
+        place(slot, recipe)
+        locked.add(slot)
+
+    def available(recipe):
+        return allow_repeats or not used.get(recipe)
+
+    # Greedy start: each slot takes the best of a sample of unused eligible recipes
+    evaluated = 0
+    for slot, (_, meal_type) in enumerate(slots):
+        if slot in locked:
+            continue
+        candidates = [recipe for recipe in eligible[meal_type] if available(recipe)]
+        if not candidates:
+            raise ValueError(f"Not enough recipes fit the {meal_type} slots")
+        sample = rng.sample(candidates, min(GREEDY_SAMPLE, len(candidates)))
+        scored = [(_objective(objective, *scorer.replace_delta(None, recipe)), recipe) for recipe in sample]
+        evaluated += len(scored)
+        place(slot, min(scored)[1])
+
+    # Simulated annealing over single-slot replacements
+    free_slots = [slot for slot in range(len(slots)) if slot not in locked]
+    current = _objective(objective, scorer.items, scorer.leftover)
+    best, best_plan = current, list(plan)
+    iterations = min(int(iterations), MAX_ITERATIONS)
+    for step in range(iterations if free_slots else 0):
+        slot = rng.choice(free_slots)
+        options = eligible[slots[slot][1]]
+        recipe = options[rng.randrange(len(options))]
+        if recipe == plan[slot] or not available(recipe):
+            continue
+        delta = _objective(objective, *scorer.replace_delta(plan[slot], recipe))
+        evaluated += 1
+        temperature = 1.0 - step / iterations
+        if delta <= 0 or rng.random() < math.exp(-delta / max(temperature, 1e-3)):
+            place(slot, recipe)
+            current += delta
+            if current < best - 1e-9:
+                best, best_plan = current, list(plan)
+
+    # Score the best plan from scratch, so accumulated float error does not leak out
+    scorer = PlanScorer(sets)
+    for recipe in best_plan:
+        scorer.add(recipe)
+    return {
+        'meals': [
+            {'day': day, 'meal_type': meal_type, 'recipe_id': sets.ids[recipe], 'recipe_name': sets.names[recipe]}
+            for (day, meal_type), recipe in zip(slots, best_plan)
+        ],
+        'grocery_items': scorer.items,
+        'leftover': round(scorer.leftover, 2),
+        'evaluated': evaluated,
+    }
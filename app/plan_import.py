@@ -0,0 +1,125 @@
+"""
+Import weekly plans that name their recipes, as in weekly_plan.json:
+
+    {"Monday": {"Breakfast": "BRAISED SHORT RIBS", "Lunch": "...", ...}, ...}
+
+All referenced names are resolved in one case-insensitive query (backed by
+the lower(name) index on recipe), then the plan and its meal slots are
+bulk-inserted.
+
+Command line:
+    flask --app run import-plan weekly_plan.json --name "Imported week" [--skip-unknown]
+"""
+import json
+import os
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+
+from app.database_utils import save_plan_slots
+from app.models import db, Recipe, WeeklyPlan
+
+
+def _normalize(name):
+    return name.strip().lower()
+
+
+def resolve_recipe_names(names):
+    """
+    Map recipe names to IDs in one case-insensitive query.
+
+    Names shared by several recipes resolve to the oldest of them.
+
+    Returns:
+        dict: {normalized name: recipe_id} for the names that exist.
+    """
+    normalized = {_normalize(name) for name in names}
+    if not normalized:
+        return {}
+    key = func.lower(Recipe.name)
+    return dict(
+        db.session.query(key, func.min(Recipe.id))
+        .filter(key.in_(normalized))
+        .group_by(key)
+        .all()
+    )
+
+
+def import_weekly_plan(plan_data, name, skip_unknown=False):
+    """
+    Create a weekly plan from a {day: {meal_type: recipe_name}} mapping.
+
+    Nothing is created if a name matches no recipe, unless `skip_unknown` is
+    set, in which case those meals are left out. The caller commits.
+
+    Returns:
+        dict: {'id': plan ID or None, 'slots': meals created, 'unknown': unmatched names}
+
+    Raises:
+        ValueError: If `plan_data` is not shaped like weekly_plan.json.
+    """
+    if not isinstance(plan_data, dict) or not all(isinstance(meals, dict) for meals in plan_data.values()):
+        raise ValueError("Expected a mapping of day -> meal type -> recipe name")
+
+    entries = [
+        (day, meal_type, recipe_name)
+        for day, meals in plan_data.items()
+        for meal_type, recipe_name in meals.items()
+        if recipe_name
+    ]
+    if not all(isinstance(recipe_name, str) for _, _, recipe_name in entries):
+        raise ValueError("Recipe names must be strings")
+
+    recipe_ids = resolve_recipe_names(recipe_name for _, _, recipe_name in entries)
+    unknown = sorted({
+        recipe_name for _, _, recipe_name in entries if _normalize(recipe_name) not in recipe_ids
+    })
+    result = {'id': None, 'slots': 0, 'unknown': unknown}
+
+    slots = {
+        (day, meal_type): {'recipe_id': recipe_ids[_normalize(recipe_name)], 'servings': None}
+        for day, meal_type, recipe_name in entries
+        if _normalize(recipe_name) in recipe_ids
+    }
+    if (unknown and not skip_unknown) or not slots:
+        return result
+
+    weekly_plan = WeeklyPlan(name=name, created_at=datetime.utcnow())
+    db.session.add(weekly_plan)
+    db.session.flush()
+    result['id'] = weekly_plan.id
+    save_plan_slots(weekly_plan.id, slots, is_new=True)
+    result['slots'] = len(slots)
+    return result
+
+
+@click.command('import-plan')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--name', help="Name of the new plan (defaults to the file name and time).")
+@click.option('--skip-unknown', is_flag=True, help="Import the meals whose recipes exist and skip the rest.")
+@with_appcontext
+def import_plan_command(path, name, skip_unknown):
+    """Import a weekly plan JSON file that refers to recipes by name."""
+    with open(path, encoding='utf-8') as f:
+        plan_data = json.load(f)
+    name = name or f"{os.path.basename(path)} ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})"
+
+    try:
+        result = import_weekly_plan(plan_data, name, skip_unknown)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    for recipe_name in result['unknown']:
+        click.echo(f"Unknown recipe: {recipe_name}", err=True)
+    if result['id'] is None:
+        raise click.ClickException("No plan created" + ("; rerun with --skip-unknown to import the rest" if result['unknown'] else ""))
+
+    db.session.commit()
+    click.echo(f"Created weekly plan {result['id']} with {result['slots']} meals")
+
+
+def init_app(app):
+    """Register the import-plan command."""
+    app.cli.add_command(import_plan_command)
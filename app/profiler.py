@@ -0,0 +1,206 @@
+"""
+Opt-in request profiler.
+
+When PROFILER_ENABLED is set, a request is profiled if it carries the
+PROFILER_HEADER header (default "X-Profile: 1") or is picked by
+PROFILER_SAMPLE_RATE. Each profiled request writes three files to
+PROFILER_DIR:
+
+    <id>.prof       cProfile stats (snakeviz, gprof2dot, pstats)
+    <id>.collapsed  folded stacks for flamegraph.pl / speedscope
+    <id>.txt        time breakdown (SQL, ORM, serialization, Python) and top calls
+
+The profile id is returned in the X-Profile-Id response header together
+with a Server-Timing header.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Path fragments used to attribute a function's own time to a layer
+SERIALIZATION_MARKERS = (os.sep + 'json' + os.sep, 'jsonify', 'JSONEncoder', 'JSONProvider')
+ORM_MARKERS = (os.sep + 'sqlalchemy' + os.sep, os.sep + 'flask_sqlalchemy' + os.sep)
+SQL_MARKERS = ("sqlite3.Cursor", "sqlite3.Connection")
+
+FOLDED_MAX_DEPTH = 64
+FOLDED_MIN_SECONDS = 1e-5
+
+
+def init_profiler(app):
+    """Register the profiling hooks on `app`."""
+    app.config.setdefault('PROFILER_ENABLED', False)
+    app.config.setdefault('PROFILER_HEADER', 'X-Profile')
+    app.config.setdefault('PROFILER_SAMPLE_RATE', 0.0)
+    app.config.setdefault('PROFILER_DIR', os.path.join(app.instance_path, 'profiles'))
+
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+
+
+def _should_profile(config):
+    if not config['PROFILER_ENABLED']:
+        return False
+    if request.headers.get(config['PROFILER_HEADER'], '').lower() in ('1', 'true', 'yes'):
+        return True
+    return random.random() < config['PROFILER_SAMPLE_RATE']
+
+
+def _start_profile():
+    if not _should_profile(current_app.config):
+        return
+    g._profile = {
+        'profiler': cProfile.Profile(),
+        'sql_seconds': 0.0,
+        'sql_statements': 0,
+        'started': time.perf_counter(),
+    }
+    g._profile['profiler'].enable()
+
+
+def _finish_profile(response):
+    profile = g.pop('_profile', None)
+    if profile is None:
+        return response
+    profile['profiler'].disable()
+    wall_seconds = time.perf_counter() - profile['started']
+
+    try:
+        profile_id = write_profile(
+            current_app.config['PROFILER_DIR'], profile, wall_seconds,
+            f"{request.method} {request.path}", request.endpoint or 'unknown'
+        )
+    except OSError as e:
+        logger.error(f"Could not write request profile: {e}")
+        return response
+
+    response.headers['X-Profile-Id'] = profile_id
+    response.headers['Server-Timing'] = (
+        f"total;dur={wall_seconds * 1000:.2f}, sql;dur={profile['sql_seconds'] * 1000:.2f}"
+    )
+    return response
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and '_profile' in g:
+        conn.info.setdefault('_profile_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_profile_query_start')
+    if starts and has_app_context() and '_profile' in g:
+        g._profile['sql_seconds'] += time.perf_counter() - starts.pop()
+        g._profile['sql_statements'] += 1
+
+
+def _layer(func):
+    """Classify a pstats function key as sql, orm, serialization or python."""
+    filename, _, name = func
+    location = f"{filename}:{name}"
+    if any(marker in location for marker in SQL_MARKERS):
+        return 'sql'
+    if any(marker in location for marker in SERIALIZATION_MARKERS):
+        return 'serialization'
+    if any(marker in location for marker in ORM_MARKERS):
+        return 'orm'
+    return 'python'
+
+
+def breakdown(stats):
+    """Sum each function's own time into layers."""
+    layers = defaultdict(float)
+    for func, (_, _, tottime, _, _) in stats.stats.items():
+        layers[_layer(func)] += tottime
+    return dict(layers)
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def folded_stacks(stats):
+    """
+    Convert cProfile caller/callee data into folded stacks.
+
+    cProfile only records one level of callers, so time deeper in the tree is
+    split between call paths in proportion to each path's share of the
+    parent's cumulative time.
+    """
+    callees = defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, tottime, cumtime) in callers.items():
+            callees[caller].append((func, tottime, cumtime))
+
+    roots = [func for func, (_, _, _, _, callers) in stats.stats.items() if not callers]
+    folded = defaultdict(float)
+
+    def walk(func, path, own_time, cumulative, share):
+        # Prune paths below the output resolution; this also keeps the walk
+        # from enumerating every path through a large call graph.
+        if cumulative * share < FOLDED_MIN_SECONDS:
+            return
+        stack = path + (_label(func),)
+        if own_time * share >= FOLDED_MIN_SECONDS:
+            folded[';'.join(stack)] += own_time * share
+        if len(stack) >= FOLDED_MAX_DEPTH:
+            return
+        total = stats.stats[func][3]
+        for callee, tottime, cumtime in callees.get(func, ()):
+            if _label(callee) in stack:  # Skip recursion cycles
+                continue
+            child_share = share * (cumulative / total) if total else 0
+            walk(callee, stack, tottime, cumtime, child_share)
+
+    for root in roots:
+        _, _, tottime, cumtime, _ = stats.stats[root]
+        walk(root, (), tottime, cumtime, 1.0)
+
+    # flamegraph.pl expects integer sample counts; use microseconds
+    return "\n".join(f"{stack} {int(seconds * 1e6)}" for stack, seconds in folded.items())
+
+
+def write_profile(directory, profile, wall_seconds, title, endpoint):
+    """Dump a finished profile to `directory` and return its id."""
+    os.makedirs(directory, exist_ok=True)
+    profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{endpoint.replace('.', '_')}-{random.randrange(16 ** 6):06x}"
+    base_path = os.path.join(directory, profile_id)
+
+    profiler = profile['profiler']
+    profiler.dump_stats(base_path + '.prof')
+    stats = pstats.Stats(profiler)
+
+    with open(base_path + '.collapsed', 'w', encoding='utf-8') as f:
+        f.write(folded_stacks(stats))
+
+    layers = breakdown(stats)
+    summary = io.StringIO()
+    summary.write(f"{title}\n")
+    summary.write(f"wall time: {wall_seconds * 1000:.2f} ms\n")
+    summary.write(f"sql statements: {profile['sql_statements']} ({profile['sql_seconds'] * 1000:.2f} ms cursor to cursor)\n")
+    summary.write("own time by layer:\n")
+    for layer in ('sql', 'orm', 'serialization', 'python'):
+        summary.write(f"{layer:>14}: {layers.get(layer, 0.0) * 1000:9.2f} ms\n")
+    summary.write("\n")
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(30)
+
+    with open(base_path + '.txt', 'w', encoding='utf-8') as f:
+        f.write(summary.getvalue())
+
+    logger.info(f"Request profile written to {base_path}.prof")
+    return profile_id
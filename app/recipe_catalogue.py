@@ -0,0 +1,278 @@
+"""
+Columnar in-memory read model of the recipe catalogue.
+
+With RECIPE_CATALOGUE_ENABLED set, each worker keeps every recipe and
+ingredient in NumPy arrays (`app.extensions['recipe_catalogue']`) and serves
+the recipe listing and unsaved grocery lists from them without building ORM
+objects:
+
+    recipes       ids, names, cook times, servings and update times, sorted by id
+    ingredients   item name and unit codes into shared vocabularies, canonical ids
+                  and quantities, sorted by (recipe, ingredient id);
+                  offsets[i]:offsets[i + 1] are the rows of the i-th recipe
+
+Recipe writes append to the recipe_change table (record_recipe_changes).
+Before serving a read the catalogue asks for changes newer than the last one
+it applied, which is one query on the primary key, and reloads only the
+recipes named there. A NULL recipe_id reloads everything.
+
+Snapshots are never modified: a refresh builds a new one and swaps it in, so
+a request that already holds a snapshot keeps reading consistent arrays.
+"""
+import threading
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, insert
+
+from app.database_utils import meal_multipliers, planned_meals
+from app.models import db, CanonicalIngredient, Ingredient, Recipe, RecipeChange
+
+_lock = threading.Lock()
+
+
+def record_recipe_changes(recipe_ids=None):
+    """
+    Log writes to `recipe_ids` (every recipe when None) in the current transaction.
+    """
+    rows = [{'recipe_id': None}] if recipe_ids is None else [{'recipe_id': recipe_id} for recipe_id in set(recipe_ids)]
+    if rows:
+        db.session.execute(insert(RecipeChange).execution_options(render_nulls=True), rows)
+
+
+def _encode(values, vocabulary, index):
+    """Dictionary-encode `values`, extending `vocabulary` and `index` with new ones."""
+    codes = np.empty(len(values), dtype=np.int32)
+    for position, value in enumerate(values):
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(vocabulary)
+            vocabulary.append(value)
+        codes[position] = code
+    return codes
+
+
+def _fetch(recipe_ids=None):
+    """Recipe and ingredient rows for `recipe_ids`, or for every recipe when None."""
+    recipes = db.session.query(Recipe.id, Recipe.name, Recipe.cook_time, Recipe.servings, Recipe.updated_at)
+    ingredients = (
+        db.session.query(
+            Ingredient.recipe_id, Ingredient.id, Ingredient.item_name, Ingredient.unit,
+            Ingredient.quantity, Ingredient.canonical_id, CanonicalIngredient.name
+        )
+        .outerjoin(CanonicalIngredient, CanonicalIngredient.id == Ingredient.canonical_id)
+    )
+    if recipe_ids is not None:
+        recipes = recipes.filter(Recipe.id.in_(recipe_ids))
+        ingredients = ingredients.filter(Ingredient.recipe_id.in_(recipe_ids))
+    return recipes.all(), ingredients.all()
+
+
+class RecipeCatalogue:
+    """An immutable columnar snapshot of all recipes and their ingredients."""
+
+    def __init__(self, version=0):
+        self.version = version  # Id of the last recipe_change applied
+        self.recipe_ids = np.empty(0, dtype=np.int64)
+        self.names = np.empty(0, dtype=object)
+        self.cook_times = np.empty(0, dtype=np.float64)  # NaN for NULL
+        self.servings = np.empty(0, dtype=np.float64)  # NaN for NULL
+        self.updated_at = np.empty(0, dtype=object)
+        self.ingredient_recipe_ids = np.empty(0, dtype=np.int64)
+        self.ingredient_ids = np.empty(0, dtype=np.int64)
+        self.item_codes = np.empty(0, dtype=np.int32)
+        self.unit_codes = np.empty(0, dtype=np.int32)
+        self.canonical_ids = np.empty(0, dtype=np.int64)  # 0 for NULL
+        self.quantities = np.empty(0, dtype=np.float64)  # NaN for NULL
+        self.item_names, self.units = [], []
+        self.canonical_names = {}
+        self._index()
+
+    @classmethod
+    def load(cls):
+        """Read the whole catalogue: three queries."""
+        version = db.session.query(func.max(RecipeChange.id)).scalar() or 0
+        return cls(version)._merge(*_fetch(), replaced_ids=None, version=version)
+
+    def refresh(self):
+        """
+        Return a snapshot with every logged change applied: `self` when
+        nothing changed, otherwise a new catalogue.
+        """
+        changes = db.session.query(RecipeChange.id, RecipeChange.recipe_id).filter(RecipeChange.id > self.version).all()
+        if not changes:
+            return self
+        version = max(change_id for change_id, _ in changes)
+        changed = {recipe_id for _, recipe_id in changes}
+        if None in changed:
+            return RecipeCatalogue(version)._merge(*_fetch(), replaced_ids=None, version=version)
+        return self._merge(*_fetch(changed), replaced_ids=changed, version=version)
+
+    def _merge(self, recipe_rows, ingredient_rows, replaced_ids, version):
+        """New snapshot with the recipes in `replaced_ids` (None: all) replaced by the given rows."""
+        merged = RecipeCatalogue.__new__(RecipeCatalogue)
+        merged.version = version
+
+        if replaced_ids is None:
+            keep_recipes = np.zeros(len(self.recipe_ids), dtype=bool)
+            keep_rows = np.zeros(len(self.ingredient_ids), dtype=bool)
+        else:
+            replaced = np.fromiter(replaced_ids, dtype=np.int64, count=len(replaced_ids))
+            keep_recipes = ~np.isin(self.recipe_ids, replaced)
+            keep_rows = ~np.isin(self.ingredient_recipe_ids, replaced)
+
+        recipe_columns = list(zip(*recipe_rows)) or [(), (), (), (), ()]
+        ids, names, cook_times, servings, updated_at = recipe_columns
+        recipe_ids = np.concatenate([self.recipe_ids[keep_recipes], np.array(ids, dtype=np.int64)])
+        order = np.argsort(recipe_ids, kind='stable')
+        merged.recipe_ids = recipe_ids[order]
+        merged.names = np.concatenate([self.names[keep_recipes], np.array(names, dtype=object)])[order]
+        merged.cook_times = np.concatenate([
+            self.cook_times[keep_recipes], np.array(cook_times, dtype=np.float64)  # None becomes NaN
+        ])[order]
+        merged.servings = np.concatenate([self.servings[keep_recipes], np.array(servings, dtype=np.float64)])[order]
+        merged.updated_at = np.concatenate([self.updated_at[keep_recipes], np.array(updated_at, dtype=object)])[order]
+
+        # Vocabularies only grow, so codes kept from this snapshot stay valid
+        merged.item_names, merged.units = list(self.item_names), list(self.units)
+        merged.canonical_names = dict(self.canonical_names)
+        item_index = {name: code for code, name in enumerate(merged.item_names)}
+        unit_index = {unit: code for code, unit in enumerate(merged.units)}
+
+        ingredient_columns = list(zip(*ingredient_rows)) or [()] * 7
+        row_recipe_ids, row_ids, item_names, units, quantities, canonical_ids, canonical_names = ingredient_columns
+        merged.canonical_names.update(
+            (canonical_id, name) for canonical_id, name in zip(canonical_ids, canonical_names) if canonical_id
+        )
+        columns = {
+            'ingredient_recipe_ids': (self.ingredient_recipe_ids, np.array(row_recipe_ids, dtype=np.int64)),
+            'ingredient_ids': (self.ingredient_ids, np.array(row_ids, dtype=np.int64)),
+            'item_codes': (self.item_codes, _encode(item_names, merged.item_names, item_index)),
+            'unit_codes': (self.unit_codes, _encode(units, merged.units, unit_index)),
+            'canonical_ids': (
+                self.canonical_ids, np.array([canonical_id or 0 for canonical_id in canonical_ids], dtype=np.int64)
+            ),
+            'quantities': (self.quantities, np.array(quantities, dtype=np.float64)),
+        }
+        columns = {name: np.concatenate([kept[keep_rows], new]) for name, (kept, new) in columns.items()}
+        order = np.lexsort((columns['ingredient_ids'], columns['ingredient_recipe_ids']))
+        for name, column in columns.items():
+            setattr(merged, name, column[order])
+
+        merged._index()
+        return merged
+
+    def _index(self):
+        """Derived arrays: per-recipe offsets, name order and countable vocabulary entries."""
+        self.offsets = np.append(
+            np.searchsorted(self.ingredient_recipe_ids, self.recipe_ids, side='left'), len(self.ingredient_ids)
+        ).astype(np.int64)
+        self.name_order = np.argsort(self.names, kind='stable') if len(self.names) else np.empty(0, dtype=np.int64)
+        self.countable_items = np.array([bool(name) for name in self.item_names], dtype=bool)
+        self.countable_units = np.array([bool(unit) for unit in self.units], dtype=bool)
+        self.latest_update = max((value for value in self.updated_at if value is not None), default=None)
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def _positions(self, recipe_ids):
+        """Positions of `recipe_ids` in the recipe arrays, -1 where missing."""
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        positions = np.searchsorted(self.recipe_ids, recipe_ids)
+        found = positions < len(self.recipe_ids)
+        found[found] = self.recipe_ids[positions[found]] == recipe_ids[found]
+        return np.where(found, positions, -1)
+
+    def listing(self):
+        """Every recipe's id, name, cook time and servings ordered by name, like GET /api/recipes."""
+        return [
+            {
+                'id': int(self.recipe_ids[position]),
+                'name': self.names[position],
+                'cook_time': None if np.isnan(self.cook_times[position]) else int(self.cook_times[position]),
+                'servings': None if np.isnan(self.servings[position]) else int(self.servings[position]),
+            }
+            for position in self.name_order
+        ]
+
+    def sum_meal_ingredients(self, meals):
+        """
+        Same result as database_utils.sum_meal_ingredients, computed on the arrays.
+
+        Returns:
+            dict: {(item_name, unit): quantity} ordered by the first meal using each item.
+
+        Raises:
+            ValueError: If a recipe ID or servings value is not numeric.
+        """
+        planned = planned_meals(meals)
+        if not planned:
+            return {}
+
+        requested = sorted({recipe_id for recipe_id, _ in planned})
+        recipe_servings = {
+            recipe_id: None if np.isnan(self.servings[position]) else self.servings[position]
+            for recipe_id, position in zip(requested, self._positions(requested)) if position >= 0
+        }
+        multipliers, first_meal = meal_multipliers(planned, recipe_servings)
+        if not multipliers:
+            return {}
+
+        recipe_ids = list(multipliers)
+        positions = self._positions(recipe_ids)
+        starts, ends = self.offsets[positions], self.offsets[positions + 1]
+        lengths = ends - starts
+        rows = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+        weights = np.repeat([multipliers[recipe_id] for recipe_id in recipe_ids], lengths)
+        meal_ranks = np.repeat([first_meal[recipe_id] for recipe_id in recipe_ids], lengths)
+
+        # Skip ingredients without a name, quantity or unit
+        quantities = self.quantities[rows]
+        countable = (
+            ~np.isnan(quantities)
+            & self.countable_items[self.item_codes[rows]]
+            & self.countable_units[self.unit_codes[rows]]
+        )
+        rows, weights, meal_ranks = rows[countable], weights[countable], meal_ranks[countable]
+        if not len(rows):
+            return {}
+
+        # One group per (canonical id, unit); ingredients without a canonical id group by raw name
+        canonical_ids = self.canonical_ids[rows]
+        items = np.where(canonical_ids > 0, canonical_ids, -(self.item_codes[rows].astype(np.int64) + 1))
+        groups, inverse = np.unique(np.stack([items, self.unit_codes[rows]], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        totals = np.bincount(inverse, weights=self.quantities[rows] * weights, minlength=len(groups))
+
+        first_ranks = np.full(len(groups), np.iinfo(np.int64).max)
+        np.minimum.at(first_ranks, inverse, meal_ranks)
+        first_ids = np.full(len(groups), np.iinfo(np.int64).max)
+        np.minimum.at(first_ids, inverse, self.ingredient_ids[rows])
+
+        result = {}
+        for group in np.lexsort((first_ids, first_ranks)):
+            item, unit_code = groups[group]
+            name = self.canonical_names[int(item)] if item > 0 else self.item_names[-int(item) - 1]
+            result[(name, self.units[unit_code])] = float(totals[group])
+        return result
+
+
+def get_recipe_catalogue():
+    """
+    The current app's catalogue with all logged changes applied, or None when
+    RECIPE_CATALOGUE_ENABLED is off.
+    """
+    if not current_app.config.get('RECIPE_CATALOGUE_ENABLED'):
+        return None
+    catalogue = current_app.extensions.get('recipe_catalogue')
+    if catalogue is None:
+        refreshed = RecipeCatalogue.load()
+    else:
+        refreshed = catalogue.refresh()
+    if refreshed is not catalogue:
+        with _lock:
+            current = current_app.extensions.get('recipe_catalogue')
+            # Another request may have applied newer changes meanwhile
+            if current is None or current.version < refreshed.version:
+                current_app.extensions['recipe_catalogue'] = refreshed
+    return refreshed
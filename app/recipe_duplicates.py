@@ -0,0 +1,249 @@
+"""
+Near-duplicate recipes by MinHash and locality-sensitive hashing.
+
+Each recipe is reduced to a set of tokens, its canonical ingredient keys
+and the words of its title, and summarized by a MinHash signature of
+NUM_PERM values: two recipes agree on a signature position with
+probability equal to the Jaccard similarity of their token sets.
+
+The signature is cut into BANDS bands of ROWS values and each band is
+hashed into a bucket. Recipes sharing any bucket are candidates, and only
+candidates are compared, so finding the duplicates of one recipe is an
+indexed lookup and the full report is roughly linear in the catalogue
+rather than a comparison of every pair. With 16 bands of 4 rows, pairs
+above about 0.5 similarity almost always share a bucket; candidates are
+then kept when their estimated similarity reaches the threshold
+(DUPLICATE_THRESHOLD, default 0.7).
+
+Signatures are stored in recipe_signature and the buckets in
+recipe_signature_band when a recipe is saved; new recipes are returned
+with their likely duplicates. Fill both tables for existing recipes and
+list the duplicates with:
+    flask --app run rebuild-recipe-signatures
+    flask --app run find-duplicate-recipes [--threshold 0.8]
+"""
+import hashlib
+from collections import defaultdict
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import insert
+from sqlalchemy.orm import aliased
+
+from app.canonical import WORD_PATTERN, canonical_key, singularize
+from app.models import db, CanonicalIngredient, Ingredient, Recipe, RecipeSignature, RecipeSignatureBand
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Multiply-shift hash functions, one per signature value. Fixed seed: stored
+# signatures must stay comparable across processes and restarts.
+_rng = np.random.default_rng(20240517)
+_A = _rng.integers(0, 1 << 63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)  # Odd
+_B = _rng.integers(0, 1 << 63, size=NUM_PERM, dtype=np.uint64)
+
+
+def _threshold(threshold):
+    if threshold is None:
+        threshold = current_app.config.get('DUPLICATE_THRESHOLD', 0.7)
+    return float(threshold)
+
+
+def recipe_tokens(name, ingredient_keys):
+    """Token set of a recipe: "i:" + each ingredient key and "t:" + each title word (numbers dropped)."""
+    tokens = {f"i:{key}" for key in ingredient_keys if key}
+    tokens.update(f"t:{singularize(word)}" for word in WORD_PATTERN.findall((name or '').lower()) if not word.isdigit())
+    return tokens
+
+
+def minhash(tokens):
+    """uint32 signature of NUM_PERM values, or None for an empty token set."""
+    if not tokens:
+        return None
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(token.encode(), digest_size=4).digest(), 'little') for token in tokens],
+        dtype=np.uint64
+    )
+    # High 32 bits of (a * x + b) mod 2**64 for every hash function and token
+    permuted = (_A[:, None] * hashes[None, :] + _B[:, None]) >> np.uint64(32)
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_buckets(signature):
+    """Signed 64-bit bucket of each band."""
+    return [
+        int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), 'little', signed=True)
+        for band in signature.reshape(BANDS, ROWS)
+    ]
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(signature == other)) / NUM_PERM
+
+
+def _decode(blob):
+    return np.frombuffer(blob, dtype='<u4')
+
+
+def compute_recipe_signatures(recipe_ids):
+    """{recipe_id: signature} for the recipes that exist and have any tokens, in one query."""
+    rows = (
+        db.session.query(Recipe.id, Recipe.name, Ingredient.item_name, CanonicalIngredient.key)
+        .outerjoin(Ingredient, Ingredient.recipe_id == Recipe.id)
+        .outerjoin(CanonicalIngredient, CanonicalIngredient.id == Ingredient.canonical_id)
+        .filter(Recipe.id.in_(recipe_ids))
+    )
+    names, keys = {}, defaultdict(set)
+    for recipe_id, name, item_name, key in rows:
+        names[recipe_id] = name
+        if item_name is not None:
+            keys[recipe_id].add(key or canonical_key(item_name))  # Rows saved before canonical ids existed
+
+    signatures = {}
+    for recipe_id, name in names.items():
+        signature = minhash(recipe_tokens(name, keys[recipe_id]))
+        if signature is not None:
+            signatures[recipe_id] = signature
+    return signatures
+
+
+def update_recipe_signatures(recipe_ids):
+    """Recompute and store the signatures and buckets of `recipe_ids` in the current transaction."""
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    signatures = compute_recipe_signatures(recipe_ids)
+    # Buckets go with their signature (ON DELETE CASCADE)
+    RecipeSignature.query.filter(RecipeSignature.recipe_id.in_(recipe_ids)).delete(synchronize_session=False)
+    if not signatures:
+        return
+    db.session.execute(insert(RecipeSignature), [
+        {'recipe_id': recipe_id, 'signature': signature.astype('<u4').tobytes()}
+        for recipe_id, signature in signatures.items()
+    ])
+    db.session.execute(insert(RecipeSignatureBand), [
+        {'recipe_id': recipe_id, 'band': band, 'bucket': bucket}
+        for recipe_id, signature in signatures.items()
+        for band, bucket in enumerate(band_buckets(signature))
+    ])
+
+
+def rebuild_recipe_signatures(batch_size=500):
+    """Recompute every recipe's signature in batches; returns the number of recipes."""
+    recipe_ids = [recipe_id for (recipe_id,) in db.session.query(Recipe.id).order_by(Recipe.id)]
+    for start in range(0, len(recipe_ids), batch_size):
+        update_recipe_signatures(recipe_ids[start:start + batch_size])
+    return len(recipe_ids)
+
+
+def find_recipe_duplicates(recipe_id, threshold=None):
+    """
+    Stored recipes that are likely duplicates of `recipe_id`, in one query.
+
+    Returns:
+        list[dict]: {'id', 'name', 'similarity'}, most similar first.
+    """
+    threshold = _threshold(threshold)
+    own, shared = aliased(RecipeSignatureBand), aliased(RecipeSignatureBand)
+    candidates = (
+        db.session.query(shared.recipe_id)
+        .join(own, (own.band == shared.band) & (own.bucket == shared.bucket))
+        .filter(own.recipe_id == recipe_id)
+    )
+    rows = (
+        db.session.query(Recipe.id, Recipe.name, RecipeSignature.signature)
+        .join(RecipeSignature, RecipeSignature.recipe_id == Recipe.id)
+        .filter(Recipe.id.in_(candidates))
+        .all()
+    )
+    signatures = {candidate_id: _decode(signature) for candidate_id, _, signature in rows}
+    signature = signatures.pop(recipe_id, None)  # The recipe shares all of its own buckets
+    if signature is None:
+        return []
+
+    duplicates = []
+    for candidate_id, name, _ in rows:
+        if candidate_id in signatures:
+            score = similarity(signature, signatures[candidate_id])
+            if score >= threshold:
+                duplicates.append({'id': candidate_id, 'name': name, 'similarity': round(score, 3)})
+    duplicates.sort(key=lambda duplicate: (-duplicate['similarity'], duplicate['id']))
+    return duplicates
+
+
+def duplicate_report(threshold=None, limit=None):
+    """
+    Every pair of likely duplicate recipes.
+
+    Candidate pairs come from a self-join of the bucket index, so only
+    recipes sharing a bucket are compared.
+
+    Returns:
+        list[dict]: {'ids': [first, second], 'names': [...], 'similarity'},
+            most similar first, at most `limit` pairs.
+    """
+    threshold = _threshold(threshold)
+    first, second = aliased(RecipeSignatureBand), aliased(RecipeSignatureBand)
+    pairs = (
+        db.session.query(first.recipe_id, second.recipe_id)
+        .join(second, (second.band == first.band) & (second.bucket == first.bucket))
+        .filter(first.recipe_id < second.recipe_id)
+        .distinct()
+        .all()
+    )
+    if not pairs:
+        return []
+
+    recipe_ids = {recipe_id for pair in pairs for recipe_id in pair}
+    names, signatures = {}, {}
+    rows = (
+        db.session.query(Recipe.id, Recipe.name, RecipeSignature.signature)
+        .join(RecipeSignature, RecipeSignature.recipe_id == Recipe.id)
+        .filter(Recipe.id.in_(recipe_ids))
+    )
+    for recipe_id, name, signature in rows:
+        names[recipe_id], signatures[recipe_id] = name, _decode(signature)
+
+    report = []
+    for first_id, second_id in pairs:
+        score = similarity(signatures[first_id], signatures[second_id])
+        if score >= threshold:
+            report.append({
+                'ids': [first_id, second_id],
+                'names': [names[first_id], names[second_id]],
+                'similarity': round(score, 3),
+            })
+    report.sort(key=lambda pair: (-pair['similarity'], pair['ids']))
+    return report[:limit] if limit else report
+
+
+@click.command('rebuild-recipe-signatures')
+@with_appcontext
+def rebuild_recipe_signatures_command():
+    """Recompute every recipe's MinHash signature and buckets."""
+    recipes = rebuild_recipe_signatures()
+    db.session.commit()
+    click.echo(f"Recomputed signatures for {recipes} recipes")
+
+
+@click.command('find-duplicate-recipes')
+@click.option('--threshold', type=float, default=None, help="Minimum estimated similarity (default DUPLICATE_THRESHOLD)")
+@click.option('--limit', type=int, default=None, help="Show at most this many pairs")
+@with_appcontext
+def find_duplicate_recipes_command(threshold, limit):
+    """List pairs of recipes that are likely duplicates."""
+    report = duplicate_report(threshold, limit)
+    for pair in report:
+        (first_id, second_id), (first_name, second_name) = pair['ids'], pair['names']
+        click.echo(f"{pair['similarity']:.2f}  #{first_id} {first_name}  ~  #{second_id} {second_name}")
+    click.echo(f"{len(report)} likely duplicate pairs")
+
+
+def init_app(app):
+    """Register the rebuild-recipe-signatures and find-duplicate-recipes commands."""
+    app.cli.add_command(rebuild_recipe_signatures_command)
+    app.cli.add_command(find_duplicate_recipes_command)
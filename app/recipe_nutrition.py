@@ -0,0 +1,281 @@
+"""
+Per-recipe nutrient vectors and nutrient-constrained search.
+
+When a recipe is saved, update_recipe_nutrition converts each ingredient to
+grams and multiplies by its USDA food's nutrients per 100 g:
+
+    food      CanonicalIngredient.fdc_id, matched by the rebuild command
+              below (see canonical.match_usda_foods); ingredients new to
+              the catalogue have no food until it runs
+    grams     mass units by fixed factors; household measures ("Cup",
+              "Piece", unitless counts) by the food's USDA food_portion
+    amounts   the memory-mapped nutrient matrix when it is built, else the
+              nutrient table; nutrients are picked by name and unit, since
+              USDA lists Energy both in kcal and in kJ
+
+Per-serving totals go to the indexed recipe_nutrition table, so a search
+such as "under 600 kcal with over 30 g protein" is a set of range filters
+and never computes nutrition at request time. Ingredients without a food or
+gram weight, and foods without an Energy amount in kcal, are left out and
+counted in matched_ingredients.
+
+Match new canonical ingredients and recompute everything (e.g. nightly, or
+after loading new USDA data) with:
+    flask --app run rebuild-recipe-nutrition
+"""
+from collections import defaultdict
+import logging
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert, update
+
+from app.canonical import match_usda_foods
+from app.models import (
+    db, CanonicalIngredient, FoodPortion, Ingredient, MeasureUnit, Nutrient, Recipe, RecipeNutrition,
+)
+from app.nutrient_matrix import get_nutrient_matrix
+
+logger = logging.getLogger(__name__)
+
+# recipe_nutrition column -> USDA nutrient (name, unit_name)
+NUTRIENT_COLUMNS = {
+    'calories': ("Energy", "KCAL"),
+    'protein': ("Protein", "G"),
+    'fat': ("Total lipid (fat)", "G"),
+    'carbohydrate': ("Carbohydrate, by difference", "G"),
+}
+
+GRAMS_PER_UNIT = {
+    "Gram (g)": 1,
+    "Kilogram (kg)": 1000,
+    "Milligram (mg)": 0.001,
+    "Ounce (oz)": 28.3495,
+    "Pound (lb)": 453.592,
+}
+
+# App units weighed through USDA household measures, in order of preference
+PORTION_UNITS = {
+    "Cup": ("cup",),
+    "Tablespoon (tbsp)": ("tablespoon",),
+    "Teaspoon (tsp)": ("teaspoon",),
+    "Liter (l)": ("liter",),
+    "Milliliter (ml)": ("milliliter",),
+    "Piece": ("piece", "each", "medium", "unit"),
+    "unitless": ("each", "medium", "piece", "unit"),
+    "": ("each", "medium", "piece", "unit"),
+    "Stick": ("stick",),
+    "Can": ("can",),
+    "Packet": ("packet",),
+}
+
+
+def _portion_weights(fdc_ids, units):
+    """{(fdc_id, measure unit name): grams per unit} for the foods and app units given."""
+    names = {name for unit in units for name in PORTION_UNITS.get(unit or '', ())}
+    if not fdc_ids or not names:
+        return {}
+    weights = {}
+    portions = (
+        db.session.query(FoodPortion.fdc_id, MeasureUnit.name, FoodPortion.amount, FoodPortion.gram_weight)
+        .join(MeasureUnit, MeasureUnit.id == FoodPortion.measure_unit_id)
+        .filter(FoodPortion.fdc_id.in_(fdc_ids), MeasureUnit.name.in_(names), FoodPortion.gram_weight.isnot(None))
+        .order_by(FoodPortion.id)
+    )
+    for fdc_id, name, amount, gram_weight in portions:
+        weights.setdefault((fdc_id, name), gram_weight / (amount or 1))
+    return weights
+
+
+def _nutrients_per_100g(fdc_ids):
+    """
+    {fdc_id: {column: amount per 100 g}}, from the nutrient matrix when it has
+    been built. Foods without Energy in kcal are left out: counting them would
+    understate calories, and kJ amounts are not calories.
+    """
+    if not fdc_ids:
+        return {}
+    columns = {nutrient: column for column, nutrient in NUTRIENT_COLUMNS.items()}
+    matrix = get_nutrient_matrix()
+    if matrix is not None and all(nutrient in matrix.columns for nutrient in columns):
+        found = matrix.lookup(sorted(fdc_ids), list(columns))
+        amounts = {
+            fdc_id: {columns[nutrient]: amount for nutrient, amount in nutrients.items()}
+            for fdc_id, nutrients in found.items()
+        }
+    else:
+        amounts = defaultdict(dict)
+        rows = (
+            db.session.query(Nutrient.food_id, Nutrient.name, Nutrient.unit_name, Nutrient.amount_per_100g)
+            .filter(
+                Nutrient.food_id.in_(fdc_ids), Nutrient.name.in_({name for name, _ in columns}),
+                Nutrient.amount_per_100g.isnot(None),
+            )
+        )
+        for fdc_id, name, unit_name, amount in rows:
+            if (name, unit_name) in columns:
+                amounts[fdc_id][columns[name, unit_name]] = amount
+
+    without_kcal = sorted(fdc_id for fdc_id, nutrients in amounts.items() if 'calories' not in nutrients)
+    if without_kcal:
+        logger.warning(f"Leaving out USDA foods without Energy in kcal: {without_kcal}")
+    return {fdc_id: nutrients for fdc_id, nutrients in amounts.items() if 'calories' in nutrients}
+
+
+def grams(quantity, unit, fdc_id, portion_weights):
+    """Weight of an ingredient in grams, or None if it cannot be determined."""
+    if quantity is None:
+        return None
+    if unit in GRAMS_PER_UNIT:
+        return quantity * GRAMS_PER_UNIT[unit]
+    for name in PORTION_UNITS.get(unit or '', ()):
+        weight = portion_weights.get((fdc_id, name))
+        if weight is not None:
+            return quantity * weight
+    return None
+
+
+def compute_recipe_nutrition(recipe_ids):
+    """
+    Per-serving nutrient totals of many recipes, in at most three queries.
+
+    Returns:
+        list[dict]: recipe_nutrition rows for the recipes that exist.
+    """
+    rows = (
+        db.session.query(
+            Recipe.id, Recipe.servings, Ingredient.id, Ingredient.quantity, Ingredient.unit, CanonicalIngredient.fdc_id
+        )
+        .outerjoin(Ingredient, Ingredient.recipe_id == Recipe.id)
+        .outerjoin(CanonicalIngredient, CanonicalIngredient.id == Ingredient.canonical_id)
+        .filter(Recipe.id.in_(recipe_ids))
+        .all()
+    )
+    fdc_ids = {fdc_id for *_, fdc_id in rows if fdc_id}
+    portion_weights = _portion_weights(fdc_ids, {row[4] for row in rows if row[4] not in GRAMS_PER_UNIT})
+    nutrients = _nutrients_per_100g(fdc_ids)
+
+    results = {}
+    for recipe_id, servings, ingredient_id, quantity, unit, fdc_id in rows:
+        result = results.setdefault(recipe_id, {
+            'recipe_id': recipe_id, **{column: 0.0 for column in NUTRIENT_COLUMNS},
+            'matched_ingredients': 0, 'ingredient_count': 0, 'servings': servings or 1,
+        })
+        if ingredient_id is None:
+            continue  # Outer join row of a recipe without ingredients
+        result['ingredient_count'] += 1
+        weight = grams(quantity, unit, fdc_id, portion_weights) if fdc_id in nutrients else None
+        if weight is None:
+            continue
+        result['matched_ingredients'] += 1
+        for column, amount in nutrients[fdc_id].items():
+            result[column] += weight / 100 * amount
+
+    for result in results.values():
+        servings = result.pop('servings')
+        for column in NUTRIENT_COLUMNS:
+            result[column] = round(result[column] / servings, 2)
+    return list(results.values())
+
+
+def update_recipe_nutrition(recipe_ids):
+    """Recompute and store the nutrient vectors of `recipe_ids` in the current transaction."""
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    rows = compute_recipe_nutrition(recipe_ids)
+    RecipeNutrition.query.filter(RecipeNutrition.recipe_id.in_(recipe_ids)).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(insert(RecipeNutrition), rows)
+
+
+def rebuild_recipe_nutrition(batch_size=500):
+    """
+    Match canonical ingredients without a USDA food, then recompute every
+    recipe's vector in batches.
+
+    Returns:
+        tuple: (canonical ingredients matched, recipes updated)
+    """
+    unmatched = dict(db.session.query(CanonicalIngredient.key, CanonicalIngredient.id).filter(
+        CanonicalIngredient.fdc_id.is_(None)
+    ))
+    matches = match_usda_foods(unmatched)
+    if matches:
+        db.session.execute(update(CanonicalIngredient), [
+            {'id': unmatched[key], 'fdc_id': fdc_id} for key, fdc_id in matches.items()
+        ])
+
+    recipe_ids = [recipe_id for (recipe_id,) in db.session.query(Recipe.id).order_by(Recipe.id)]
+    for start in range(0, len(recipe_ids), batch_size):
+        update_recipe_nutrition(recipe_ids[start:start + batch_size])
+    return len(matches), len(recipe_ids)
+
+
+SORT_ORDERS = ('asc', 'desc')
+
+
+def search_recipes(ranges, sort='calories', order='asc', page=1, per_page=20):
+    """
+    Recipes whose per-serving nutrients fall in every range.
+
+    Args:
+        ranges (dict): {column: (minimum or None, maximum or None)}, inclusive.
+        sort (str): NUTRIENT_COLUMNS entry to order by; ties go by recipe id.
+
+    Returns:
+        tuple: (total matching recipes, list of result dicts for the page)
+
+    Raises:
+        ValueError: On an unknown column or sort order.
+    """
+    unknown = (set(ranges) | {sort}) - set(NUTRIENT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown nutrients: {', '.join(sorted(unknown))}")
+    if order not in SORT_ORDERS:
+        raise ValueError(f"Order must be one of {', '.join(SORT_ORDERS)}")
+
+    # Recipes without any matched ingredient would satisfy every "under" constraint
+    filters = [RecipeNutrition.matched_ingredients > 0]
+    for column, (minimum, maximum) in ranges.items():
+        if minimum is not None:
+            filters.append(getattr(RecipeNutrition, column) >= minimum)
+        if maximum is not None:
+            filters.append(getattr(RecipeNutrition, column) <= maximum)
+
+    total = db.session.query(func.count(RecipeNutrition.recipe_id)).filter(*filters).scalar()
+    sort_column = getattr(RecipeNutrition, sort)
+    rows = (
+        db.session.query(Recipe.id, Recipe.name, Recipe.servings, RecipeNutrition)
+        .join(RecipeNutrition, RecipeNutrition.recipe_id == Recipe.id)
+        .filter(*filters)
+        .order_by(sort_column.desc() if order == 'desc' else sort_column, Recipe.id)
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+        .all()
+    )
+    return total, [
+        {
+            'id': recipe_id,
+            'name': name,
+            'servings': servings,
+            'nutrition': {column: getattr(nutrition, column) for column in NUTRIENT_COLUMNS},
+            'matched_ingredients': nutrition.matched_ingredients,
+            'ingredient_count': nutrition.ingredient_count,
+        }
+        for recipe_id, name, servings, nutrition in rows
+    ]
+
+
+@click.command('rebuild-recipe-nutrition')
+@with_appcontext
+def rebuild_recipe_nutrition_command():
+    """Match ingredients to USDA foods and recompute every recipe's nutrients."""
+    matched, recipes = rebuild_recipe_nutrition()
+    db.session.commit()
+    click.echo(f"Matched {matched} ingredients to USDA foods; recomputed nutrition for {recipes} recipes")
+
+
+def init_app(app):
+    """Register the rebuild-recipe-nutrition command."""
+    app.cli.add_command(rebuild_recipe_nutrition_command)
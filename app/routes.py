@@ -1,12 +1,37 @@
 from fractions import Fraction
 import logging
-from flask import Blueprint, jsonify, request, render_template, current_app
+from flask import Blueprint, Response, jsonify, request, render_template, current_app, stream_template, stream_with_context
+from werkzeug.exceptions import HTTPException
 from app.utils import parse_ingredients  # Importing the missing function
 from app import db
-from app.utils import convert_to_base_unit
+from app.utils import convert_to_base_unit, iter_grocery_list_lines
+from app.database_utils import (
+    DAYS_OF_WEEK, RECIPE_FIELDS, copy_plan_slots, fetch_recipes, iter_plan_grocery_rows, parse_plan_meals, save_plan_slots,
+    sum_meal_ingredients, sum_plan_ingredients,
+)
+from app.caching import conditional_json, make_etag, not_modified, plan_version, recipe_listing_version
+from app.canonical import resolve_canonical_ids
+from app.categorizer import get_categorizer
+from app.nutrient_matrix import get_nutrient_matrix
+from app.plan_generator import DEFAULT_ITERATIONS, generate_plan
+from app.plan_import import import_weekly_plan
+from app.recipe_duplicates import duplicate_report, find_recipe_duplicates, update_recipe_signatures
+from app.recipe_nutrition import NUTRIENT_COLUMNS, search_recipes, update_recipe_nutrition
+from app.similar_recipes import similar_recipes
+from app.recipe_catalogue import get_recipe_catalogue, record_recipe_changes
+from app.typeahead import KINDS as TYPEAHEAD_KINDS, invalidate_typeahead, suggest
+from app.store_layouts import (
+    categorize_items, get_store_layout, invalidate_store_layouts, normalize_item_name, record_store_changes
+)
+from app.plan_aggregates import apply_slot_change, copy_plan_aggregate, ensure_plan_aggregate, invalidate_plan_aggregates
 from datetime import datetime
 from app.models import Store, Section, IngredientSection, Ingredient, Recipe, WeeklyPlan, MealSlot
 from collections import defaultdict
+import csv
+import io
+from itertools import groupby
+from sqlalchemy import func, insert, or_, update
+from sqlalchemy.orm import selectinload
 
 
 # Configure logging
@@ -87,16 +112,234 @@ def get_recipe(recipe_id):
     """
     try:
         recipe = Recipe.query.get_or_404(recipe_id)  # Fetch recipe or return 404 if not found
-        return jsonify({
+        etag = make_etag('recipe', recipe.id, recipe.updated_at)
+        cached = not_modified(etag, recipe.updated_at)
+        if cached:
+            return cached
+        return conditional_json({
             **recipe.to_dict(),
             'ingredients': [ingredient.to_dict() for ingredient in recipe.ingredients]
-        })
+        }, etag, recipe.updated_at)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching recipe with ID {recipe_id}: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
 
+def save_recipe_ingredients(recipe, ingredients_data):
+    """
+    Sync a recipe's ingredients with the submitted list.
+
+    Existing ingredients are loaded once and updated in place, new ones are
+    bulk-inserted and anything missing from the payload is deleted, so the
+    number of statements does not grow with the ingredient count. Canonical
+    ids for all names are resolved together up front.
+    """
+    existing = {ingredient.id: ingredient for ingredient in recipe.ingredients}
+    canonical_ids = resolve_canonical_ids(ingredient_data['item_name'] for ingredient_data in ingredients_data)
+    kept_ids = set()
+    new_rows = []
+
+    for ingredient_data in ingredients_data:
+        logger.debug(f"Processing ingredient data: {ingredient_data}")
+        fields = {
+            'item_name': ingredient_data['item_name'],
+            'canonical_id': canonical_ids.get(ingredient_data['item_name']),
+            'quantity': float(Fraction(ingredient_data['quantity'])) if ingredient_data['quantity'] else None,
+            'original_quantity': ingredient_data.get('quantity', ''),
+            'unit': ingredient_data.get('unit', ''),
+            'size': ingredient_data.get('size', ''),
+            'descriptor': ingredient_data.get('descriptor', ''),
+            'additional_descriptor': ingredient_data.get('additional_descriptor', ''),
+        }
+        ingredient = existing.get(ingredient_data.get('id'))
+        if ingredient:
+            for field, value in fields.items():
+                setattr(ingredient, field, value)
+            kept_ids.add(ingredient.id)
+        else:
+            new_rows.append(fields)
+
+    if new_rows:
+        db.session.flush()  # Assigns the ID of a new recipe
+        db.session.execute(
+            insert(Ingredient).execution_options(render_nulls=True),  # Keep rows with NULL quantities in one batch
+            [{'recipe_id': recipe.id, **fields} for fields in new_rows]
+        )
+
+    # Remove ingredients that are no longer part of the recipe
+    stale_ids = set(existing) - kept_ids
+    if stale_ids:
+        Ingredient.query.filter(Ingredient.id.in_(stale_ids)).delete(synchronize_session=False)
+
+
+MAX_BATCH_RECIPES = 200
+
+
+def batch_recipes_response(raw_ids, raw_fields):
+    """
+    Validate a batch request and return the requested recipes.
+
+    Responds with {"recipes": [...], "missing": [...]} in the requested order.
+    """
+    try:
+        recipe_ids = [int(recipe_id) for recipe_id in raw_ids]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Recipe IDs must be integers'}), 400
+    if not recipe_ids:
+        return jsonify({'error': 'No recipe IDs provided'}), 400
+    if len(recipe_ids) > MAX_BATCH_RECIPES:
+        return jsonify({'error': f'At most {MAX_BATCH_RECIPES} recipes can be fetched at once'}), 400
+
+    fields = raw_fields or RECIPE_FIELDS
+    unknown_fields = set(fields) - set(RECIPE_FIELDS) - {'id'}
+    if unknown_fields:
+        return jsonify({'error': f"Unknown fields: {', '.join(sorted(unknown_fields))}"}), 400
+
+    recipes, missing = fetch_recipes(recipe_ids, fields)
+    return jsonify({'recipes': recipes, 'missing': missing})
+
+
+@recipes_routes.route('/api/recipes/batch', methods=['POST'])
+def batch_recipes():
+    """
+    Fetch many recipes at once.
+
+    Body: {"ids": [1, 2, 3], "fields": ["name", "ingredients"]}; "fields" is optional.
+    """
+    try:
+        data = request.get_json() or {}
+        return batch_recipes_response(data.get('ids') or [], data.get('fields'))
+    except Exception as e:
+        logger.error(f"Error fetching recipe batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@recipes_routes.route('/api/recipes', methods=['GET'])
+def list_recipes():
+    """
+    List all recipes (id, name, cook time and servings) ordered by name.
+
+    With ?ids=1,2,3 (and optionally &fields=name,ingredients) returns those
+    recipes in one response instead, like POST /api/recipes/batch.
+    """
+    try:
+        if 'ids' in request.args:
+            fields = request.args.get('fields')
+            return batch_recipes_response(
+                [recipe_id for recipe_id in request.args['ids'].split(',') if recipe_id.strip()],
+                fields.split(',') if fields else None
+            )
+
+        catalogue = get_recipe_catalogue()
+        count, latest = (len(catalogue), catalogue.latest_update) if catalogue is not None else recipe_listing_version()
+        etag = make_etag('recipes', count, latest)
+        cached = not_modified(etag, latest)
+        if cached:
+            return cached
+
+        if catalogue is not None:
+            return conditional_json(catalogue.listing(), etag, latest)
+        rows = (
+            db.session.query(Recipe.id, Recipe.name, Recipe.cook_time, Recipe.servings)
+            .order_by(Recipe.name)
+            .all()
+        )
+        return conditional_json([
+            {'id': id, 'name': name, 'cook_time': cook_time, 'servings': servings}
+            for id, name, cook_time, servings in rows
+        ], etag, latest)
+    except Exception as e:
+        logger.error(f"Error listing recipes: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+MAX_SEARCH_PAGE_SIZE = 100
+
+
+@recipes_routes.route('/api/recipes/search', methods=['GET'])
+def search_recipes_by_nutrition():
+    """
+    Search recipes by per-serving nutrients.
+
+    Query: <nutrient>_min / <nutrient>_max for calories, protein, fat and
+    carbohydrate (e.g. ?calories_max=600&protein_min=30), plus sort
+    (a nutrient, default calories), order (asc/desc), page and per_page.
+    """
+    try:
+        try:
+            ranges = {}
+            for column in NUTRIENT_COLUMNS:
+                minimum, maximum = request.args.get(f'{column}_min'), request.args.get(f'{column}_max')
+                if minimum or maximum:
+                    ranges[column] = (float(minimum) if minimum else None, float(maximum) if maximum else None)
+            page = int(request.args.get('page', 1))
+            per_page = int(request.args.get('per_page', 20))
+        except ValueError:
+            return jsonify({'error': 'Nutrient bounds, page and per_page must be numbers'}), 400
+        if page < 1 or not 1 <= per_page <= MAX_SEARCH_PAGE_SIZE:
+            return jsonify({'error': f'page must be positive and per_page between 1 and {MAX_SEARCH_PAGE_SIZE}'}), 400
+
+        try:
+            total, recipes = search_recipes(
+                ranges, request.args.get('sort', 'calories'), request.args.get('order', 'asc'), page, per_page
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'recipes': recipes, 'total': total, 'page': page, 'per_page': per_page})
+    except Exception as e:
+        logger.error(f"Error searching recipes by nutrition: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@recipes_routes.route('/api/recipes/duplicates', methods=['GET'])
+def list_duplicate_recipes():
+    """
+    Pairs of recipes that are likely duplicates (see app/recipe_duplicates.py).
+
+    Query: threshold (estimated similarity, default DUPLICATE_THRESHOLD) and
+    limit (most pairs returned). With recipe_id, only that recipe's duplicates.
+    """
+    try:
+        try:
+            threshold = float(request.args['threshold']) if request.args.get('threshold') else None
+            limit = int(request.args['limit']) if request.args.get('limit') else None
+            recipe_id = int(request.args['recipe_id']) if request.args.get('recipe_id') else None
+        except ValueError:
+            return jsonify({'error': 'threshold, limit and recipe_id must be numbers'}), 400
+        if threshold is not None and not 0 < threshold <= 1:
+            return jsonify({'error': 'threshold must be between 0 and 1'}), 400
+
+        if recipe_id is not None:
+            return jsonify({'duplicates': find_recipe_duplicates(recipe_id, threshold)[:limit]})
+        return jsonify({'pairs': duplicate_report(threshold, limit)})
+    except Exception as e:
+        logger.error(f"Error listing duplicate recipes: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@recipes_routes.route('/api/recipes/<int:recipe_id>/similar', methods=['GET'])
+def get_similar_recipes(recipe_id):
+    """
+    Recipes sharing the most ingredients with this one, best first, as of the
+    last `flask refresh-similar-recipes` (see app/similar_recipes.py).
+
+    Query: limit (default all stored neighbours).
+    """
+    try:
+        try:
+            limit = int(request.args['limit']) if request.args.get('limit') else None
+        except ValueError:
+            return jsonify({'error': 'limit must be a number'}), 400
+        if not db.session.query(Recipe.id).filter_by(id=recipe_id).first():
+            return jsonify({'error': 'Recipe not found'}), 404
+        return jsonify({'recipe_id': recipe_id, 'similar': similar_recipes(recipe_id, limit)})
+    except Exception as e:
+        logger.error(f"Error listing similar recipes for {recipe_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
 
 @recipes_routes.route('/api/recipes', methods=['POST'])
 def add_recipe():
@@ -125,54 +368,28 @@ def add_recipe():
         new_recipe.cook_time = int(data['cook_time']) if data['cook_time'] else None
         new_recipe.servings = int(data['servings']) if data['servings'] else None
         new_recipe.instructions = data['instructions']
+        new_recipe.updated_at = datetime.utcnow()  # Ingredient-only edits must still change the validator
 
         # Handle ingredients
         if 'ingredients' in data and data['ingredients']:
-            # Track ingredient IDs that were updated or added
-            updated_ingredient_ids = []
-
-            for ingredient_data in data['ingredients']:
-                ingredient_id = ingredient_data.get('id')
-                if ingredient_id:
-                    # Update existing ingredient
-                    ingredient = Ingredient.query.get(ingredient_id)
-                    if ingredient:
-                        ingredient.item_name = ingredient_data['item_name']
-                        ingredient.quantity = float(Fraction(ingredient_data['quantity'])) if ingredient_data['quantity'] else None
-                        ingredient.original_quantity = ingredient_data.get('quantity', '')
-                        ingredient.unit = ingredient_data.get('unit', '')
-                        ingredient.size = ingredient_data.get('size', '')
-                        ingredient.descriptor = ingredient_data.get('descriptor', '')
-                        ingredient.additional_descriptor = ingredient_data.get('additional_descriptor', '')
-                        updated_ingredient_ids.append(ingredient.id)
-                else:
-                    # Add new ingredient
-                    ingredient = Ingredient(
-                        recipe=new_recipe,
-                        item_name=ingredient_data['item_name'],
-                        quantity=float(Fraction(ingredient_data['quantity'])) if ingredient_data['quantity'] else None,
-                        original_quantity=ingredient_data.get('quantity', ''),
-                        unit=ingredient_data.get('unit', ''),
-                        size=ingredient_data.get('size', ''),
-                        descriptor=ingredient_data.get('descriptor', ''),
-                        additional_descriptor=ingredient_data.get('additional_descriptor', '')
-                    )
-                    db.session.add(ingredient)
-                    db.session.flush()  # Ensure we get the ID of the new ingredient
-                    updated_ingredient_ids.append(ingredient.id)
-
-            # Remove ingredients that are no longer part of the recipe
-            Ingredient.query.filter(
-                Ingredient.recipe_id == new_recipe.id,
-                ~Ingredient.id.in_(updated_ingredient_ids)
-            ).delete(synchronize_session=False)
+            save_recipe_ingredients(new_recipe, data['ingredients'])
+        if recipe_id:
+            invalidate_plan_aggregates(recipe_ids=[new_recipe.id])
+        db.session.flush()  # Assigns the ID of a new recipe without ingredients
+        record_recipe_changes([new_recipe.id])
+        update_recipe_nutrition([new_recipe.id])
+        update_recipe_signatures([new_recipe.id])
+        # Flag likely duplicates of new recipes, e.g. the same recipe imported twice
+        duplicates = [] if recipe_id else find_recipe_duplicates(new_recipe.id)
 
         # Commit changes
         db.session.commit()
+        invalidate_typeahead()
         logger.info(f"Recipe saved successfully: {new_recipe}")
         return jsonify({
             **new_recipe.to_dict(),
-            'ingredients': [ingredient.to_dict() for ingredient in new_recipe.ingredients]
+            'ingredients': [ingredient.to_dict() for ingredient in new_recipe.ingredients],
+            'possible_duplicates': duplicates,
         }), 201
 
     except Exception as e:
@@ -214,48 +431,18 @@ def update_recipe(recipe_id):
         recipe.cook_time = int(data['cook_time']) if data['cook_time'] else None
         recipe.servings = int(data['servings']) if data['servings'] else None
         recipe.instructions = data['instructions']
+        recipe.updated_at = datetime.utcnow()  # Ingredient-only edits must still change the validator
 
         # Process ingredients
-        updated_ingredient_ids = []
-        for ingredient_data in data['ingredients']:
-            logger.debug(f"Processing ingredient data: {ingredient_data}")
-            ingredient_id = ingredient_data.get('id')
-            if ingredient_id:
-                logger.debug(f"Existing ingredient ID: {ingredient_id}")
-                ingredient = Ingredient.query.get(ingredient_id)
-                if ingredient:
-                    ingredient.item_name = ingredient_data['item_name']
-                    ingredient.quantity = float(Fraction(ingredient_data['quantity'])) if ingredient_data['quantity'] else None
-                    ingredient.original_quantity = ingredient_data.get('quantity', '')
-                    ingredient.unit = ingredient_data.get('unit', '')
-                    ingredient.size = ingredient_data.get('size', '')
-                    ingredient.descriptor = ingredient_data.get('descriptor', '')
-                    ingredient.additional_descriptor = ingredient_data.get('additional_descriptor', '')
-                    updated_ingredient_ids.append(ingredient.id)
-            else:
-                logger.debug("New ingredient, no ID provided.")
-                ingredient = Ingredient(
-                    recipe=recipe,
-                    item_name=ingredient_data['item_name'],
-                    quantity=float(Fraction(ingredient_data['quantity'])) if ingredient_data['quantity'] else None,
-                    original_quantity=ingredient_data.get('quantity', ''),
-                    unit=ingredient_data.get('unit', ''),
-                    size=ingredient_data.get('size', ''),
-                    descriptor=ingredient_data.get('descriptor', ''),
-                    additional_descriptor=ingredient_data.get('additional_descriptor', '')
-                )
-                db.session.add(ingredient)
-                db.session.flush()
-                updated_ingredient_ids.append(ingredient.id)
-
-        # Remove ingredients not in the update
-        Ingredient.query.filter(
-            Ingredient.recipe_id == recipe.id,
-            ~Ingredient.id.in_(updated_ingredient_ids)
-        ).delete(synchronize_session=False)
+        save_recipe_ingredients(recipe, data['ingredients'])
+        invalidate_plan_aggregates(recipe_ids=[recipe.id])
+        record_recipe_changes([recipe.id])
+        update_recipe_nutrition([recipe.id])
+        update_recipe_signatures([recipe.id])
 
         # Commit changes
         db.session.commit()
+        invalidate_typeahead()
         logger.info(f"Recipe updated successfully: {recipe}")
         return jsonify({
             **recipe.to_dict(),
@@ -273,9 +460,16 @@ def update_recipe(recipe_id):
 @recipes_routes.route('/api/recipes/<int:recipe_id>', methods=['DELETE'])
 def delete_recipe(recipe_id):
     try:
-        recipe = Recipe.query.get_or_404(recipe_id)
-        db.session.delete(recipe)
+        invalidate_plan_aggregates(recipe_ids=[recipe_id])  # Before the slots lose their recipe
+        # Ingredients, their section assignments and the nutrition row are removed by
+        # ON DELETE CASCADE, and meal slots using the recipe are emptied, in this one statement
+        if not Recipe.query.filter_by(id=recipe_id).delete(synchronize_session=False):
+            db.session.rollback()
+            return jsonify({'error': 'Recipe not found'}), 404
+        record_recipe_changes([recipe_id])
         db.session.commit()
+        invalidate_typeahead()
+        invalidate_store_layouts()  # Layouts map the deleted ingredients' names to sections
         return jsonify({'message': 'Recipe deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -300,6 +494,10 @@ def save_weekly_plan():
 
         if not meals:
             return jsonify({"error": "No meals provided"}), 400
+        try:
+            slots = parse_plan_meals(meals)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         # Create and save the weekly plan
         weekly_plan = WeeklyPlan(name=name, created_at=datetime.utcnow())
@@ -309,25 +507,158 @@ def save_weekly_plan():
         db.session.flush()
 
         # Associate meals with the weekly plan
-        for meal in meals:
-            meal_slot = MealSlot(
-                weekly_plan_id=weekly_plan.id,  # Now `weekly_plan.id` is available
-                day=meal['day'],
-                meal_type=meal['meal_type'],
-                recipe_id=meal.get('recipe_id')
-            )
-            db.session.add(meal_slot)
+        weekly_plan_id = weekly_plan.id
+        save_plan_slots(weekly_plan_id, slots, is_new=True)
 
         # Commit all changes to the database
         db.session.commit()
 
-        return jsonify({"message": "Weekly plan saved successfully", "id": weekly_plan.id}), 201
+        return jsonify({"message": "Weekly plan saved successfully", "id": weekly_plan_id}), 201
 
     except Exception as e:
         logger.error(f"Error saving weekly plan: {e}")
+        db.session.rollback()
         return jsonify({"error": "An error occurred while saving the plan"}), 500
 
 
+@meal_planner_routes.route('/api/weekly_plan/import', methods=['POST'])
+def import_weekly_plan_route():
+    """
+    Create a weekly plan from recipe names.
+
+    Body: {"name": "...", "plan": {"Monday": {"Breakfast": "BRAISED SHORT RIBS", ...}, ...},
+           "skip_unknown": false}
+    Names are matched case-insensitively. Unknown names fail the import with
+    a 400 listing them, unless "skip_unknown" is set.
+    """
+    try:
+        data = request.get_json() or {}
+        name = data.get('name') or f"Imported Plan ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})"
+        try:
+            result = import_weekly_plan(data.get('plan'), name, bool(data.get('skip_unknown')))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if result['id'] is None:
+            db.session.rollback()
+            if result['unknown']:
+                return jsonify({"error": "Unknown recipe names", "unknown": result['unknown']}), 400
+            return jsonify({"error": "No meals provided"}), 400
+
+        db.session.commit()
+        return jsonify({"message": "Weekly plan imported successfully", **result}), 201
+
+    except Exception as e:
+        logger.error(f"Error importing weekly plan: {e}")
+        db.session.rollback()
+        return jsonify({"error": "An error occurred while importing the plan"}), 500
+
+
+@meal_planner_routes.route('/api/weekly_plan/generate', methods=['POST'])
+def generate_weekly_plan():
+    """
+    Fill a week's slots with recipes that share as many ingredients as possible
+    (see app/plan_generator.py).
+
+    Body (all optional):
+        {"days": ["Monday", ...], "meal_types": ["breakfast", "lunch", "dinner"],
+         "max_cook_time": 45 or {"breakfast": 15, "dinner": 60},
+         "required": [3, 7], "excluded": [12], "allow_repeats": false,
+         "objective": "items" or "leftovers", "iterations": 20000, "seed": 1,
+         "save": false, "name": "..."}
+    Returns the proposed meals and their grocery item count; with "save" the
+    plan is also created and its id returned.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            max_cook_time = data.get('max_cook_time')
+            if isinstance(max_cook_time, dict):
+                max_cook_time = {meal_type: int(limit) for meal_type, limit in max_cook_time.items()}
+            elif max_cook_time is not None:
+                max_cook_time = int(max_cook_time)
+            result = generate_plan(
+                days=data.get('days'),
+                meal_types=data.get('meal_types'),
+                max_cook_time=max_cook_time,
+                required=[int(recipe_id) for recipe_id in data.get('required') or []],
+                excluded=[int(recipe_id) for recipe_id in data.get('excluded') or []],
+                allow_repeats=bool(data.get('allow_repeats')),
+                objective=data.get('objective', 'items'),
+                iterations=int(data.get('iterations') or DEFAULT_ITERATIONS),
+                seed=data.get('seed'),
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+
+        if not data.get('save'):
+            return jsonify(result), 200
+
+        name = data.get('name') or f"Generated Plan ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})"
+        weekly_plan = WeeklyPlan(name=name, created_at=datetime.utcnow())
+        db.session.add(weekly_plan)
+        db.session.flush()
+        save_plan_slots(weekly_plan.id, parse_plan_meals(result['meals']), is_new=True)
+        db.session.commit()
+        return jsonify({"message": "Weekly plan generated successfully", "id": weekly_plan.id, **result}), 201
+
+    except Exception as e:
+        logger.error(f"Error generating weekly plan: {e}")
+        db.session.rollback()
+        return jsonify({"error": "An error occurred while generating the plan"}), 500
+
+
+@meal_planner_routes.route('/api/weekly_plan/<int:weekly_plan_id>', methods=['PUT'])
+def update_weekly_plan(weekly_plan_id):
+    """
+    Replace a weekly plan's meals, touching only the slots that changed.
+
+    Body: {"name": "...", "meals": [{"day": ..., "meal_type": ..., "recipe_id": ..., "servings": ...}]}.
+    Slots missing from "meals" are removed; "name" is optional.
+    """
+    try:
+        data = request.get_json() or {}
+        if 'meals' not in data:
+            return jsonify({"error": "No meals provided"}), 400
+        try:
+            slots = parse_plan_meals(data['meals'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        weekly_plan = db.session.get(WeeklyPlan, weekly_plan_id)
+        if not weekly_plan:
+            return jsonify({"error": f"Weekly plan {weekly_plan_id} not found"}), 404
+
+        changes = save_plan_slots(weekly_plan.id, slots)
+        if any(changes.values()):
+            invalidate_plan_aggregates(weekly_plan_ids=[weekly_plan.id])
+        if data.get('name'):
+            weekly_plan.name = data['name']
+        weekly_plan.updated_at = datetime.utcnow()
+        db.session.commit()
+
+        return jsonify({"message": "Weekly plan updated successfully", "id": weekly_plan_id, **changes}), 200
+
+    except Exception as e:
+        logger.error(f"Error updating weekly plan {weekly_plan_id}: {e}")
+        db.session.rollback()
+        return jsonify({"error": "An error occurred while updating the plan"}), 500
+
+
+
+@meal_planner_routes.route('/api/weekly_plan/<int:weekly_plan_id>', methods=['DELETE'])
+def delete_weekly_plan(weekly_plan_id):
+    """Delete a weekly plan or template; its meal slots and stored grocery list go with it (ON DELETE CASCADE)."""
+    try:
+        if not WeeklyPlan.query.filter_by(id=weekly_plan_id).delete(synchronize_session=False):
+            return jsonify({"error": f"Weekly plan {weekly_plan_id} not found"}), 404
+        db.session.commit()
+        return jsonify({"message": "Weekly plan deleted successfully"}), 200
+    except Exception as e:
+        logger.error(f"Error deleting weekly plan {weekly_plan_id}: {e}")
+        db.session.rollback()
+        return jsonify({"error": "An error occurred while deleting the plan"}), 500
+
 
 def normalize_unit(unit):
     """Normalize units based on unit categories."""
@@ -392,12 +723,192 @@ def normalize_unit(unit):
 def list_weekly_plans():
     """List all weekly plans."""
     try:
-        plans = WeeklyPlan.query.all()
+        plans = WeeklyPlan.query.filter_by(is_template=False).all()
         return jsonify([{"id": plan.id, "name": plan.name} for plan in plans]), 200
     except Exception as e:
         logger.error(f"Error fetching weekly plans: {e}")
         return jsonify({"error": "An error occurred while fetching weekly plans."}), 500
 
+
+@meal_planner_routes.route('/api/plan_templates', methods=['GET'])
+def list_plan_templates():
+    """List plan templates. Clone a template to start a new plan from it."""
+    try:
+        templates = WeeklyPlan.query.filter_by(is_template=True).order_by(WeeklyPlan.name).all()
+        return jsonify([{"id": template.id, "name": template.name} for template in templates]), 200
+    except Exception as e:
+        logger.error(f"Error fetching plan templates: {e}")
+        return jsonify({"error": "An error occurred while fetching plan templates."}), 500
+
+
+EXPORT_FORMATS = {'text': ('text/plain', 'txt'), 'csv': ('text/csv', 'csv'), 'html': ('text/html', 'html')}
+
+
+def _grocery_items(rows):
+    for _, item_name, unit, quantity in rows:
+        yield {'item_name': item_name, 'unit': unit, 'quantity': quantity}
+
+
+def _grocery_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['section', 'item_name', 'quantity', 'unit'])
+    for section_name, item_name, unit, quantity in rows:
+        writer.writerow([section_name or '', item_name, round(quantity, 2), unit])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+@meal_planner_routes.route('/api/grocery_list/export', methods=['GET'])
+def export_grocery_list():
+    """
+    Download a plan's grocery list as text, CSV or a printable HTML page.
+
+    Query: weekly_plan_id (required), format=text|csv|html (default text) and
+    store_id (section grouping, defaults to the default store). The body is
+    streamed while the list is read from the database.
+    """
+    try:
+        weekly_plan_id = request.args.get('weekly_plan_id', type=int)
+        export_format = request.args.get('format', 'text')
+        if not weekly_plan_id:
+            return jsonify({'error': 'Weekly plan ID is required'}), 400
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f"Unknown format: {export_format}"}), 400
+
+        weekly_plan = db.session.get(WeeklyPlan, weekly_plan_id)
+        if not weekly_plan:
+            return jsonify({'error': 'Weekly plan not found'}), 404
+        store_id = request.args.get('store_id', type=int) or (
+            db.session.query(Store.id).filter_by(is_default=True).scalar()
+        )
+
+        rows = iter_plan_grocery_rows(weekly_plan.id, store_id)
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        if export_format == 'html':
+            # One section's lines are held at a time
+            sections = (
+                (section_name, list(iter_grocery_list_lines(_grocery_items(group))))
+                for section_name, group in groupby(rows, key=lambda row: row[0])
+            )
+            return Response(stream_template('grocery_list_print.html', plan_name=weekly_plan.name, sections=sections),
+                            mimetype=mimetype)
+
+        if export_format == 'csv':
+            body = _grocery_csv(rows)
+        else:
+            body = (line + "\n" for line in iter_grocery_list_lines(_grocery_items(rows)))
+        response = Response(stream_with_context(body), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="grocery_list_{weekly_plan.id}.{extension}"'
+        return response
+
+    except Exception as e:
+        logger.error(f"Error exporting grocery list: {e}")
+        return jsonify({"error": "An error occurred while exporting the grocery list"}), 500
+
+
+@meal_planner_routes.route('/api/weekly_plan/<int:weekly_plan_id>/clone', methods=['POST'])
+def clone_weekly_plan(weekly_plan_id):
+    """
+    Copy a weekly plan or template inside the database.
+
+    Body (all optional):
+        {"name": "...", "day_shift": 1, "as_template": false,
+         "overrides": [{"day": ..., "meal_type": ..., "recipe_id": ..., "servings": ...}]}
+    Override days refer to the copy, i.e. after shifting. Saving a plan with
+    "as_template": true creates a template; cloning a template creates a plan.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            day_shift = int(data.get('day_shift') or 0)
+            overrides = parse_plan_meals(data.get('overrides') or [])
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+
+        source = db.session.get(WeeklyPlan, weekly_plan_id)
+        if not source:
+            return jsonify({"error": f"Weekly plan {weekly_plan_id} not found"}), 404
+
+        copy = WeeklyPlan(
+            name=data.get('name') or f"{source.name} (copy)",
+            created_at=datetime.utcnow(),
+            is_template=bool(data.get('as_template'))
+        )
+        db.session.add(copy)
+        db.session.flush()
+        copy_id = copy.id
+
+        copy_plan_slots(source.id, copy_id, day_shift, overrides)
+        if not overrides:
+            # Shifting days does not change what needs to be bought
+            copy_plan_aggregate(source.id, copy_id)
+        db.session.commit()
+
+        return jsonify({"message": "Weekly plan copied successfully", "id": copy_id}), 201
+
+    except Exception as e:
+        logger.error(f"Error copying weekly plan {weekly_plan_id}: {e}")
+        db.session.rollback()
+        return jsonify({"error": "An error occurred while copying the plan"}), 500
+
+
+@meal_planner_routes.route('/api/meal_slots/<int:slot_id>', methods=['PATCH'])
+def update_meal_slot(slot_id):
+    """
+    Change one meal slot and return how the plan's grocery list changed.
+
+    Body: any of {"recipe_id": 3, "servings": 4, "day": "Monday", "meal_type": "dinner"}.
+    Responds with the updated slot and a grocery list delta:
+    {"slot": {...}, "grocery_list_delta": {"added": [...], "removed": [...], "changed": [...]}}
+    """
+    try:
+        data = request.get_json() or {}
+        slot = db.session.get(MealSlot, slot_id)
+        if not slot:
+            return jsonify({"error": f"Meal slot {slot_id} not found"}), 404
+
+        try:
+            recipe_id = int(data['recipe_id']) if data.get('recipe_id') else (None if 'recipe_id' in data else slot.recipe_id)
+            servings = int(data['servings']) if data.get('servings') else (None if 'servings' in data else slot.servings)
+        except (TypeError, ValueError):
+            return jsonify({"error": "recipe_id and servings must be integers"}), 400
+
+        day = data.get('day') or slot.day
+        meal_type = data.get('meal_type') or slot.meal_type
+        if day not in DAYS_OF_WEEK:
+            return jsonify({"error": f"Unknown day: {day}"}), 400
+        if not isinstance(meal_type, str) or not meal_type.strip():
+            return jsonify({"error": "meal_type must be a name"}), 400
+        if (day, meal_type) != (slot.day, slot.meal_type) and db.session.query(
+            MealSlot.query.filter(
+                MealSlot.weekly_plan_id == slot.weekly_plan_id, MealSlot.id != slot.id,
+                MealSlot.day == day, MealSlot.meal_type == meal_type,
+            ).exists()
+        ).scalar():
+            return jsonify({"error": f"The plan already has a {meal_type} slot on {day}"}), 409
+
+        # Build the stored aggregate from the slots as they are before the change
+        ensure_plan_aggregate(slot.weekly_plan_id)
+        try:
+            delta = apply_slot_change(slot, recipe_id, servings)
+        except LookupError as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 404
+
+        slot.day = day
+        slot.meal_type = meal_type
+        WeeklyPlan.query.filter_by(id=slot.weekly_plan_id).update({'updated_at': datetime.utcnow()})
+        slot_data = slot.to_dict()
+        db.session.commit()
+
+        return jsonify({"slot": slot_data, "grocery_list_delta": delta}), 200
+    except Exception as e:
+        logger.error(f"Error updating meal slot {slot_id}: {e}")
+        db.session.rollback()
+        return jsonify({"error": "An error occurred while updating the meal slot"}), 500
+
 @meal_planner_routes.route('/api/generate_grocery_list', methods=['POST'])
 def save_and_generate_grocery_list():
     """Generate the grocery list without saving the plan automatically."""
@@ -416,19 +927,12 @@ def save_and_generate_grocery_list():
             return jsonify({"error": "No meals provided"}), 400
 
         # Generate the grocery list (without saving a weekly plan)
-        ingredients = {}
-        for meal in meals:
-            recipe_id = meal.get('recipe_id')
-            if recipe_id:
-                recipe = Recipe.query.get(recipe_id)
-                if recipe:
-                    logger.debug(f"Processing recipe: {recipe.name}")
-                    for ingredient in recipe.ingredients:
-                        if not ingredient.item_name or ingredient.quantity is None or not ingredient.unit:
-                            logger.warning(f"Invalid ingredient data: {ingredient.to_dict()}")
-                            continue
-                        key = (ingredient.item_name, ingredient.unit or "unitless")
-                        ingredients[key] = ingredients.get(key, 0) + (ingredient.quantity or 0)
+        try:
+            catalogue = get_recipe_catalogue()
+            ingredients = catalogue.sum_meal_ingredients(meals) if catalogue is not None else sum_meal_ingredients(meals)
+        except ValueError as e:
+            logger.warning(f"Invalid meal data: {e}")
+            return jsonify({"error": "Recipe IDs and servings must be numbers"}), 400
 
         formatted_ingredients = [
             {"item_name": name, "unit": unit, "quantity": round(quantity, 2)}
@@ -444,49 +948,99 @@ def save_and_generate_grocery_list():
         return jsonify({"error": "An error occurred"}), 500
 
 
-@store_routes.route('/api/stores', methods=['POST'])
-def create_or_update_store():
-    data = request.json
-    store_id = data.get('id')
-    name = data.get('name')
-    sections = data.get('sections', [])
+def save_store_sections(store_id, sections, is_new=False):
+    """
+    Make a store's sections match `sections`, ordered as given.
 
-    if store_id:
-        store = Store.query.get(store_id)
-        if not store:
-            return jsonify({'error': 'Store not found'}), 404
-        store.name = name
-    else:
-        store = Store(name=name)
-        db.session.add(store)
+    Sections with an "id" are renamed and reordered in one executemany
+    UPDATE, new ones are inserted in one statement, and sections missing
+    from the list are deleted together with their ingredient assignments.
 
-    db.session.flush()  # Get the store ID for new stores
+    Raises:
+        ValueError: If a section has no name or its id belongs to another store.
+    """
+    existing = set() if is_new else {
+        section_id for (section_id,) in db.session.query(Section.id).filter(Section.store_id == store_id)
+    }
 
-    # Update sections
-    existing_section_ids = {s.id for s in store.sections}
-    incoming_section_ids = {s['id'] for s in sections if 'id' in s}
+    updated_rows, new_rows = [], []
+    for order, section_data in enumerate(sections):
+        if not section_data.get('name'):
+            raise ValueError(f"Section {order + 1} has no name")
+        if section_data.get('id'):
+            section_id = int(section_data['id'])
+            if section_id not in existing:
+                raise ValueError(f"Section {section_id} does not belong to this store")
+            updated_rows.append({'id': section_id, 'name': section_data['name'], 'order': order})
+        else:
+            new_rows.append({'store_id': store_id, 'name': section_data['name'], 'order': order})
+
+    removed_ids = existing - {row['id'] for row in updated_rows}
+    if removed_ids:
+        Section.query.filter(Section.id.in_(removed_ids)).delete(synchronize_session=False)
+    if updated_rows:
+        db.session.execute(update(Section), updated_rows)
+    if new_rows:
+        db.session.execute(insert(Section), new_rows)
 
-    # Delete removed sections
-    Section.query.filter(Section.id.in_(existing_section_ids - incoming_section_ids)).delete()
 
-    # Add or update sections
-    for idx, section_data in enumerate(sections):
-        if 'id' in section_data:
-            section = Section.query.get(section_data['id'])
-            section.name = section_data['name']
-            section.order = idx
+@store_routes.route('/api/stores', methods=['POST'])
+def create_or_update_store():
+    """
+    Create a store, or update one when "id" is given, with its sections in order.
+
+    Body: {"id": 1, "name": "...", "sections": [{"id": 3, "name": "..."}, {"name": "New aisle"}]}
+    """
+    try:
+        data = request.json
+        store_id = data.get('id')
+        name = data.get('name')
+        sections = data.get('sections', [])
+
+        if not name:
+            return jsonify({'error': 'Store name is required'}), 400
+
+        if store_id:
+            store = db.session.get(Store, store_id)
+            if not store:
+                return jsonify({'error': 'Store not found'}), 404
+            store.name = name
         else:
-            new_section = Section(name=section_data['name'], order=idx, store_id=store.id)
-            db.session.add(new_section)
+            store = Store(name=name)
+            db.session.add(store)
 
-    db.session.commit()
-    return jsonify({'message': 'Store saved successfully', 'store_id': store.id})
+        db.session.flush()  # Get the store ID for new stores
+        store_id = store.id
+
+        try:
+            save_store_sections(store_id, sections, is_new=not data.get('id'))
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+
+        record_store_changes()
+        db.session.commit()
+        invalidate_store_layouts(store_id)
+        return jsonify({'message': 'Store saved successfully', 'store_id': store_id})
+
+    except Exception as e:
+        logger.error(f"Error saving store: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'An error occurred while saving the store'}), 500
 
 @store_routes.route('/api/stores/<int:store_id>', methods=['DELETE'])
 def delete_store(store_id):
-    store = Store.query.get_or_404(store_id)
-    db.session.delete(store)
-    db.session.commit()
+    try:
+        # Sections and their ingredient assignments go with it (ON DELETE CASCADE)
+        if not Store.query.filter_by(id=store_id).delete(synchronize_session=False):
+            return jsonify({'error': 'Store not found'}), 404
+        record_store_changes()
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error deleting store {store_id}: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'An error occurred while deleting the store'}), 500
+    invalidate_store_layouts(store_id)
     return jsonify({'message': 'Store deleted successfully'})
 
 @ingredient_routes.route('/api/ingredients/<int:ingredient_id>/assign_section', methods=['POST'])
@@ -502,10 +1056,186 @@ def assign_section_to_ingredient(ingredient_id):
         mapping = IngredientSection(ingredient_id=ingredient_id, section_id=section_id)
         db.session.add(mapping)
 
+    record_store_changes()
     db.session.commit()
+    invalidate_store_layouts()  # The previous section may belong to another store
     return jsonify({'message': 'Ingredient assigned to section'})
 
 
+def assign_ingredient_sections(assignments):
+    """
+    Upsert many ingredient -> section assignments in bulk.
+
+    Each assignment names a "section_id" and either an "ingredient_id" or an
+    "item_name"; a name applies to every ingredient whose trimmed, lowercased
+    name matches. An ingredient keeps one assignment per store: an existing
+    assignment to a section of the same store is moved, otherwise one is
+    added. Later entries win over earlier ones.
+
+    Returns:
+        dict: Counts of updated and created assignments, plus the ingredient
+            ids and names that matched nothing.
+
+    Raises:
+        ValueError: If an entry is malformed or names a section that does not exist.
+    """
+    by_id, by_name = {}, {}
+    for entry in assignments:
+        try:
+            section_id = int(entry['section_id'])
+            if entry.get('ingredient_id'):
+                by_id[int(entry['ingredient_id'])] = section_id
+            elif entry.get('item_name'):
+                by_name[normalize_item_name(entry['item_name'])] = section_id
+            else:
+                raise ValueError
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Invalid assignment: {entry}")
+
+    section_stores = dict(
+        db.session.query(Section.id, Section.store_id)
+        .filter(Section.id.in_(set(by_id.values()) | set(by_name.values())))
+    )
+    missing_sections = (set(by_id.values()) | set(by_name.values())) - set(section_stores)
+    if missing_sections:
+        raise ValueError(f"Unknown sections: {', '.join(map(str, sorted(missing_sections)))}")
+
+    # Resolve ids and names to ingredients in one query; explicit ids win over names
+    normalized_name = func.lower(func.trim(Ingredient.item_name))
+    targets, matched_names, found_ids = {}, set(), set()
+    for ingredient_id, name in db.session.query(Ingredient.id, normalized_name).filter(
+        or_(Ingredient.id.in_(by_id), normalized_name.in_(by_name))
+    ):
+        if name in by_name:
+            matched_names.add(name)
+            targets.setdefault(ingredient_id, by_name[name])
+        if ingredient_id in by_id:
+            found_ids.add(ingredient_id)
+            targets[ingredient_id] = by_id[ingredient_id]
+
+    existing = {}
+    if targets:
+        rows = (
+            db.session.query(IngredientSection.id, IngredientSection.ingredient_id, Section.store_id)
+            .join(Section, Section.id == IngredientSection.section_id)
+            .filter(IngredientSection.ingredient_id.in_(targets))
+        )
+        existing = {(ingredient_id, store_id): mapping_id for mapping_id, ingredient_id, store_id in rows}
+
+    updated_rows, new_rows = [], []
+    for ingredient_id, section_id in targets.items():
+        mapping_id = existing.get((ingredient_id, section_stores[section_id]))
+        if mapping_id:
+            updated_rows.append({'id': mapping_id, 'section_id': section_id})
+        else:
+            new_rows.append({'ingredient_id': ingredient_id, 'section_id': section_id})
+
+    if updated_rows:
+        db.session.execute(update(IngredientSection), updated_rows)
+    if new_rows:
+        db.session.execute(insert(IngredientSection), new_rows)
+
+    return {
+        'updated': len(updated_rows),
+        'created': len(new_rows),
+        'unknown_ingredient_ids': sorted(set(by_id) - found_ids),
+        'unmatched_names': sorted(set(by_name) - matched_names),
+    }
+
+
+@ingredient_routes.route('/api/assign_sections', methods=['POST'])
+def assign_sections():
+    """
+    Assign many ingredients to store sections in one request.
+
+    Body: {"assignments": [{"ingredient_id": 12, "section_id": 3},
+                           {"item_name": "Flour", "section_id": 5}]}
+    """
+    try:
+        data = request.get_json() or {}
+        assignments = data.get('assignments') or []
+        if not assignments:
+            return jsonify({'error': 'No assignments provided'}), 400
+        try:
+            result = assign_ingredient_sections(assignments)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        record_store_changes()
+        db.session.commit()
+        invalidate_store_layouts()
+        return jsonify({'message': 'Ingredients assigned to sections', **result})
+
+    except Exception as e:
+        logger.error(f"Error assigning sections: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'An error occurred while assigning sections'}), 500
+
+
+@grocery_routes.route('/api/categorize', methods=['POST'])
+def categorize_ingredients():
+    """
+    Suggest store sections for ingredients the store has not mapped yet.
+
+    Body: {"item_names": ["cherry tomatoes", ...]} or {"weekly_plan_id": 3} for the
+    plan's uncategorized items, plus optional "store_id", "apply" and "min_confidence"
+    (default 0.5). With "apply": true, suggestions at or above min_confidence that
+    match a section of the store are saved as name-based assignments.
+    """
+    try:
+        data = request.get_json() or {}
+        try:
+            weekly_plan_id = int(data['weekly_plan_id']) if data.get('weekly_plan_id') else None
+            min_confidence = float(data.get('min_confidence', 0.5))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'weekly_plan_id must be an integer and min_confidence a number'}), 400
+        if not 0 <= min_confidence <= 1:
+            return jsonify({'error': 'min_confidence must be between 0 and 1'}), 400
+
+        layout = get_store_layout(data.get('store_id'))
+        if not layout:
+            return jsonify({'error': 'Store not found'}), 404
+
+        if weekly_plan_id:
+            totals = sum_plan_ingredients(weekly_plan_id)
+            item_names = [
+                item_name for item_name in dict.fromkeys(item_name for item_name, _ in totals)
+                if normalize_item_name(item_name) not in layout['ingredient_sections']
+            ]
+        else:
+            item_names = data.get('item_names') or []
+        if not isinstance(item_names, list) or not all(isinstance(name, str) for name in item_names):
+            return jsonify({'error': 'item_names must be a list of strings'}), 400
+
+        section_ids = {name: section_id for section_id, name in layout['sections']}
+        predictions = [
+            {'item_name': item_name, 'section': section, 'section_id': section_ids.get(section),
+             'confidence': round(confidence, 3)}
+            for item_name, (section, confidence) in zip(item_names, get_categorizer().predict(item_names))
+        ]
+
+        applied = 0
+        if data.get('apply'):
+            assignments = [
+                {'item_name': prediction['item_name'], 'section_id': prediction['section_id']}
+                for prediction in predictions
+                if prediction['section_id'] and prediction['confidence'] >= min_confidence
+            ]
+            if assignments:
+                result = assign_ingredient_sections(assignments)
+                record_store_changes()
+                db.session.commit()
+                invalidate_store_layouts()
+                applied = result['created'] + result['updated']
+
+        return jsonify({'store_id': layout['store_id'], 'predictions': predictions, 'applied': applied})
+
+    except Exception as e:
+        logger.error(f"Error categorizing ingredients: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'An error occurred while categorizing ingredients'}), 500
+
+
 @grocery_routes.route('/api/grocery_list', methods=['GET'])
 def get_categorized_grocery_list():
     """Return the categorized grocery list."""
@@ -523,41 +1253,37 @@ def get_categorized_grocery_list():
             logger.warning(f"Weekly plan not found for ID: {weekly_plan_id}")
             return jsonify({'error': 'Weekly plan not found'}), 404
 
-        if not weekly_plan.meals:
-            logger.warning(f"Weekly plan {weekly_plan_id} has no meals associated.")
-            return jsonify({'error': 'No meals in this weekly plan'}), 400
-
-        # Fetch the store
+        # Sections and ingredient assignments come from the cached store layout
         store_id = request.args.get('store_id')
-        store = Store.query.get(store_id) if store_id else Store.query.filter_by(is_default=True).first()
-        logger.info(f"Store: {store.name if store else 'None'}")  # Add here
-        if not store:
+        layout = get_store_layout(store_id)
+        logger.info(f"Store: {layout['name'] if layout else 'None'}")
+        if not layout:
             logger.warning(f"No store found. Store ID: {store_id}")
             return jsonify({'error': 'Store not found'}), 404
 
-        # Build the categorized list
-        categorized_list = []
-        for section in store.sections:
-            items = IngredientSection.query.filter_by(section_id=section.id).all()
-            categorized_list.append({
-                'section': section.name,
-                'items': [
-                    {
-                        'name': item.ingredient.item_name if item.ingredient else 'Unknown Ingredient',
-                        'quantity': item.ingredient.quantity if item.ingredient else 0,
-                        'unit': item.ingredient.unit if item.ingredient else 'unitless'
-                    }
-                    for item in items if item.ingredient  # Only include valid ingredients
-                ]
-            })
+        totals = sum_plan_ingredients(weekly_plan.id)
+        if not totals:
+            logger.warning(f"Weekly plan {weekly_plan_id} has no meals associated.")
+            return jsonify({'error': 'No meals in this weekly plan'}), 400
+
+        categorized_list = categorize_items(layout, (
+            {'item_name': item_name, 'unit': unit, 'quantity': round(quantity, 2)}
+            for (item_name, unit), quantity in totals.items()
+        ))
 
         # Add missing default sections
         for default_section in DEFAULT_SECTIONS:
             if not any(category['section'] == default_section for category in categorized_list):
                 categorized_list.append({"section": default_section, "items": []})
-            
-            logger.info(f"Categorized grocery list: {categorized_list}")
-            return jsonify(categorized_list)
+
+        logger.info(f"Categorized grocery list: {categorized_list}")
+
+        # Section assignments carry no version, so validate on the body itself
+        response = jsonify(categorized_list)
+        response.add_etag()
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
 
     except Exception as e:
         logger.error(f"Error generating categorized grocery list: {e}")
@@ -573,10 +1299,86 @@ def get_ingredients():
     ingredients = Ingredient.query.all()
     return jsonify([ingredient.to_dict() for ingredient in ingredients])
 
+MAX_TYPEAHEAD_LIMIT = 50
+
+
+@ingredient_routes.route('/api/typeahead', methods=['GET'])
+def typeahead():
+    """
+    Autocomplete ingredient names, USDA foods and units from the in-memory index.
+
+    Query: ?q=gar&kinds=ingredient,food&limit=10; kinds defaults to all three.
+    """
+    try:
+        kinds = [kind for kind in request.args.get('kinds', ','.join(TYPEAHEAD_KINDS)).split(',') if kind]
+        unknown = set(kinds) - set(TYPEAHEAD_KINDS)
+        if unknown:
+            return jsonify({'error': f"Unknown kinds: {', '.join(sorted(unknown))}"}), 400
+        try:
+            limit = int(request.args.get('limit', 10))
+        except ValueError:
+            return jsonify({'error': 'limit must be a number'}), 400
+        if not 1 <= limit <= MAX_TYPEAHEAD_LIMIT:
+            return jsonify({'error': f'limit must be between 1 and {MAX_TYPEAHEAD_LIMIT}'}), 400
+
+        return jsonify(suggest(request.args.get('q', ''), kinds, limit))
+    except Exception as e:
+        logger.error(f"Error serving typeahead: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+MAX_NUTRIENT_FOODS = 500
+
+
+@ingredient_routes.route('/api/foods/nutrients', methods=['GET'])
+def get_food_nutrients():
+    """
+    Nutrients per 100 g for many USDA foods, read from the memory-mapped matrix.
+
+    Query: ?ids=1,2,3 and optionally &nutrients=Energy,Protein
+    Responds with amounts by name and unit:
+    {"foods": {"1": {"Energy": {"KCAL": 52.0, "kJ": 218.0}, ...}}, "missing": [...]}
+    """
+    try:
+        matrix = get_nutrient_matrix()
+        if matrix is None:
+            return jsonify({'error': 'The nutrient matrix has not been built; run `flask build-nutrient-matrix`'}), 503
+        try:
+            food_ids = [int(food_id) for food_id in request.args.get('ids', '').split(',') if food_id.strip()]
+        except ValueError:
+            return jsonify({'error': 'Food IDs must be integers'}), 400
+        if not food_ids:
+            return jsonify({'error': 'No food IDs provided'}), 400
+        if len(food_ids) > MAX_NUTRIENT_FOODS:
+            return jsonify({'error': f'At most {MAX_NUTRIENT_FOODS} foods can be looked up at once'}), 400
+
+        nutrients = [name for name in request.args.get('nutrients', '').split(',') if name]
+        try:
+            found = matrix.lookup(food_ids, matrix.nutrient_keys(nutrients) if nutrients else None)
+        except KeyError as e:
+            return jsonify({'error': f"Unknown nutrient: {e.args[0]}"}), 400
+        foods = {}
+        for food_id, amounts in found.items():
+            by_name = foods[str(food_id)] = {}
+            for (name, unit), amount in amounts.items():
+                by_name.setdefault(name, {})[unit] = amount
+        return jsonify({
+            'foods': foods,
+            'missing': [food_id for food_id in dict.fromkeys(food_ids) if food_id not in found],
+        })
+    except Exception as e:
+        logger.error(f"Error looking up food nutrients: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @store_routes.route('/api/stores', methods=['GET'])
 def get_stores():
-    stores = Store.query.all()
-    return jsonify([store.to_dict() for store in stores])
+    """List stores with their sections in order (one query for each)."""
+    try:
+        stores = Store.query.options(selectinload(Store.sections)).order_by(Store.id).all()
+        return jsonify([store.to_dict() for store in stores])
+    except Exception as e:
+        logger.error(f"Error fetching stores: {e}")
+        return jsonify({'error': 'An error occurred while fetching stores'}), 500
 
 @grocery_routes.route('/grocery_list', methods=['GET'])
 def grocery_list():
@@ -617,16 +1419,13 @@ def get_grocery_list_json():
         
         logger.info(f"Weekly plan found: {weekly_plan.name}")
 
+        etag, last_modified = plan_version(weekly_plan)
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+
         # Gather ingredients
-        ingredients = {}
-        for meal in weekly_plan.meals:
-            if meal.recipe_id:
-                recipe = Recipe.query.get(meal.recipe_id)
-                if recipe:
-                    logger.info(f"Processing recipe: {recipe.name}")
-                    for ingredient in recipe.ingredients:
-                        key = (ingredient.item_name, ingredient.unit or "unitless")
-                        ingredients[key] = ingredients.get(key, 0) + (ingredient.quantity or 0)
+        ingredients = sum_plan_ingredients(weekly_plan.id)
 
         logger.info(f"Collected ingredients: {ingredients}")
 
@@ -638,7 +1437,7 @@ def get_grocery_list_json():
 
         logger.info(f"Formatted ingredients: {formatted_ingredients}")
 
-        return jsonify(formatted_ingredients)
+        return conditional_json(formatted_ingredients, etag, last_modified)
     except Exception as e:
         logger.error(f"Error generating grocery list: {e}")
         return jsonify({"error": "An error occurred while generating the grocery list"}), 500
@@ -0,0 +1,291 @@
+"""
+Precomputed "similar recipes" by shared ingredients.
+
+A batch job builds a sparse recipe x ingredient matrix (binary; columns are
+canonical ingredient ids) and scores every recipe against every other with sparse
+products A[chunk] @ A.T, evaluated a chunk of rows at a time through the
+ingredient posting lists so only CHUNK_CELLS scores are held at once:
+
+    cosine    shared / sqrt(ingredients_a * ingredients_b)
+    jaccard   shared / (ingredients_a + ingredients_b - shared)
+
+The top k neighbours of each recipe are stored in recipe_neighbor, and
+reading them is one indexed query.
+
+Refreshes are incremental. Each run records the last recipe_change id it
+covered (recipe_neighbor_refresh); the next run recomputes only
+
+    - the recipes changed since then,
+    - recipes that list a changed or deleted recipe as a neighbour,
+    - recipes that a changed recipe now scores above their k-th neighbour.
+
+Every other list is unaffected. A NULL change, or a different k or metric,
+rebuilds everything.
+
+    flask --app run refresh-similar-recipes [--full] [--k 10] [--metric cosine]
+
+Config:
+    SIMILAR_RECIPES_K       neighbours kept per recipe (default 10)
+    SIMILAR_RECIPES_METRIC  cosine or jaccard (default cosine)
+"""
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert, select
+
+from app.models import db, Ingredient, Recipe, RecipeChange, RecipeNeighbor, RecipeNeighborRefresh
+
+METRICS = ('cosine', 'jaccard')
+
+CHUNK_CELLS = 4_000_000  # Scores computed at once: chunk rows x recipes
+IN_BATCH = 500  # Ids per IN (...) list
+
+
+def _batches(values, size=IN_BATCH):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _gather(starts, lengths):
+    """Positions starts[i]:starts[i] + lengths[i] for every i, concatenated."""
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(total)
+
+
+class IngredientMatrix:
+    """Binary recipe x ingredient matrix in CSR (rows) and CSC (posting lists) form."""
+
+    def __init__(self, recipe_ids, rows, columns):
+        """
+        Args:
+            recipe_ids (ndarray): Sorted recipe ids; row i is recipe_ids[i].
+            rows, columns (ndarray): Row and column of each nonzero entry.
+        """
+        self.recipe_ids = recipe_ids
+        n_columns = int(columns.max()) + 1 if len(columns) else 0
+        pairs = np.unique(rows * max(n_columns, 1) + columns)  # Each ingredient counts once per recipe
+        rows, columns = pairs // max(n_columns, 1), pairs % max(n_columns, 1)
+
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=len(recipe_ids)))))
+        self.indices = columns  # Sorted by row already
+        order = np.argsort(columns, kind='stable')
+        self.column_ptr = np.concatenate(([0], np.cumsum(np.bincount(columns, minlength=n_columns))))
+        self.column_rows = rows[order]
+        self.sizes = np.diff(self.indptr)
+
+    @classmethod
+    def load(cls):
+        """Build the matrix from every recipe's ingredients."""
+        recipe_ids = np.array([recipe_id for (recipe_id,) in db.session.query(Recipe.id).order_by(Recipe.id)],
+                              dtype=np.int64)
+        columns, rows, codes = {}, [], []
+        entries = db.session.execute(
+            select(Ingredient.recipe_id, Ingredient.canonical_id)
+            .where(Ingredient.canonical_id.isnot(None))  # Only nameless ingredients lack one
+            .execution_options(yield_per=10000)
+        )
+        for recipe_id, canonical_id in entries:
+            codes.append(columns.setdefault(canonical_id, len(columns)))
+            rows.append(recipe_id)
+        rows = np.searchsorted(recipe_ids, np.array(rows, dtype=np.int64))
+        return cls(recipe_ids, rows, np.array(codes, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def positions(self, recipe_ids):
+        """Row positions of the recipes in `recipe_ids` that are in the matrix."""
+        recipe_ids = np.array(sorted(recipe_ids), dtype=np.int64)
+        positions = np.searchsorted(self.recipe_ids, recipe_ids)
+        found = positions < len(self.recipe_ids)
+        found[found] = self.recipe_ids[positions[found]] == recipe_ids[found]
+        return positions[found]
+
+    def scores(self, rows, metric):
+        """
+        Yield (rows, scores) a chunk at a time: scores[i, j] is the similarity
+        of recipe rows[i] to recipe j, 0 for itself.
+        """
+        n = len(self.recipe_ids)
+        chunk_size = max(1, CHUNK_CELLS // max(n, 1))
+        for start in range(0, len(rows), chunk_size):
+            chunk = np.asarray(rows[start:start + chunk_size], dtype=np.int64)
+            # Ingredients of the chunk, then every recipe listing each of them
+            lengths = self.sizes[chunk]
+            owners = np.repeat(np.arange(len(chunk)), lengths)
+            columns = self.indices[_gather(self.indptr[chunk], lengths)]
+            posting_lengths = np.diff(self.column_ptr)[columns]
+            others = self.column_rows[_gather(self.column_ptr[columns], posting_lengths)]
+            shared = np.bincount(
+                np.repeat(owners, posting_lengths) * n + others, minlength=len(chunk) * n
+            ).reshape(len(chunk), n).astype(np.float64)
+
+            sizes = self.sizes.astype(np.float64)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                if metric == 'jaccard':
+                    scores = shared / (sizes[chunk][:, None] + sizes[None, :] - shared)
+                else:
+                    scores = shared / np.sqrt(sizes[chunk][:, None] * sizes[None, :])
+            scores = np.nan_to_num(scores, nan=0.0)
+            scores[np.arange(len(chunk)), chunk] = 0.0
+            yield chunk, scores
+
+
+def _top_k(scores, k):
+    """Column positions and scores of the k best nonzero entries of each row, best first."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return [([], [])] * len(scores)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    results = []
+    for row, columns in zip(scores, top):
+        columns = columns[np.lexsort((columns, -row[columns]))]
+        columns = columns[row[columns] > 0]
+        results.append((columns, row[columns]))
+    return results
+
+
+def _neighbor_rows(matrix, rows, metric, k, best=None):
+    """
+    recipe_neighbor rows for the recipes at `rows`. When `best` is given,
+    it is raised to each recipe's highest score against any of `rows`.
+    """
+    neighbor_rows = []
+    for chunk, scores in matrix.scores(rows, metric):
+        if best is not None:
+            np.maximum(best, scores.max(axis=0), out=best)
+        for row, (columns, values) in zip(chunk, _top_k(scores, k)):
+            recipe_id = int(matrix.recipe_ids[row])
+            neighbor_rows.extend(
+                {'recipe_id': recipe_id, 'neighbor_id': int(matrix.recipe_ids[column]), 'rank': rank,
+                 'score': round(float(value), 4)}
+                for rank, (column, value) in enumerate(zip(columns, values))
+            )
+    return neighbor_rows
+
+
+def _affected_by(changed_ids, candidate_best, matrix, k):
+    """
+    Recipes outside `changed_ids` whose lists must be recomputed: those
+    listing a changed recipe, and those a changed recipe now beats.
+    """
+    affected = set()
+    for batch in _batches(changed_ids):
+        affected.update(
+            recipe_id for (recipe_id,) in
+            db.session.query(RecipeNeighbor.recipe_id.distinct()).filter(RecipeNeighbor.neighbor_id.in_(batch))
+        )
+
+    candidates = {int(matrix.recipe_ids[row]): best for row, best in enumerate(candidate_best) if best > 0}
+    candidates = {recipe_id: best for recipe_id, best in candidates.items() if recipe_id not in changed_ids}
+    weakest = {}
+    for batch in _batches(candidates):
+        weakest.update(
+            (recipe_id, (count, lowest)) for recipe_id, count, lowest in
+            db.session.query(RecipeNeighbor.recipe_id, func.count(), func.min(RecipeNeighbor.score))
+            .filter(RecipeNeighbor.recipe_id.in_(batch))
+            .group_by(RecipeNeighbor.recipe_id)
+        )
+    for recipe_id, best in candidates.items():
+        count, lowest = weakest.get(recipe_id, (0, 0.0))
+        if count < k or best > lowest:
+            affected.add(recipe_id)
+    return affected - set(changed_ids)
+
+
+def _write(recipe_ids, neighbor_rows, full):
+    if full:
+        RecipeNeighbor.query.delete(synchronize_session=False)
+    else:
+        for batch in _batches(recipe_ids):
+            RecipeNeighbor.query.filter(RecipeNeighbor.recipe_id.in_(batch)).delete(synchronize_session=False)
+    for start in range(0, len(neighbor_rows), 5000):
+        db.session.execute(insert(RecipeNeighbor), neighbor_rows[start:start + 5000])
+
+
+def refresh_similar_recipes(k=None, metric=None, full=False):
+    """
+    Bring recipe_neighbor up to date with the recipe changes since the last
+    refresh, in the current transaction.
+
+    Returns:
+        dict: {'full': whether everything was rebuilt, 'recipes': lists recomputed,
+               'neighbors': rows written}
+
+    Raises:
+        ValueError: On an unknown metric or a k below 1.
+    """
+    k = int(k or current_app.config.get('SIMILAR_RECIPES_K', 10))
+    metric = metric or current_app.config.get('SIMILAR_RECIPES_METRIC', 'cosine')
+    if metric not in METRICS:
+        raise ValueError(f"Metric must be one of {', '.join(METRICS)}")
+    if k < 1:
+        raise ValueError("k must be at least 1")
+
+    counter = db.session.query(func.max(RecipeChange.id)).scalar() or 0
+    last = RecipeNeighborRefresh.query.order_by(RecipeNeighborRefresh.id.desc()).first()
+    changed = set()
+    if last is None or (last.k, last.metric) != (k, metric):
+        full = True
+    elif not full:
+        changed = {
+            recipe_id for (recipe_id,) in
+            db.session.query(RecipeChange.recipe_id.distinct()).filter(RecipeChange.id > last.change_id)
+        }
+        full = None in changed
+
+    matrix = IngredientMatrix.load()
+    if full:
+        recipe_ids = set(matrix.recipe_ids.tolist())
+        neighbor_rows = _neighbor_rows(matrix, np.arange(len(matrix)), metric, k)
+    else:
+        best = np.zeros(len(matrix))
+        neighbor_rows = _neighbor_rows(matrix, matrix.positions(changed), metric, k, best)
+        affected = _affected_by(changed, best, matrix, k)
+        neighbor_rows += _neighbor_rows(matrix, matrix.positions(affected), metric, k)
+        recipe_ids = changed | affected
+
+    _write(recipe_ids, neighbor_rows, full)
+    db.session.add(RecipeNeighborRefresh(change_id=counter, k=k, metric=metric))
+    return {'full': bool(full), 'recipes': len(recipe_ids), 'neighbors': len(neighbor_rows)}
+
+
+def similar_recipes(recipe_id, limit=None):
+    """
+    Stored neighbours of `recipe_id`, best first.
+
+    Returns:
+        list[dict]: {'id', 'name', 'score'}; empty until the first refresh.
+    """
+    query = (
+        db.session.query(Recipe.id, Recipe.name, RecipeNeighbor.score)
+        .join(RecipeNeighbor, RecipeNeighbor.neighbor_id == Recipe.id)  # Skips neighbours deleted since the refresh
+        .filter(RecipeNeighbor.recipe_id == recipe_id)
+        .order_by(RecipeNeighbor.rank)
+    )
+    if limit:
+        query = query.limit(limit)
+    return [{'id': neighbor_id, 'name': name, 'score': score} for neighbor_id, name, score in query]
+
+
+@click.command('refresh-similar-recipes')
+@click.option('--full', is_flag=True, help="Recompute every recipe, not only those affected by changes")
+@click.option('--k', type=int, default=None, help="Neighbours kept per recipe (default SIMILAR_RECIPES_K)")
+@click.option('--metric', type=click.Choice(METRICS), default=None, help="Default SIMILAR_RECIPES_METRIC")
+@with_appcontext
+def refresh_similar_recipes_command(full, k, metric):
+    """Recompute the similar recipes of recipes changed since the last run."""
+    result = refresh_similar_recipes(k, metric, full)
+    db.session.commit()
+    kind = "Rebuilt" if result['full'] else "Refreshed"
+    click.echo(f"{kind} similar recipes for {result['recipes']} recipes ({result['neighbors']} neighbours)")
+
+
+def init_app(app):
+    """Register the refresh-similar-recipes command."""
+    app.cli.add_command(refresh_similar_recipes_command)
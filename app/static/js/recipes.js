@@ -142,9 +142,63 @@ document.getElementById("recipeDropdown").addEventListener("change", async (even
     }
 });
 
+// Suggest ingredient names and USDA foods while an item name is typed
+function setupIngredientTypeahead() {
+    const ingredientsContainer = document.getElementById("ingredientsContainer");
+    if (!ingredientsContainer) {
+        return;
+    }
+
+    const suggestions = document.createElement("datalist");
+    suggestions.id = "ingredientSuggestions";
+    document.body.appendChild(suggestions);
+
+    let timer = null;
+    let controller = null;
+    ingredientsContainer.addEventListener("input", (event) => {
+        const input = event.target;
+        if (input.name !== "item_name") {
+            return;
+        }
+        input.setAttribute("list", suggestions.id);
+        clearTimeout(timer);
+
+        const query = input.value.trim();
+        if (query.length < 2) {
+            suggestions.innerHTML = "";
+            return;
+        }
+        timer = setTimeout(async () => {
+            if (controller) {
+                controller.abort(); // Drop the answer for an older prefix
+            }
+            controller = new AbortController();
+            try {
+                const params = new URLSearchParams({ q: query, kinds: "ingredient,food", limit: "8" });
+                const response = await fetch(`/ingredients/api/typeahead?${params}`, { signal: controller.signal });
+                if (!response.ok) {
+                    throw new Error(`Typeahead failed: ${response.statusText}`);
+                }
+                const data = await response.json();
+                suggestions.innerHTML = "";
+                [...data.ingredient, ...data.food].forEach(({ name }) => {
+                    const option = document.createElement("option");
+                    option.value = name;
+                    suggestions.appendChild(option);
+                });
+            } catch (error) {
+                if (error.name !== "AbortError") {
+                    console.error("Error fetching ingredient suggestions:", error);
+                }
+            }
+        }, 150);
+    });
+}
+
 // Initialize dropdown and events on page load
 document.addEventListener("DOMContentLoaded", () => {
     fetchRecipes();
+    setupIngredientTypeahead();
 
     const cancelEditButton = document.getElementById("cancelEdit");
     if (cancelEditButton) {
@@ -0,0 +1,169 @@
+"""
+Per-process cache of compiled store layouts.
+
+A layout holds a store's sections in aisle order and a map from normalized
+ingredient name to section, so categorizing a grocery list is a matter of
+dictionary lookups. Layouts are compiled on first use and kept on the app
+(`app.extensions['store_layouts']`). Each worker process keeps its own copy.
+
+Writes to stores, sections or ingredient assignments log a store_change row
+in their transaction (record_store_changes) and call invalidate_store_layouts
+for this process. Writes by other workers are noticed through the
+store_change and recipe_change counters (layouts map ingredient names),
+checked at most every STORE_LAYOUT_CHECK_SECONDS (default 2); when either
+has moved every layout is dropped.
+"""
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func, insert, select
+
+from app.models import db, CanonicalIngredient, Ingredient, IngredientSection, RecipeChange, Section, Store, StoreChange
+
+DEFAULT_STORE = 'default'
+UNCATEGORIZED_SECTION = "Uncategorized"
+
+_lock = threading.Lock()
+
+
+def normalize_item_name(item_name):
+    """Key used to match ingredient names to sections."""
+    return (item_name or '').strip().lower()
+
+
+def record_store_changes():
+    """Log a write to stores, sections or ingredient assignments in the current transaction."""
+    db.session.execute(insert(StoreChange))
+
+
+def _change_counters():
+    """(latest store_change id, latest recipe_change id), in one query."""
+    return db.session.execute(
+        select(select(func.max(StoreChange.id)).scalar_subquery(), select(func.max(RecipeChange.id)).scalar_subquery())
+    ).one()
+
+
+def _state():
+    return current_app.extensions.setdefault('store_layouts', {'layouts': {}})
+
+
+def _cache():
+    """The current app's layouts, emptied first if another worker has changed what they are built from."""
+    state = _state()
+    now = time.monotonic()
+    if now >= state.get('next_check', 0):
+        counters = tuple(_change_counters())
+        with _lock:
+            state['next_check'] = now + current_app.config.get('STORE_LAYOUT_CHECK_SECONDS', 2)
+            if state.get('counters') != counters:
+                state['layouts'] = {}
+                state['counters'] = counters
+    return state['layouts']
+
+
+def compile_store_layout(store):
+    """
+    Build the layout for `store`.
+
+    Returns:
+        dict: {'store_id', 'name', 'sections': [(section_id, name)] in order,
+               'section_order': {section_id: order}, 'ingredient_sections': {item name: section_id}}
+    """
+    sections = (
+        db.session.query(Section.id, Section.name, Section.order)
+        .filter(Section.store_id == store.id)
+        .order_by(Section.order, Section.id)
+        .all()
+    )
+    section_order = {section_id: order for section_id, _, order in sections}
+
+    ingredient_sections = {}
+    assignments = (
+        db.session.query(Ingredient.item_name, CanonicalIngredient.name, IngredientSection.section_id)
+        .join(IngredientSection, IngredientSection.ingredient_id == Ingredient.id)
+        .join(Section, Section.id == IngredientSection.section_id)
+        .outerjoin(CanonicalIngredient, CanonicalIngredient.id == Ingredient.canonical_id)
+        .filter(Section.store_id == store.id)
+        .order_by(Section.order, Section.id)
+    )
+    for item_name, canonical_name, section_id in assignments:
+        # The first section in aisle order wins when a name is assigned twice.
+        # Grocery lists show canonical names, so map those as well.
+        ingredient_sections.setdefault(normalize_item_name(item_name), section_id)
+        if canonical_name:
+            ingredient_sections.setdefault(normalize_item_name(canonical_name), section_id)
+
+    return {
+        'store_id': store.id,
+        'name': store.name,
+        'sections': [(section_id, name) for section_id, name, _ in sections],
+        'section_order': section_order,
+        'ingredient_sections': ingredient_sections,
+    }
+
+
+def get_store_layout(store_id=None):
+    """
+    Return the compiled layout of a store (the default store when `store_id` is None).
+
+    Returns None if the store does not exist.
+    """
+    key = int(store_id) if store_id else DEFAULT_STORE
+    cache = _cache()
+    layout = cache.get(key)
+    if layout is not None:
+        return layout
+
+    store = db.session.get(Store, key) if store_id else Store.query.filter_by(is_default=True).first()
+    if not store:
+        return None
+    layout = compile_store_layout(store)
+    with _lock:
+        cache[layout['store_id']] = layout
+        if not store_id:
+            cache[DEFAULT_STORE] = layout
+    return layout
+
+
+def invalidate_store_layouts(store_id=None):
+    """
+    Drop cached layouts: one store's (plus the default entry if it is that
+    store), or all of them when `store_id` is None.
+    """
+    cache = _state()['layouts']
+    with _lock:
+        if store_id is None:
+            cache.clear()
+            return
+        cache.pop(int(store_id), None)
+        default = cache.get(DEFAULT_STORE)
+        if default is not None and default['store_id'] == int(store_id):
+            cache.pop(DEFAULT_STORE, None)
+
+
+def categorize_items(layout, items):
+    """
+    Group grocery items by the layout's sections, in aisle order.
+
+    Args:
+        items (iterable[dict]): Items with 'item_name', 'unit' and 'quantity'.
+
+    Returns:
+        list[dict]: [{'section': name, 'items': [{'name', 'quantity', 'unit'}]}] with every
+            section of the store, followed by an "Uncategorized" section if needed.
+    """
+    grouped = {section_id: [] for section_id, _ in layout['sections']}
+    uncategorized = []
+    for item in items:
+        section_id = layout['ingredient_sections'].get(normalize_item_name(item['item_name']))
+        entry = {'name': item['item_name'], 'quantity': item['quantity'], 'unit': item['unit']}
+        if section_id in grouped:
+            grouped[section_id].append(entry)
+        else:
+            uncategorized.append(entry)
+
+    categorized = [{'section': name, 'items': grouped[section_id]} for section_id, name in layout['sections']]
+    if uncategorized:
+        categorized.append({'section': UNCATEGORIZED_SECTION, 'items': uncategorized})
+    return categorized
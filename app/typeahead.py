@@ -0,0 +1,150 @@
+"""
+In-memory typeahead over ingredient names, USDA food descriptions and units.
+
+Each kind of suggestion is a list of lowercase keys sorted alphabetically
+with a parallel array of usage counts, so a prefix is two binary searches
+and the best matches in that range are picked with argpartition; nothing
+is queried while the user types.
+
+    ingredient  canonical ingredient names, ranked by how many recipe
+                ingredients use them
+    food        USDA food descriptions, ranked by how many canonical
+                ingredients are matched to them
+    unit        units used by recipe ingredients plus the USDA measure
+                units, ranked by use
+
+The index lives on the app (`app.extensions['typeahead']`). Recipe writes
+in this process call invalidate_typeahead; writes by other workers are
+noticed through the recipe_change counter, checked at most every
+TYPEAHEAD_CHECK_SECONDS (default 2). The USDA part never changes and is
+built once.
+"""
+import bisect
+import threading
+import time
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+
+from app.models import db, CanonicalIngredient, Food, Ingredient, MeasureUnit, RecipeChange
+
+KINDS = ('ingredient', 'food', 'unit')
+
+_lock = threading.Lock()
+
+
+class PrefixIndex:
+    """Sorted keys with usage counts; `search` returns the most used entries for a prefix."""
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries (dict): {display name: usage count}; names equal ignoring
+                case are merged under the most used spelling.
+        """
+        merged = {}  # key: [display name, total count, count of the display name]
+        for name, count in entries.items():
+            name = name.strip()
+            key = name.lower()
+            if not key:
+                continue
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [name, count, count]
+                continue
+            entry[1] += count
+            if count > entry[2]:
+                entry[0], entry[2] = name, count
+        self.keys = sorted(merged)
+        self.names = [merged[key][0] for key in self.keys]
+        self.counts = np.array([merged[key][1] for key in self.keys], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, prefix, limit):
+        """Up to `limit` (name, count) pairs starting with `prefix`, most used first, then alphabetical."""
+        prefix = prefix.strip().lower()
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff', lo=start)
+        if end - start > limit:
+            counts = self.counts[start:end]
+            # The `limit` largest counts, then a stable sort keeps alphabetical ties
+            top = np.argpartition(-counts, limit - 1)[:limit]
+            positions = start + top[np.lexsort((top, -counts[top]))]
+        else:
+            positions = start + np.argsort(-self.counts[start:end], kind='stable')
+        return [(self.names[position], int(self.counts[position])) for position in positions]
+
+
+def build_recipe_indexes():
+    """Ingredient and unit indexes from the recipe tables."""
+    ingredients = dict(
+        db.session.query(CanonicalIngredient.name, func.count(Ingredient.id))
+        .join(Ingredient, Ingredient.canonical_id == CanonicalIngredient.id)
+        .group_by(CanonicalIngredient.id)
+    )
+    units = {name: 0 for (name,) in db.session.query(MeasureUnit.name)}
+    units.update(
+        db.session.query(Ingredient.unit, func.count(Ingredient.id))
+        .filter(Ingredient.unit.isnot(None), Ingredient.unit != '')
+        .group_by(Ingredient.unit)
+    )
+    return {'ingredient': PrefixIndex(ingredients), 'unit': PrefixIndex(units)}
+
+
+def build_food_index():
+    """USDA description index, ranked by matched canonical ingredients."""
+    matches = dict(
+        db.session.query(CanonicalIngredient.fdc_id, func.count(CanonicalIngredient.id))
+        .filter(CanonicalIngredient.fdc_id.isnot(None))
+        .group_by(CanonicalIngredient.fdc_id)
+    )
+    return PrefixIndex({
+        description: matches.get(fdc_id, 0) for fdc_id, description in db.session.query(Food.fdc_id, Food.description)
+    })
+
+
+def _change_counter():
+    return db.session.query(func.max(RecipeChange.id)).scalar() or 0
+
+
+def get_typeahead():
+    """{kind: PrefixIndex} for the current app, rebuilt when recipes have changed."""
+    state = current_app.extensions.setdefault('typeahead', {})
+    now = time.monotonic()
+    if state.get('indexes') is not None and now < state.get('next_check', 0):
+        return state['indexes']
+
+    with _lock:
+        counter = _change_counter()
+        state['next_check'] = now + current_app.config.get('TYPEAHEAD_CHECK_SECONDS', 2)
+        if state.get('indexes') is None or state.get('counter') != counter:
+            if state.get('food') is None:
+                state['food'] = build_food_index()
+            state['indexes'] = {**build_recipe_indexes(), 'food': state['food']}
+            state['counter'] = counter
+        return state['indexes']
+
+
+def invalidate_typeahead():
+    """Rebuild the recipe indexes on next use; the USDA index is kept."""
+    state = current_app.extensions.get('typeahead')
+    if state:
+        with _lock:
+            state['indexes'] = None
+
+
+def suggest(prefix, kinds=KINDS, limit=10):
+    """
+    Suggestions for `prefix`.
+
+    Returns:
+        dict: {kind: [{'name', 'count'}]} for each requested kind.
+    """
+    indexes = get_typeahead()
+    return {
+        kind: [{'name': name, 'count': count} for name, count in indexes[kind].search(prefix, limit)]
+        for kind in kinds
+    }
@@ -0,0 +1,67 @@
+"""
+Read-only bind for the USDA reference database.
+
+The USDA tables never change while the app runs, so the models that read
+them (`__bind_key__ = USDA_BIND`) go through their own engine. When
+USDA_DATABASE_PATH is set, that engine opens the file with
+`mode=ro&immutable=1`: SQLite takes no locks and does no change detection,
+reference lookups never wait on recipe writes, and with mmap every worker
+process reads the same OS page cache pages. Replace the file and restart
+the workers to load new USDA data.
+
+Without USDA_DATABASE_PATH the bind shares the main engine, so the USDA
+tables live in the main database and are written in the same transaction
+as everything else; tests and benchmarks seed them that way.
+
+Config:
+    USDA_DATABASE_PATH  USDA SQLite file (default: the main database)
+    USDA_CACHE_MB       page cache per connection (default 64)
+    USDA_MMAP_MB        memory-mapped window (default 256)
+"""
+import os
+
+from sqlalchemy import event
+
+USDA_BIND = 'usda'
+
+
+def usda_database_uri(path):
+    """SQLAlchemy URI opening `path` read-only and immutable."""
+    path = os.path.abspath(path).replace(os.sep, '/')
+    return f"sqlite:///file:{path}?mode=ro&immutable=1&uri=true"
+
+
+def configure_usda_bind(app):
+    """Add the USDA bind to SQLALCHEMY_BINDS; call before db.init_app."""
+    app.config.setdefault('USDA_DATABASE_PATH', None)
+    app.config.setdefault('USDA_CACHE_MB', 64)
+    app.config.setdefault('USDA_MMAP_MB', 256)
+
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    if USDA_BIND not in binds:
+        path = app.config['USDA_DATABASE_PATH']
+        binds[USDA_BIND] = usda_database_uri(path) if path else app.config['SQLALCHEMY_DATABASE_URI']
+
+
+def init_usda_bind(app, db):
+    """
+    Tune connections of the read-only USDA engine, or point the bind at the
+    main engine when there is no separate USDA file; call after db.init_app.
+    """
+    with app.app_context():
+        if not app.config['USDA_DATABASE_PATH']:
+            # A second engine on the same SQLite file would wait on the main one's write lock
+            db.engines[USDA_BIND].dispose()
+            db.engines[USDA_BIND] = db.engine
+            return
+        engine = db.engines[USDA_BIND]
+    cache_kib = int(app.config['USDA_CACHE_MB']) * 1024
+    mmap_bytes = int(app.config['USDA_MMAP_MB']) * 1024 * 1024
+
+    @event.listens_for(engine, 'connect')
+    def _tune_connection(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA cache_size = -{cache_kib}")  # Negative sizes are in KiB
+        cursor.execute(f"PRAGMA mmap_size = {mmap_bytes}")
+        cursor.execute("PRAGMA query_only = 1")
+        cursor.close()
@@ -128,6 +128,25 @@ def aggregate_ingredients(ingredients):
 
     return aggregated
 
+def format_grocery_quantity(quantity):
+    """Round a quantity for display: whole numbers without decimals, others to two places."""
+    if isinstance(quantity, float):
+        return f"{quantity:.2f}" if quantity % 1 else f"{int(quantity)}"
+    return str(quantity)
+
+
+def iter_grocery_list_lines(aggregated_ingredients):
+    """
+    Yield the lines of a rendered grocery list one at a time.
+
+    Args:
+        aggregated_ingredients (iterable[dict]): Aggregated ingredients with 'item_name', 'unit', and 'quantity'.
+    """
+    for ingredient in aggregated_ingredients:
+        formatted_quantity = format_grocery_quantity(ingredient["quantity"])
+        yield f"{formatted_quantity} {ingredient['unit']} of {ingredient['item_name']}"
+
+
 def render_grocery_list(aggregated_ingredients):
     """
     Render the grocery list in a human-readable format.
@@ -138,21 +157,6 @@ def render_grocery_list(aggregated_ingredients):
     Returns:
         str: Formatted grocery list as a string.
     """
-    def format_quantity(quantity):
-        # Round quantities for display
-        if isinstance(quantity, float):
-            return f"{quantity:.2f}" if quantity % 1 else f"{int(quantity)}"
-        return str(quantity)
-
-    # Format each ingredient
-    rendered_list = []
-    for ingredient in aggregated_ingredients:
-        item_name = ingredient["item_name"]
-        quantity = ingredient["quantity"]
-        unit = ingredient["unit"]
-        formatted_quantity = format_quantity(quantity)
-        rendered_list.append(f"{formatted_quantity} {unit} of {item_name}")
-    
-    return "\n".join(rendered_list)
+    return "\n".join(iter_grocery_list_lines(aggregated_ingredients))
 
 
@@ -0,0 +1,265 @@
+"""
+Deterministic synthetic catalogue generator for the kitchen benchmarks.
+
+Ingredient names, quantities, units and store categories are sampled from
+`ingredient_parsing_data.csv`; recipe titles and instruction text come from
+`recipes.json`. The same seed always produces the same catalogue, so timings
+taken on different commits are comparable.
+"""
+import csv
+import json
+import os
+import random
+from collections import Counter
+
+from sqlalchemy import insert
+
+from app import db
+from app.canonical import canonical_key
+from app.recipe_duplicates import rebuild_recipe_signatures
+from app.recipe_nutrition import rebuild_recipe_nutrition
+from app.models import (
+    CanonicalIngredient, Food, Ingredient, IngredientSection, FoodPortion, MealSlot, MeasureUnit, Nutrient, Recipe,
+    Section, Store, WeeklyPlan,
+)
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MEAL_TYPES = ["breakfast", "lunch", "dinner"]
+
+# Map the free-form units in the parsing data onto the app's unit registry
+CSV_UNIT_MAP = {
+    "cups": "Cup",
+    "tablespoons": "Tablespoon (tbsp)",
+    "teaspoons": "Teaspoon (tsp)",
+    "cloves": "Piece",
+    "pounds": "Pound (lb)",
+    "ounces": "Ounce (oz)",
+    "sprigs": "Sprig",
+    "sticks": "Stick",
+    "yolks": "Piece",
+    "whites": "Piece",
+    "juice of": "Juice of",
+    "blocks": "Block",
+    "zest of": "Zest of",
+    "box": "Packet",
+    "can": "Can",
+}
+
+# USDA nutrient (name, unit) and the range of amounts per 100 g drawn for each food
+NUTRIENT_RANGES = {
+    ("Energy", "KCAL"): (0, 900),
+    ("Protein", "G"): (0, 40),
+    ("Total lipid (fat)", "G"): (0, 100),
+    ("Carbohydrate, by difference", "G"): (0, 100),
+}
+KJ_PER_KCAL = 4.184
+
+INSERT_CHUNK = 10000
+
+
+def _weighted(counter):
+    """Split a Counter into parallel (values, weights) lists in a stable order."""
+    items = sorted(counter.items())
+    return [value for value, _ in items], [weight for _, weight in items]
+
+
+class CatalogueGenerator:
+    """Produce recipes, plans, stores and USDA rows from the repo's sample data."""
+
+    def __init__(self, seed=42, data_dir=REPO_ROOT):
+        self.random_seed = seed
+        self.rng = random.Random(seed)
+        self._load_distributions(data_dir)
+
+    def _load_distributions(self, data_dir):
+        names, quantities, units, descriptors = Counter(), Counter(), Counter(), Counter()
+        self.categories = {}
+        recipe_names = set()
+
+        with open(os.path.join(data_dir, 'ingredient_parsing_data.csv'), newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                name = row['name'].strip()
+                names[name] += 1
+                self.categories.setdefault(name, row['category'].strip() or 'Uncategorized')
+                quantities[row['quantity'].strip()] += 1
+                units[CSV_UNIT_MAP.get(row['unit'].strip().lower(), 'unitless')] += 1
+                if row['descriptor'].strip():
+                    descriptors[row['descriptor'].strip()] += 1
+                recipe_names.add(row['recipe name'].strip())
+
+        with open(os.path.join(data_dir, 'recipes.json'), encoding='utf-8') as f:
+            recipes = json.load(f)
+        recipe_names.update(recipe['name'].title() for recipe in recipes)
+        self.instructions = [recipe['instructions'] for recipe in recipes]
+
+        self.names, self.name_weights = _weighted(names)
+        self.quantities, self.quantity_weights = _weighted(quantities)
+        self.units, self.unit_weights = _weighted(units)
+        self.descriptors = sorted(descriptors)
+        self.recipe_names = sorted(recipe_names)
+        self.section_names = sorted(set(self.categories.values()))
+
+        measure_unit_csv = os.path.join(data_dir, 'SQLiteStuff', 'measure_unit.csv')
+        with open(measure_unit_csv, newline='', encoding='utf-8') as f:
+            self.measure_units = [(int(row['id']), row['name']) for row in csv.DictReader(f)]
+
+    def recipe_name(self, index):
+        return f"{self.rng.choice(self.recipe_names)} {index}"
+
+    def ingredient_rows(self, count):
+        """Sample `count` ingredients as dicts shaped like the recipe API payload."""
+        names = self.rng.choices(self.names, self.name_weights, k=count)
+        quantities = self.rng.choices(self.quantities, self.quantity_weights, k=count)
+        units = self.rng.choices(self.units, self.unit_weights, k=count)
+        return [
+            {
+                'item_name': name,
+                'quantity': quantity,
+                'unit': unit,
+                'size': '',
+                'descriptor': self.rng.choice(self.descriptors) if self.rng.random() < 0.3 else '',
+                'additional_descriptor': '',
+            }
+            for name, quantity, unit in zip(names, quantities, units)
+        ]
+
+    def recipe_payload(self, index, ingredients_per_recipe=10):
+        """Build a POST /api/recipes body for a new recipe."""
+        return {
+            'name': self.recipe_name(index),
+            'cook_time': str(self.rng.randint(10, 180)),
+            'servings': str(self.rng.randint(1, 8)),
+            'instructions': self.rng.choice(self.instructions),
+            'ingredients': self.ingredient_rows(ingredients_per_recipe),
+        }
+
+    def meals(self, recipe_ids):
+        """One meal per day and meal type, drawn from `recipe_ids`."""
+        return [
+            {'day': day, 'meal_type': meal_type, 'recipe_id': self.rng.choice(recipe_ids)}
+            for day in DAYS for meal_type in MEAL_TYPES
+        ]
+
+    def plan_payload(self, recipe_ids, name="Benchmark Plan"):
+        """Build a POST /api/weekly_plan body."""
+        return {'name': name, 'meals': self.meals(recipe_ids)}
+
+    def seed(self, n_recipes, ingredients_per_recipe=10, n_plans=None, n_stores=3, n_foods=None):
+        """
+        Bulk-load a catalogue into the current app's database.
+
+        Returns:
+            dict: Row counts and the id ranges the benchmarks draw from.
+        """
+        n_plans = n_plans if n_plans is not None else max(1, n_recipes // 100)
+        n_foods = n_foods if n_foods is not None else n_recipes
+
+        recipes, ingredients, canonical_ids = [], [], {}
+        ingredient_id = 0
+        for recipe_id in range(1, n_recipes + 1):
+            payload = self.recipe_payload(recipe_id, ingredients_per_recipe)
+            recipes.append({
+                'id': recipe_id,
+                'name': payload['name'],
+                'cook_time': int(payload['cook_time']),
+                'servings': int(payload['servings']),
+                'instructions': payload['instructions'],
+            })
+            for item in payload['ingredients']:
+                ingredient_id += 1
+                key = canonical_key(item['item_name'])
+                canonical_ids.setdefault(key, (len(canonical_ids) + 1, item['item_name']))
+                ingredients.append({
+                    'id': ingredient_id,
+                    'recipe_id': recipe_id,
+                    'item_name': item['item_name'],
+                    'canonical_id': canonical_ids[key][0],
+                    'quantity': float(item['quantity']) if item['quantity'] else None,
+                    'original_quantity': item['quantity'],
+                    'unit': item['unit'],
+                    'size': item['size'],
+                    'descriptor': item['descriptor'],
+                    'additional_descriptor': item['additional_descriptor'],
+                })
+        self._bulk_insert(Recipe, recipes)
+        self._bulk_insert(CanonicalIngredient, [
+            {'id': canonical_id, 'key': key, 'name': name} for key, (canonical_id, name) in canonical_ids.items()
+        ])
+        self._bulk_insert(Ingredient, ingredients)
+
+        stores, sections, section_ids = [], [], {}
+        section_id = 0
+        for store_id in range(1, n_stores + 1):
+            stores.append({'id': store_id, 'name': f"Store {store_id}", 'is_default': store_id == 1})
+            for order, name in enumerate(self.section_names):
+                section_id += 1
+                sections.append({'id': section_id, 'name': name, 'order': order, 'store_id': store_id})
+                if store_id == 1:
+                    section_ids[name] = section_id
+        self._bulk_insert(Store, stores)
+        self._bulk_insert(Section, sections)
+
+        # Categorize every ingredient against the default store
+        self._bulk_insert(IngredientSection, [
+            {'ingredient_id': row['id'], 'section_id': section_ids[self.categories[row['item_name']]]}
+            for row in ingredients
+        ])
+
+        recipe_ids = list(range(1, n_recipes + 1))
+        plans, slots = [], []
+        for plan_id in range(1, n_plans + 1):
+            plans.append({'id': plan_id, 'name': f"Benchmark Plan {plan_id}"})
+            for meal in self.meals(recipe_ids):
+                slots.append({'weekly_plan_id': plan_id, **meal})
+        self._bulk_insert(WeeklyPlan, plans)
+        self._bulk_insert(MealSlot, slots)
+
+        foods = []
+        for fdc_id in range(1, n_foods + 1):
+            name = self.rng.choices(self.names, self.name_weights)[0]
+            descriptor = self.rng.choice(self.descriptors)
+            foods.append({'fdc_id': fdc_id, 'description': f"{name}, {descriptor.lower()} {fdc_id}"})
+        self._bulk_insert(Food, foods)
+        nutrients = []
+        for fdc_id in range(1, n_foods + 1):
+            amounts = {nutrient: round(self.rng.uniform(low, high), 2) for nutrient, (low, high) in NUTRIENT_RANGES.items()}
+            amounts["Energy", "kJ"] = round(amounts["Energy", "KCAL"] * KJ_PER_KCAL, 2)  # USDA lists both
+            nutrients.extend(
+                {'food_id': fdc_id, 'name': name, 'unit_name': unit, 'amount_per_100g': amount}
+                for (name, unit), amount in amounts.items()
+            )
+        self._bulk_insert(Nutrient, nutrients)
+        self._bulk_insert(MeasureUnit, [{'id': unit_id, 'name': name} for unit_id, name in self.measure_units])
+
+        # One density and one typical item weight per food
+        unit_ids = {name: unit_id for unit_id, name in self.measure_units}
+        portions = []
+        for fdc_id in range(1, n_foods + 1):
+            cup_grams, each_grams = self.rng.uniform(50, 300), self.rng.uniform(5, 250)
+            for name, grams in (('cup', cup_grams), ('tablespoon', cup_grams / 16), ('teaspoon', cup_grams / 48), ('each', each_grams)):
+                portions.append({
+                    'id': len(portions) + 1, 'fdc_id': fdc_id, 'amount': 1.0,
+                    'measure_unit_id': unit_ids[name], 'gram_weight': round(grams, 1),
+                })
+        self._bulk_insert(FoodPortion, portions)
+        rebuild_recipe_nutrition()
+        rebuild_recipe_signatures()
+
+        db.session.commit()
+        return {
+            'recipes': n_recipes,
+            'ingredients': len(ingredients),
+            'plans': n_plans,
+            'meal_slots': len(slots),
+            'stores': n_stores,
+            'sections': len(sections),
+            'foods': n_foods,
+            'nutrients': len(nutrients),
+        }
+
+    @staticmethod
+    def _bulk_insert(model, rows):
+        for start in range(0, len(rows), INSERT_CHUNK):
+            db.session.execute(insert(model), rows[start:start + INSERT_CHUNK])
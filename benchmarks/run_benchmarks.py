@@ -0,0 +1,228 @@
+"""
+Benchmark suite for the kitchen workloads.
+
+Seeds a fresh SQLite database per scale with the synthetic catalogue from
+`benchmarks.data_generator`, times each workload through the Flask test
+client and writes the results to a JSON file.
+
+Usage:
+    python -m benchmarks.run_benchmarks --scales 1000 10000 100000 --output bench_results.json
+    python -m benchmarks.run_benchmarks --scales 1000 --compare bench_results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from app import create_app, db
+from app.models import Food, MeasureUnit
+from benchmarks.data_generator import REPO_ROOT, CatalogueGenerator
+
+DEFAULT_SCALES = [1000, 10000, 100000]
+
+
+def summarize(samples):
+    """Reduce a list of durations (seconds) to millisecond statistics."""
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        'n': len(ordered),
+        'min_ms': ordered[0] * 1000,
+        'median_ms': statistics.median(ordered) * 1000,
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p95_ms': ordered[p95_index] * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def time_workload(func, repeat, warmup=1):
+    """Run `func` `warmup` times untimed, then `repeat` times timed."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+def build_workloads(app, generator, summary, ingredients_per_recipe):
+    """Map workload names to zero-argument callables."""
+    client = app.test_client()
+    recipe_ids = list(range(1, summary['recipes'] + 1))
+    plan_ids = list(range(1, summary['plans'] + 1))
+    next_recipe = [summary['recipes']]
+
+    def recipe_list():
+        _check(client.get('/api/recipes'))
+
+    def recipe_save():
+        next_recipe[0] += 1
+        _check(client.post('/api/recipes', json=generator.recipe_payload(next_recipe[0], ingredients_per_recipe)))
+
+    def plan_save():
+        _check(client.post('/api/weekly_plan', json=generator.plan_payload(recipe_ids)))
+
+    def plan_update():
+        plan_id = generator.rng.choice(plan_ids)
+        _check(client.put(f'/api/weekly_plan/{plan_id}', json=generator.plan_payload(recipe_ids)))
+
+    def grocery_list_generate():
+        _check(client.post('/api/generate_grocery_list', json={'meals': generator.meals(recipe_ids)}))
+
+    def grocery_list_plan():
+        plan_id = generator.rng.choice(plan_ids)
+        _check(client.get(f'/api/grocery_list?weekly_plan_id={plan_id}'))
+
+    def categorized_list():
+        plan_id = generator.rng.choice(plan_ids)
+        _check(client.get(f'/grocery/api/grocery_list?weekly_plan_id={plan_id}&store_id=1'))
+
+    def grocery_list_export():
+        plan_id = generator.rng.choice(plan_ids)
+        _check(client.get(f'/api/grocery_list/export?weekly_plan_id={plan_id}&format=csv&store_id=1'))
+
+    def usda_lookup():
+        with app.app_context():
+            db.session.get(Food, generator.rng.randint(1, summary['foods']))
+            prefix = generator.rng.choice(generator.names)[:4]
+            Food.query.filter(Food.description.like(f"{prefix}%")).limit(20).all()
+            MeasureUnit.query.filter_by(name=generator.rng.choice(generator.measure_units)[1]).first()
+
+    return {
+        'recipe_list': recipe_list,
+        'recipe_save': recipe_save,
+        'plan_save': plan_save,
+        'plan_update': plan_update,
+        'grocery_list_generate': grocery_list_generate,
+        'grocery_list_plan': grocery_list_plan,
+        'categorized_list': categorized_list,
+        'grocery_list_export': grocery_list_export,
+        'usda_lookup': usda_lookup,
+    }
+
+
+def run_scale(scale, args):
+    """Seed a database with `scale` recipes and time every workload against it."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+            'TESTING': True,
+            'RECIPE_CATALOGUE_ENABLED': args.recipe_catalogue,
+        })
+        if not args.verbose:
+            # Importing the routes configures DEBUG logging on the root logger
+            logging.getLogger().setLevel(logging.ERROR)
+        generator = CatalogueGenerator(seed=args.seed)
+
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            summary = generator.seed(scale, ingredients_per_recipe=args.ingredients)
+            seed_seconds = time.perf_counter() - start
+
+        workloads = build_workloads(app, generator, summary, args.ingredients)
+        selected = args.workloads or list(workloads)
+        results = {}
+        for name in selected:
+            # The routes print request payloads; keep them out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[name] = time_workload(workloads[name], args.repeat)
+            print(f"  {name:<24} median {results[name]['median_ms']:9.2f} ms  p95 {results[name]['p95_ms']:9.2f} ms")
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    return {'rows': summary, 'seed_seconds': seed_seconds, 'workloads': results}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path, threshold):
+    """Print median ratios against a previous results file; return True on regression."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressed = False
+    print(f"\nComparison against {baseline_path} (commit {baseline['meta'].get('commit')})")
+    for scale, result in current['scales'].items():
+        previous = baseline['scales'].get(scale)
+        if not previous:
+            continue
+        for name, stats in result['workloads'].items():
+            before = previous['workloads'].get(name)
+            if not before:
+                continue
+            ratio = stats['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+            flag = "REGRESSION" if ratio > threshold else ""
+            regressed = regressed or bool(flag)
+            print(f"  {scale:>7} {name:<24} {before['median_ms']:9.2f} -> {stats['median_ms']:9.2f} ms  x{ratio:5.2f} {flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the kitchen workloads against a synthetic catalogue.")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help="Number of recipes per run")
+    parser.add_argument('--ingredients', type=int, default=10, help="Ingredients per recipe")
+    parser.add_argument('--repeat', type=int, default=20, help="Timed iterations per workload")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workloads', nargs='+', help="Only run these workloads")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="Previous results file to compare medians against")
+    parser.add_argument('--threshold', type=float, default=1.10, help="Median ratio treated as a regression")
+    parser.add_argument('--recipe-catalogue', action='store_true', help="Serve reads from the in-memory recipe catalogue")
+    parser.add_argument('--verbose', action='store_true', help="Keep the app's debug and warning logs on")
+    args = parser.parse_args(argv)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'ingredients_per_recipe': args.ingredients,
+            'repeat': args.repeat,
+            'recipe_catalogue': args.recipe_catalogue,
+        },
+        'scales': {},
+    }
+    for scale in args.scales:
+        print(f"Scale {scale} recipes")
+        report['scales'][str(scale)] = run_scale(scale, args)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare and compare(report, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -51,6 +51,26 @@ def get_metadata():
     return target_db.metadata
 
 
+def get_usda_tables():
+    """Tables of the models bound to the USDA database (see app/usda_db.py)."""
+    from app.usda_db import USDA_BIND
+    if hasattr(target_db, 'metadatas') and USDA_BIND in target_db.metadatas:
+        return set(target_db.metadatas[USDA_BIND].tables)
+    return set()
+
+
+usda_tables = get_usda_tables()
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # USDA reference tables are loaded from the USDA export, not migrated. Without
+    # USDA_DATABASE_PATH they sit in the main database, where autogenerate would
+    # otherwise see them as tables to drop.
+    if type_ == 'table' and name in usda_tables:
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +85,7 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True, include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,18 +113,35 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # The app turns on SQLite foreign keys for every connection (see
+        # app/database_utils.py). Batch migrations rebuild a table by dropping
+        # it, which would fail, or cascade into the child tables, while they
+        # are enforced, so migrations run with them off.
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            connection.exec_driver_sql('PRAGMA foreign_keys = OFF')
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
             **conf_args
         )
 
-        with context.begin_transaction():
-            context.run_migrations()
+        try:
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            # The connection goes back to the app's pool
+            if sqlite:
+                connection.rollback()
+                connection.exec_driver_sql('PRAGMA foreign_keys = ON')
+                connection.commit()
 
 
 if context.is_offline_mode():
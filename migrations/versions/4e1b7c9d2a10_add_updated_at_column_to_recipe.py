@@ -0,0 +1,29 @@
+"""Add updated_at column to recipe
+
+Revision ID: 4e1b7c9d2a10
+Revises: 282b3d02ef25
+Create Date: 2026-10-19 14:20:11.302114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e1b7c9d2a10'
+down_revision = '282b3d02ef25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Give existing recipes a validator so they can be served conditionally
+    op.execute("UPDATE recipe SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
+
+
+def downgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,39 @@
+"""Add plan_grocery_item table
+
+Revision ID: 5d2e8f1a6c34
+Revises: 9c3f5a8e7b21
+Create Date: 2026-10-19 14:58:02.114377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2e8f1a6c34'
+down_revision = '9c3f5a8e7b21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('plan_grocery_item',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('weekly_plan_id', sa.Integer(), nullable=False),
+    sa.Column('item_name', sa.String(length=100), nullable=False),
+    sa.Column('unit', sa.String(length=50), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('occurrences', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['weekly_plan_id'], ['weekly_plan.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('weekly_plan_id', 'item_name', 'unit')
+    )
+    with op.batch_alter_table('plan_grocery_item', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_plan_grocery_item_weekly_plan_id'), ['weekly_plan_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('plan_grocery_item', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_plan_grocery_item_weekly_plan_id'))
+
+    op.drop_table('plan_grocery_item')
@@ -0,0 +1,26 @@
+"""Add servings column to meal_slot
+
+Revision ID: 9c3f5a8e7b21
+Revises: 4e1b7c9d2a10
+Create Date: 2026-10-19 14:41:37.918250
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3f5a8e7b21'
+down_revision = '4e1b7c9d2a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('meal_slot', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('servings', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('meal_slot', schema=None) as batch_op:
+        batch_op.drop_column('servings')
@@ -0,0 +1,97 @@
+"""Cascade recipe, store and plan deletes in the database
+
+Revision ID: a3f9d6b1c274
+Revises: d4a7c9e2f610
+Create Date: 2026-10-19 20:12:40.184376
+
+Foreign keys to recipe, weekly_plan, store, section and ingredient get
+ON DELETE actions, and their columns get indexes so the cascades do not
+scan the child tables. The app turns on `PRAGMA foreign_keys` for SQLite.
+
+Batch mode does not carry expression indexes over when it rebuilds a
+table, so ix_ingredient_normalized_name is recreated after each rebuild.
+
+Section assignments of ingredients deleted before this revision were left
+behind; they are removed here, as are other rows the new constraints would
+reject.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f9d6b1c274'
+down_revision = 'd4a7c9e2f610'
+branch_labels = None
+depends_on = None
+
+# Names for the foreign keys the earlier revisions left unnamed, so batch mode can drop them
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+# (table, column, referred table, ON DELETE action)
+FOREIGN_KEYS = [
+    ('ingredient', 'recipe_id', 'recipe', 'CASCADE'),
+    ('meal_slot', 'weekly_plan_id', 'weekly_plan', 'CASCADE'),
+    ('meal_slot', 'recipe_id', 'recipe', 'SET NULL'),
+    ('recipe_nutrition', 'recipe_id', 'recipe', 'CASCADE'),
+    ('plan_grocery_item', 'weekly_plan_id', 'weekly_plan', 'CASCADE'),
+    ('section', 'store_id', 'store', 'CASCADE'),
+    ('ingredient_section', 'ingredient_id', 'ingredient', 'CASCADE'),
+    ('ingredient_section', 'section_id', 'section', 'CASCADE'),
+]
+
+# Columns that get an index; plan_grocery_item.weekly_plan_id already has one
+INDEXED = [(table, column) for table, column, _, _ in FOREIGN_KEYS if table not in ('recipe_nutrition', 'plan_grocery_item')]
+
+# Expression indexes the batch rebuilds drop: (table, name, expression)
+EXPRESSION_INDEXES = [('ingredient', 'ix_ingredient_normalized_name', 'lower(trim(item_name))')]
+
+
+def _tables():
+    tables = {}
+    for table, column, referred, ondelete in FOREIGN_KEYS:
+        tables.setdefault(table, []).append((column, referred, ondelete))
+    return tables
+
+
+def _fk_name(table, column, referred):
+    return NAMING_CONVENTION['fk'] % {'table_name': table, 'column_0_name': column, 'referred_table_name': referred}
+
+
+def _recreate_expression_indexes(table):
+    for indexed_table, name, expression in EXPRESSION_INDEXES:
+        if indexed_table == table:
+            op.create_index(name, table, [sa.text(expression)], unique=False)
+
+
+def upgrade():
+    # Rows pointing at deleted parents would fail the rebuilt constraints
+    op.execute("DELETE FROM ingredient_section WHERE ingredient_id NOT IN (SELECT id FROM ingredient)")
+    op.execute("DELETE FROM ingredient_section WHERE section_id NOT IN (SELECT id FROM section)")
+    op.execute("UPDATE meal_slot SET recipe_id = NULL WHERE recipe_id NOT IN (SELECT id FROM recipe)")
+    op.execute("DELETE FROM recipe_nutrition WHERE recipe_id NOT IN (SELECT id FROM recipe)")
+
+    for table, foreign_keys in _tables().items():
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            for column, referred, ondelete in foreign_keys:
+                name = _fk_name(table, column, referred)
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+            for indexed_table, column in INDEXED:
+                if indexed_table == table:
+                    batch_op.create_index(batch_op.f(f'ix_{table}_{column}'), [column], unique=False)
+        _recreate_expression_indexes(table)
+
+
+def downgrade():
+    for table, foreign_keys in _tables().items():
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            for indexed_table, column in INDEXED:
+                if indexed_table == table:
+                    batch_op.drop_index(batch_op.f(f'ix_{table}_{column}'))
+            for column, referred, _ in foreign_keys:
+                name = _fk_name(table, column, referred)
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referred, [column], ['id'])
+        _recreate_expression_indexes(table)
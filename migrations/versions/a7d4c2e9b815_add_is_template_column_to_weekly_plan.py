@@ -0,0 +1,26 @@
+"""Add is_template column to weekly_plan
+
+Revision ID: a7d4c2e9b815
+Revises: 5d2e8f1a6c34
+Create Date: 2026-10-19 15:21:44.602913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d4c2e9b815'
+down_revision = '5d2e8f1a6c34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('weekly_plan', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_template', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('weekly_plan', schema=None) as batch_op:
+        batch_op.drop_column('is_template')
@@ -0,0 +1,69 @@
+"""Backfill ingredient.canonical_id
+
+Revision ID: b2d7e4a9c163
+Revises: f3b8c1d6a925
+Create Date: 2026-10-20 09:41:52.306114
+
+Ingredients saved before canonical ids existed get one here, so grocery
+lists only ever group on the integer id. Names are normalized with
+app.canonical.canonical_key; a new canonical ingredient is displayed with
+the spelling of its oldest ingredient. USDA foods are matched later by
+`flask rebuild-recipe-nutrition`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.canonical import canonical_key
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d7e4a9c163'
+down_revision = 'f3b8c1d6a925'
+branch_labels = None
+depends_on = None
+
+ingredient = sa.table(
+    'ingredient',
+    sa.column('id', sa.Integer), sa.column('item_name', sa.String), sa.column('canonical_id', sa.Integer),
+)
+canonical_ingredient = sa.table(
+    'canonical_ingredient',
+    sa.column('id', sa.Integer), sa.column('key', sa.String), sa.column('name', sa.String),
+)
+
+
+def upgrade():
+    connection = op.get_bind()
+    names = [
+        name for (name,) in connection.execute(
+            sa.select(ingredient.c.item_name)
+            .where(ingredient.c.canonical_id.is_(None), ingredient.c.item_name != '')
+            .group_by(ingredient.c.item_name)
+            .order_by(sa.func.min(ingredient.c.id))
+        )
+    ]
+    if not names:
+        return
+
+    keys = {name: canonical_key(name) for name in names}
+    ids = dict(connection.execute(sa.select(canonical_ingredient.c.key, canonical_ingredient.c.id)).all())
+    missing = {}
+    for name in names:
+        if keys[name] not in ids:
+            missing.setdefault(keys[name], name.strip()[:100])
+    if missing:
+        connection.execute(canonical_ingredient.insert(), [{'key': key, 'name': name} for key, name in missing.items()])
+        ids = dict(connection.execute(sa.select(canonical_ingredient.c.key, canonical_ingredient.c.id)).all())
+
+    connection.execute(
+        ingredient.update()
+        .where(ingredient.c.item_name == sa.bindparam('raw_name'), ingredient.c.canonical_id.is_(None))
+        .values(canonical_id=sa.bindparam('new_canonical_id')),
+        [{'raw_name': name, 'new_canonical_id': ids[keys[name]]} for name in names]
+    )
+
+
+def downgrade():
+    # Backfilled ids are indistinguishable from ids set on save, and valid either way
+    pass
@@ -0,0 +1,29 @@
+"""Add recipe_change log
+
+Revision ID: b8e4f2c61d93
+Revises: f1c6d8a3e592
+Create Date: 2026-10-19 18:04:51.219337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f2c61d93'
+down_revision = 'f1c6d8a3e592'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recipe_change',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('recipe_id', sa.Integer(), nullable=True),
+    sa.Column('changed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('recipe_change')
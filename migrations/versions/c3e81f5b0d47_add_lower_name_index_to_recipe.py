@@ -0,0 +1,26 @@
+"""Add lower(name) index to recipe
+
+Revision ID: c3e81f5b0d47
+Revises: a7d4c2e9b815
+Create Date: 2026-10-19 15:48:09.331276
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e81f5b0d47'
+down_revision = 'a7d4c2e9b815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.create_index('ix_recipe_name_lower', [sa.text('lower(name)')], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.drop_index('ix_recipe_name_lower')
@@ -0,0 +1,45 @@
+"""Add recipe_signature and recipe_signature_band tables
+
+Revision ID: c7e2b5a9f413
+Revises: a3f9d6b1c274
+Create Date: 2026-10-19 20:58:12.640917
+
+Run `flask rebuild-recipe-signatures` after upgrading to sign existing
+recipes.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2b5a9f413'
+down_revision = 'a3f9d6b1c274'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recipe_signature',
+    sa.Column('recipe_id', sa.Integer(), nullable=False),
+    sa.Column('signature', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['recipe_id'], ['recipe.id'], name='fk_recipe_signature_recipe_id_recipe', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('recipe_id')
+    )
+    op.create_table('recipe_signature_band',
+    sa.Column('recipe_id', sa.Integer(), nullable=False),
+    sa.Column('band', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['recipe_id'], ['recipe_signature.recipe_id'], name='fk_recipe_signature_band_recipe_id_recipe_signature', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('recipe_id', 'band')
+    )
+    with op.batch_alter_table('recipe_signature_band', schema=None) as batch_op:
+        batch_op.create_index('ix_recipe_signature_band_bucket', ['band', 'bucket'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recipe_signature_band', schema=None) as batch_op:
+        batch_op.drop_index('ix_recipe_signature_band_bucket')
+
+    op.drop_table('recipe_signature_band')
+    op.drop_table('recipe_signature')
@@ -0,0 +1,54 @@
+"""Add recipe_nutrition table and canonical_ingredient.fdc_id
+
+Revision ID: d4a7c9e2f610
+Revises: b8e4f2c61d93
+Create Date: 2026-10-19 19:26:08.502914
+
+Run `flask rebuild-recipe-nutrition` after upgrading to match existing
+canonical ingredients to USDA foods and fill the table.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a7c9e2f610'
+down_revision = 'b8e4f2c61d93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('canonical_ingredient', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fdc_id', sa.Integer(), nullable=True))
+
+    op.create_table('recipe_nutrition',
+    sa.Column('recipe_id', sa.Integer(), nullable=False),
+    sa.Column('calories', sa.Float(), nullable=False),
+    sa.Column('protein', sa.Float(), nullable=False),
+    sa.Column('fat', sa.Float(), nullable=False),
+    sa.Column('carbohydrate', sa.Float(), nullable=False),
+    sa.Column('matched_ingredients', sa.Integer(), nullable=False),
+    sa.Column('ingredient_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['recipe_id'], ['recipe.id'], ),
+    sa.PrimaryKeyConstraint('recipe_id')
+    )
+    with op.batch_alter_table('recipe_nutrition', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_recipe_nutrition_calories'), ['calories'], unique=False)
+        batch_op.create_index(batch_op.f('ix_recipe_nutrition_protein'), ['protein'], unique=False)
+        batch_op.create_index(batch_op.f('ix_recipe_nutrition_fat'), ['fat'], unique=False)
+        batch_op.create_index(batch_op.f('ix_recipe_nutrition_carbohydrate'), ['carbohydrate'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recipe_nutrition', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_recipe_nutrition_carbohydrate'))
+        batch_op.drop_index(batch_op.f('ix_recipe_nutrition_fat'))
+        batch_op.drop_index(batch_op.f('ix_recipe_nutrition_protein'))
+        batch_op.drop_index(batch_op.f('ix_recipe_nutrition_calories'))
+
+    op.drop_table('recipe_nutrition')
+
+    with op.batch_alter_table('canonical_ingredient', schema=None) as batch_op:
+        batch_op.drop_column('fdc_id')
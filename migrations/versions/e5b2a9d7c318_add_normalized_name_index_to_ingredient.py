@@ -0,0 +1,26 @@
+"""Add normalized name index to ingredient
+
+Revision ID: e5b2a9d7c318
+Revises: c3e81f5b0d47
+Create Date: 2026-10-19 16:34:52.180447
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b2a9d7c318'
+down_revision = 'c3e81f5b0d47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.create_index('ix_ingredient_normalized_name', [sa.text('lower(trim(item_name))')], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.drop_index('ix_ingredient_normalized_name')
@@ -0,0 +1,49 @@
+"""Add recipe_neighbor and recipe_neighbor_refresh tables
+
+Revision ID: e9d4a1c7b852
+Revises: c7e2b5a9f413
+Create Date: 2026-10-19 21:41:27.305118
+
+Run `flask refresh-similar-recipes` after upgrading to fill recipe_neighbor.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9d4a1c7b852'
+down_revision = 'c7e2b5a9f413'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recipe_neighbor',
+    sa.Column('recipe_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('neighbor_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['recipe_id'], ['recipe.id'], name='fk_recipe_neighbor_recipe_id_recipe', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('recipe_id', 'rank')
+    )
+    with op.batch_alter_table('recipe_neighbor', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_recipe_neighbor_neighbor_id'), ['neighbor_id'], unique=False)
+
+    op.create_table('recipe_neighbor_refresh',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('change_id', sa.Integer(), nullable=False),
+    sa.Column('k', sa.Integer(), nullable=False),
+    sa.Column('metric', sa.String(length=20), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('recipe_neighbor_refresh')
+
+    with op.batch_alter_table('recipe_neighbor', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_recipe_neighbor_neighbor_id'))
+
+    op.drop_table('recipe_neighbor')
@@ -0,0 +1,47 @@
+"""Add canonical_ingredient table and ingredient.canonical_id
+
+Revision ID: f1c6d8a3e592
+Revises: e5b2a9d7c318
+Create Date: 2026-10-19 17:12:30.774105
+
+Existing ingredients keep a NULL canonical_id until
+`flask canonicalize-ingredients` is run.
+
+Batch mode does not carry expression indexes over when it rebuilds the
+ingredient table, so ix_ingredient_normalized_name is recreated after it.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6d8a3e592'
+down_revision = 'e5b2a9d7c318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('canonical_ingredient',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=100), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('canonical_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_ingredient_canonical_id'), ['canonical_id'], unique=False)
+        batch_op.create_foreign_key('fk_ingredient_canonical_id', 'canonical_ingredient', ['canonical_id'], ['id'])
+    op.create_index('ix_ingredient_normalized_name', 'ingredient', [sa.text('lower(trim(item_name))')], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_ingredient_canonical_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_ingredient_canonical_id'))
+        batch_op.drop_column('canonical_id')
+    op.create_index('ix_ingredient_normalized_name', 'ingredient', [sa.text('lower(trim(item_name))')], unique=False)
+
+    op.drop_table('canonical_ingredient')
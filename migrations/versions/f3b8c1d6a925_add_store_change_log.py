@@ -0,0 +1,28 @@
+"""Add store_change log
+
+Revision ID: f3b8c1d6a925
+Revises: e9d4a1c7b852
+Create Date: 2026-10-19 23:18:06.542731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8c1d6a925'
+down_revision = 'e9d4a1c7b852'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('store_change',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('store_change')
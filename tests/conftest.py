@@ -0,0 +1,68 @@
+import contextlib
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+
+# Adjust Python path to locate the `app` and `benchmarks` modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from benchmarks.data_generator import CatalogueGenerator
+
+
+@pytest.fixture
+def app():
+    """An app bound to a fresh in-memory database seeded with a small catalogue."""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+    })
+    with app.app_context():
+        db.create_all()
+        CatalogueGenerator(seed=7).seed(n_recipes=40, ingredients_per_recipe=8, n_plans=1, n_foods=50)
+
+    # Requests push their own app context, so each one gets a fresh session
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def count_queries(app):
+    """
+    Context manager factory recording every SQL statement sent to the app's
+    engines, the USDA bind included.
+
+    Usage:
+        with count_queries() as statements:
+            client.get(...)
+        assert len(statements) <= budget
+    """
+    with app.app_context():
+        engines = set(db.engines.values())
+
+    @contextlib.contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            for engine in engines:
+                event.remove(engine, 'before_cursor_execute', record)
+
+    return counter
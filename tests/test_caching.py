@@ -0,0 +1,54 @@
+from app import db
+from app.models import MealSlot, Recipe
+
+
+def test_recipe_revalidates_until_saved(client):
+    first = client.get('/api/recipes/1')
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+    assert 'no-cache' in first.headers['Cache-Control']
+
+    cached = client.get('/api/recipes/1', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.get_data() == b''
+
+    recipe = first.get_json()
+    recipe['ingredients'][0]['descriptor'] = 'Finely Chopped'
+    client.put('/api/recipes/1', json=recipe)
+
+    changed = client.get('/api/recipes/1', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_recipe_listing_changes_when_recipe_deleted(client):
+    recipe = client.post('/api/recipes', json={
+        'name': 'Toast', 'cook_time': '5', 'servings': '1', 'instructions': '', 'ingredients': []
+    }).get_json()
+    etag = client.get('/api/recipes').headers['ETag']
+    assert client.get('/api/recipes', headers={'If-None-Match': etag}).status_code == 304
+
+    assert client.delete(f"/api/recipes/{recipe['id']}").status_code == 200
+
+    assert client.get('/api/recipes', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_grocery_lists_support_if_none_match(client):
+    for url in ('/api/grocery_list?weekly_plan_id=1', '/grocery/api/grocery_list?weekly_plan_id=1&store_id=1'):
+        etag = client.get(url).headers['ETag']
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_grocery_list_changes_when_a_planned_recipe_is_deleted(app, client):
+    with app.app_context():
+        # The plan's least recently updated recipe, so its latest recipe timestamp does not move
+        recipe_id = (
+            db.session.query(Recipe.id).join(MealSlot, MealSlot.recipe_id == Recipe.id)
+            .filter(MealSlot.weekly_plan_id == 1).order_by(Recipe.updated_at, Recipe.id).first()[0]
+        )
+    url = '/api/grocery_list?weekly_plan_id=1'
+    etag = client.get(url).headers['ETag']
+
+    assert client.delete(f"/api/recipes/{recipe_id}").status_code == 200
+
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,42 @@
+from app import db
+from app.canonical import canonical_key
+from app.models import CanonicalIngredient, Ingredient, PlanGroceryItem
+from app.plan_aggregates import ensure_plan_aggregate
+
+
+def test_canonical_key_merges_spellings():
+    assert canonical_key("Garlic") == canonical_key(" garlic ") == canonical_key("Garlic cloves") == "garlic"
+    assert canonical_key("Tomatoes") == "tomato"
+    assert canonical_key("Scallions") == "green onion"
+    assert canonical_key("Asparagus") == "asparagus"
+    assert canonical_key("Bay leaves") == "bay leaf"
+
+
+def test_canonicalize_command_fills_missing_ids(app):
+    with app.app_context():
+        db.session.add_all([
+            Ingredient(recipe_id=1, item_name="Fresh Chives"),
+            Ingredient(recipe_id=2, item_name="fresh chive"),
+        ])
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['canonicalize-ingredients'])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        assert Ingredient.query.filter(Ingredient.canonical_id.is_(None)).count() == 0
+        chives = Ingredient.query.filter(Ingredient.item_name.in_(["Fresh Chives", "fresh chive"])).all()
+        assert len({ingredient.canonical_id for ingredient in chives}) == 1
+        assert db.session.get(CanonicalIngredient, chives[0].canonical_id).key == "fresh chive"
+
+
+def test_canonicalize_command_drops_stored_aggregates(app):
+    with app.app_context():
+        ensure_plan_aggregate(1)
+        db.session.commit()
+        assert PlanGroceryItem.query.count()
+
+    assert app.test_cli_runner().invoke(args=['canonicalize-ingredients', '--all']).exit_code == 0
+
+    with app.app_context():
+        assert PlanGroceryItem.query.count() == 0
@@ -0,0 +1,27 @@
+import pytest
+
+from app.categorizer import NaiveBayesCategorizer, features
+
+EXAMPLES = [
+    ('Whole Milk', 'Dairy Section'), ('Heavy Cream', 'Dairy Section'), ('Unsalted Butter', 'Dairy Section'),
+    ('Yellow Onion', 'Produce Section'), ('Garlic', 'Produce Section'), ('Roma Tomatoes', 'Produce Section'),
+    ('Kosher Salt', 'Aisle 7: Condiments & Baking'), ('Baking Soda', 'Aisle 7: Condiments & Baking'),
+]
+
+
+def test_features_cover_words_and_trigrams():
+    assert features(' Egg ') == ['w:egg', 'c: eg', 'c:egg', 'c:gg ']
+
+
+def test_predicts_batch_with_confidences(tmp_path):
+    model = NaiveBayesCategorizer.train(EXAMPLES)
+
+    predictions = model.predict(['tomato', 'salted butter', 'onions', 'baking powder'])
+    assert [section for section, _ in predictions] == [
+        'Produce Section', 'Dairy Section', 'Produce Section', 'Aisle 7: Condiments & Baking',
+    ]
+    assert all(0 < confidence <= 1 for _, confidence in predictions)
+
+    path = str(tmp_path / 'model.npz')
+    model.save(path)
+    assert NaiveBayesCategorizer.load(path).predict(['tomato', 'salted butter']) == pytest.approx(predictions[:2])
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+
+from flask_migrate import check, downgrade, stamp, upgrade
+
+from app import create_app, db
+
+MIGRATIONS = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'migrations'))
+
+# The schema at 282b3d02ef25, the revision existing databases are stamped at
+BASELINE_SCHEMA = """
+CREATE TABLE recipe (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(100) NOT NULL, cook_time INTEGER, servings INTEGER,
+    instructions TEXT
+);
+CREATE TABLE user (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(255) NOT NULL, email VARCHAR(255) NOT NULL UNIQUE
+);
+CREATE TABLE weekly_plan (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(100) NOT NULL, created_at DATETIME, updated_at DATETIME
+);
+CREATE TABLE food (fdc_id INTEGER NOT NULL PRIMARY KEY, description VARCHAR(255) NOT NULL);
+CREATE TABLE measure_unit (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(50) NOT NULL);
+CREATE TABLE ingredient (
+    id INTEGER NOT NULL PRIMARY KEY, recipe_id INTEGER NOT NULL REFERENCES recipe (id),
+    item_name VARCHAR(100) NOT NULL, quantity FLOAT, original_quantity VARCHAR(50), unit VARCHAR(50),
+    size VARCHAR(50), descriptor VARCHAR(100), additional_descriptor VARCHAR(100)
+);
+CREATE TABLE meal_slot (
+    id INTEGER NOT NULL PRIMARY KEY, weekly_plan_id INTEGER NOT NULL REFERENCES weekly_plan (id),
+    day VARCHAR(20) NOT NULL, meal_type VARCHAR(20) NOT NULL, recipe_id INTEGER REFERENCES recipe (id)
+);
+CREATE TABLE store (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(255) NOT NULL, user_id INTEGER REFERENCES user (id),
+    is_default BOOLEAN
+);
+CREATE TABLE section (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(255) NOT NULL, "order" INTEGER NOT NULL,
+    store_id INTEGER NOT NULL REFERENCES store (id)
+);
+CREATE TABLE ingredient_section (
+    id INTEGER NOT NULL PRIMARY KEY, ingredient_id INTEGER NOT NULL REFERENCES ingredient (id),
+    section_id INTEGER NOT NULL REFERENCES section (id)
+);
+
+INSERT INTO recipe (id, name) VALUES (1, 'Pancakes'), (2, 'Omelette');
+INSERT INTO ingredient (id, recipe_id, item_name, quantity, unit) VALUES
+    (1, 1, 'Flour', 2, 'Cup'), (2, 1, 'Milk', 1, 'Cup'), (3, 2, 'Eggs', 3, NULL), (4, 2, 'flour', 1, 'Cup');
+INSERT INTO weekly_plan (id, name) VALUES (1, 'This week');
+INSERT INTO meal_slot (id, weekly_plan_id, day, meal_type, recipe_id) VALUES
+    (1, 1, 'Monday', 'Breakfast', 1), (2, 1, 'Tuesday', 'Breakfast', 2);
+INSERT INTO store (id, name) VALUES (1, 'Corner shop');
+INSERT INTO section (id, name, "order", store_id) VALUES (1, 'Dairy', 1, 1);
+INSERT INTO ingredient_section (id, ingredient_id, section_id) VALUES (1, 2, 1);
+"""
+
+
+def _count(table):
+    return db.session.execute(db.text(f"SELECT count(*) FROM {table}")).scalar()
+
+
+def _has_index(name):
+    return db.session.execute(
+        db.text("SELECT count(*) FROM sqlite_master WHERE type = 'index' AND name = :name"), {'name': name}
+    ).scalar() == 1
+
+
+def test_upgrade_keeps_the_rows_of_a_populated_database(tmp_path):
+    path = tmp_path / 'kitchen.db'
+    with sqlite3.connect(path) as connection:
+        connection.executescript(BASELINE_SCHEMA)
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}"})
+
+    with app.app_context():
+        stamp(directory=MIGRATIONS, revision='282b3d02ef25')
+        upgrade(directory=MIGRATIONS, revision='f1c6d8a3e592')
+        assert _has_index('ix_ingredient_normalized_name')
+        upgrade(directory=MIGRATIONS)
+        assert (_count('recipe'), _count('ingredient'), _count('weekly_plan'), _count('meal_slot')) == (2, 4, 1, 2)
+        assert _count('ingredient_section') == 1
+        assert _has_index('ix_ingredient_normalized_name')
+
+        # Every ingredient has a canonical id, shared by both spellings of flour
+        canonical = dict(db.session.execute(db.text(
+            "SELECT i.item_name, c.key FROM ingredient i JOIN canonical_ingredient c ON c.id = i.canonical_id"
+        )).all())
+        assert canonical == {'Flour': 'flour', 'flour': 'flour', 'Milk': 'milk', 'Eggs': 'egg'}
+        assert _count('canonical_ingredient') == 3
+
+        # Back across the canonical and cascade revisions and up again
+        downgrade(directory=MIGRATIONS, revision='e5b2a9d7c318')
+        assert _has_index('ix_ingredient_normalized_name')
+        upgrade(directory=MIGRATIONS)
+        assert _count('meal_slot') == 2 and _has_index('ix_ingredient_normalized_name')
+
+        # The app's connections enforce foreign keys again afterwards
+        assert db.session.execute(db.text("PRAGMA foreign_keys")).scalar() == 1
+        db.session.execute(db.text("DELETE FROM recipe WHERE id = 1"))
+        assert _count('ingredient') == 2 and _count('ingredient_section') == 0
+        db.session.rollback()
+
+
+def test_autogenerate_sees_no_changes_on_a_current_database(tmp_path):
+    # The USDA tables share the main database by default but are not migrated
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'kitchen.db'}"})
+    with app.app_context():
+        db.create_all()
+        stamp(directory=MIGRATIONS, revision='head')
+        check(directory=MIGRATIONS)  # Raises when a migration would be generated
@@ -0,0 +1,67 @@
+import random
+
+from app import db
+from app.models import MealSlot, Recipe
+from app.plan_generator import PlanScorer, get_recipe_sets
+
+
+def test_incremental_scores_match_a_fresh_count(app):
+    with app.app_context():
+        sets = get_recipe_sets()
+        rng = random.Random(3)
+        plan = rng.sample(range(len(sets.ids)), 10)
+        scorer = PlanScorer(sets)
+        for recipe in plan:
+            scorer.add(recipe)
+
+        for _ in range(200):
+            slot, recipe = rng.randrange(len(plan)), rng.randrange(len(sets.ids))
+            items, leftover = scorer.items, scorer.leftover
+            delta_items, delta_leftover = scorer.replace_delta(plan[slot], recipe)
+            scorer.remove(plan[slot])
+            scorer.add(recipe)
+            plan[slot] = recipe
+            assert scorer.items == items + delta_items
+            assert abs(scorer.leftover - leftover - delta_leftover) < 1e-6
+
+        fresh = PlanScorer(sets)
+        for recipe in plan:
+            fresh.add(recipe)
+        assert fresh.items == scorer.items == len({item for recipe in plan for item in sets.items[recipe]})
+        assert abs(fresh.leftover - scorer.leftover) < 1e-6
+
+
+def test_generate_plan_meets_constraints_and_saves(app, client):
+    with app.app_context():
+        quick = [recipe_id for (recipe_id,) in db.session.query(Recipe.id).filter(Recipe.cook_time <= 120)]
+    required, excluded = quick[0], quick[1]
+
+    body = {'max_cook_time': {'dinner': 120}, 'required': [required], 'excluded': [excluded], 'seed': 5}
+    greedy = client.post('/api/weekly_plan/generate', json={**body, 'iterations': 1}).get_json()
+    result = client.post('/api/weekly_plan/generate', json={**body, 'iterations': 5000}).get_json()
+
+    meals = result['meals']
+    assert len(meals) == 21
+    assert {meal['meal_type'] for meal in meals} == {'breakfast', 'lunch', 'dinner'}
+    recipe_ids = [meal['recipe_id'] for meal in meals]
+    assert len(set(recipe_ids)) == 21 and required in recipe_ids and excluded not in recipe_ids
+    assert all(meal['recipe_id'] in quick for meal in meals if meal['meal_type'] == 'dinner')
+    assert result['grocery_items'] <= greedy['grocery_items']
+    assert result['evaluated'] > 1000
+
+    saved = client.post('/api/weekly_plan/generate', json={**body, 'save': True, 'name': 'Generated'})
+    assert saved.status_code == 201
+    with app.app_context():
+        slots = MealSlot.query.filter_by(weekly_plan_id=saved.get_json()['id']).count()
+    assert slots == 21
+
+    # 40 recipes cannot fill 42 slots without repeats
+    too_many = {'days': ['Monday', 'Tuesday'], 'meal_types': [f"Meal {i}" for i in range(21)]}
+    assert client.post('/api/weekly_plan/generate', json=too_many).status_code == 400
+    assert client.post('/api/weekly_plan/generate', json={**too_many, 'allow_repeats': True}).status_code == 200
+    assert client.post('/api/weekly_plan/generate', json={'required': [99999]}).status_code == 400
+    assert client.post('/api/weekly_plan/generate', json={'objective': 'cost'}).status_code == 400
+    # Days and meal types are lists of distinct names, days from the week
+    for body in ({'days': 'Monday'}, {'days': ['Monday', 'Funday']}, {'days': ['Monday', 'Monday']},
+                 {'meal_types': ['dinner', 'dinner']}, {'meal_types': [1]}):
+        assert client.post('/api/weekly_plan/generate', json=body).status_code == 400
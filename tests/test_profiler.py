@@ -0,0 +1,25 @@
+import os
+
+
+def test_profile_written_when_header_set(app, client, tmp_path):
+    app.config.update(PROFILER_ENABLED=True, PROFILER_DIR=str(tmp_path))
+
+    response = client.get('/api/grocery_list?weekly_plan_id=1', headers={'X-Profile': '1'})
+
+    profile_id = response.headers['X-Profile-Id']
+    assert 'sql;dur=' in response.headers['Server-Timing']
+    for extension in ('.prof', '.collapsed', '.txt'):
+        assert os.path.exists(os.path.join(tmp_path, profile_id + extension))
+    with open(os.path.join(tmp_path, profile_id + '.txt'), encoding='utf-8') as f:
+        summary = f.read()
+    assert 'sql statements: 3' in summary
+    assert 'serialization' in summary
+
+
+def test_profile_skipped_without_header(app, client, tmp_path):
+    app.config.update(PROFILER_ENABLED=True, PROFILER_DIR=str(tmp_path))
+
+    response = client.get('/api/grocery_list?weekly_plan_id=1')
+
+    assert 'X-Profile-Id' not in response.headers
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,207 @@
+import pytest
+
+from app import db
+from app.models import MealSlot, Recipe, WeeklyPlan
+from benchmarks.data_generator import DAYS, MEAL_TYPES, CatalogueGenerator
+
+SEEDED_RECIPES = 40
+SIZES = [1, 21, 63]  # Meal slots for plan endpoints, ingredients for recipe endpoints
+
+generator = CatalogueGenerator(seed=11)
+
+
+def _meals(size):
+    return [
+        {
+            'day': DAYS[(i // len(MEAL_TYPES)) % len(DAYS)],
+            # Past one week, number the meal types so every (day, meal_type) stays unique
+            'meal_type': MEAL_TYPES[i % len(MEAL_TYPES)] + (f" {i // 21 + 1}" if i >= 21 else ''),
+            'recipe_id': i % SEEDED_RECIPES + 1,
+        }
+        for i in range(size)
+    ]
+
+
+def _make_plan(app, size):
+    with app.app_context():
+        plan = WeeklyPlan(name=f"Budget plan ({size} slots)")
+        db.session.add(plan)
+        db.session.flush()
+        db.session.add_all(MealSlot(weekly_plan_id=plan.id, **meal) for meal in _meals(size))
+        db.session.commit()
+        return plan.id
+
+
+def _get_recipe(app, client, size):
+    return lambda: client.get('/api/recipes/1')
+
+
+def _batch_recipes(app, client, size):
+    ids = ','.join(str(i % SEEDED_RECIPES + 1) for i in range(size))
+    return lambda: client.get(f'/api/recipes?ids={ids}&fields=name,ingredients')
+
+
+def _add_recipe(app, client, size):
+    payload = generator.recipe_payload(SEEDED_RECIPES + 1, ingredients_per_recipe=size)
+    return lambda: client.post('/api/recipes', json=payload)
+
+
+def _update_recipe(app, client, size):
+    recipe = client.post('/api/recipes', json=generator.recipe_payload(SEEDED_RECIPES + 1, size)).get_json()
+    # Keep all but the last ingredient, edit the first and add a new one
+    ingredients = recipe['ingredients'][:-1] + generator.ingredient_rows(1)
+    ingredients[0]['descriptor'] = 'Edited'
+    payload = {**recipe, 'ingredients': ingredients}
+    return lambda: client.put(f"/api/recipes/{recipe['id']}", json=payload)
+
+
+def _save_weekly_plan(app, client, size):
+    return lambda: client.post('/api/weekly_plan', json={'name': 'Budget plan', 'meals': _meals(size)})
+
+
+def _update_weekly_plan(app, client, size):
+    plan_id = _make_plan(app, size)
+    # Drop one slot, add a new one and change another
+    meals = _meals(size)[1:] + [{'day': 'Sunday', 'meal_type': 'Brunch', 'recipe_id': 1, 'servings': 2}]
+    meals[0]['recipe_id'] = SEEDED_RECIPES
+    return lambda: client.put(f'/api/weekly_plan/{plan_id}', json={'meals': meals})
+
+
+def _clone_weekly_plan(app, client, size):
+    plan_id = _make_plan(app, size)
+    override = {'day': 'Sunday', 'meal_type': 'Brunch', 'recipe_id': 1}
+    return lambda: client.post(f'/api/weekly_plan/{plan_id}/clone', json={'day_shift': 2, 'overrides': [override]})
+
+
+def _import_weekly_plan(app, client, size):
+    # Each meal names a seeded recipe in upper case, as weekly_plan.json does
+    with app.app_context():
+        names = {recipe.id: recipe.name.upper() for recipe in Recipe.query.all()}
+    plan = {}
+    for meal in _meals(size):
+        plan.setdefault(meal['day'], {})[meal['meal_type']] = names[meal['recipe_id']]
+    return lambda: client.post('/api/weekly_plan/import', json={'plan': plan})
+
+
+def _save_store(app, client, size):
+    store = client.post('/stores/api/stores', json={
+        'name': 'Budget store', 'sections': [{'name': f"Aisle {i}"} for i in range(size)],
+    }).get_json()
+    sections = client.get('/stores/api/stores').get_json()[-1]['sections']
+    # Reverse the aisles, rename one, drop one and add one
+    payload = [{'id': section['id'], 'name': section['name']} for section in reversed(sections[1:])]
+    payload.append({'name': 'New aisle'})
+    payload[0]['name'] = 'Renamed aisle'
+    return lambda: client.post('/stores/api/stores', json={'id': store['store_id'], 'name': 'Budget store', 'sections': payload})
+
+
+def _get_stores(app, client, size):
+    for i in range(size // 20 + 1):
+        client.post('/stores/api/stores', json={'name': f"Store {i}", 'sections': [{'name': 'Aisle'}] * size})
+    return lambda: client.get('/stores/api/stores')
+
+
+def _assign_sections(app, client, size):
+    # Half of the assignments by ingredient id, half by name
+    assignments = [
+        {'ingredient_id': i + 1, 'section_id': i % 5 + 1} if i % 2 else
+        {'item_name': generator.names[i % len(generator.names)], 'section_id': i % 5 + 1}
+        for i in range(size)
+    ]
+    return lambda: client.post('/ingredients/api/assign_sections', json={'assignments': assignments})
+
+
+def _delete_recipe(app, client, size):
+    recipe = client.post('/api/recipes', json=generator.recipe_payload(SEEDED_RECIPES + 1, size)).get_json()
+    client.post('/ingredients/api/assign_sections', json={'assignments': [
+        {'ingredient_id': ingredient['id'], 'section_id': 1} for ingredient in recipe['ingredients']
+    ]})
+    client.post('/api/weekly_plan', json={'name': 'Uses it', 'meals': [
+        {'day': 'Monday', 'meal_type': 'Dinner', 'recipe_id': recipe['id']},
+    ]})
+    return lambda: client.delete(f"/api/recipes/{recipe['id']}")
+
+
+def _delete_store(app, client, size):
+    store = client.post('/stores/api/stores', json={
+        'name': 'Budget store', 'sections': [{'name': f"Aisle {i}"} for i in range(size)],
+    }).get_json()
+    return lambda: client.delete(f"/stores/api/stores/{store['store_id']}")
+
+
+def _delete_weekly_plan(app, client, size):
+    plan_id = _make_plan(app, size)
+    with app.app_context():
+        slot_id = MealSlot.query.filter_by(weekly_plan_id=plan_id).first().id
+    client.patch(f'/api/meal_slots/{slot_id}', json={'servings': 2})  # Store the aggregate too
+    return lambda: client.delete(f'/api/weekly_plan/{plan_id}')
+
+
+def _list_weekly_plans(app, client, size):
+    _make_plan(app, size)
+    return lambda: client.get('/api/weekly_plan_list')
+
+
+def _generate_grocery_list(app, client, size):
+    return lambda: client.post('/api/generate_grocery_list', json={'meals': _meals(size)})
+
+
+def _plan_grocery_list(app, client, size):
+    plan_id = _make_plan(app, size)
+    return lambda: client.get(f'/api/grocery_list?weekly_plan_id={plan_id}')
+
+
+def _patch_meal_slot(app, client, size):
+    plan_id = _make_plan(app, size)
+    with app.app_context():
+        slot_id = MealSlot.query.filter_by(weekly_plan_id=plan_id).first().id
+    # Build the stored aggregate first so the budget covers the incremental path
+    client.patch(f'/api/meal_slots/{slot_id}', json={'servings': 2})
+    return lambda: client.patch(f'/api/meal_slots/{slot_id}', json={'recipe_id': SEEDED_RECIPES, 'servings': 3})
+
+
+def _categorized_grocery_list(app, client, size):
+    plan_id = _make_plan(app, size)
+    url = f'/grocery/api/grocery_list?weekly_plan_id={plan_id}&store_id=1'
+    client.get(url)  # Compile the store layout
+    return lambda: client.get(url)
+
+
+# Each endpoint declares the most SQL statements it may issue. Budgets are
+# checked at every size, so any per-row query fails the larger sizes.
+QUERY_BUDGETS = [
+    ('get_recipe', 2, _get_recipe),
+    ('batch_recipes', 2, _batch_recipes),
+    ('add_recipe', 18, _add_recipe),
+    ('update_recipe', 20, _update_recipe),
+    ('delete_recipe', 3, _delete_recipe),
+    ('save_weekly_plan', 2, _save_weekly_plan),
+    ('update_weekly_plan', 7, _update_weekly_plan),
+    ('clone_weekly_plan', 4, _clone_weekly_plan),
+    ('delete_weekly_plan', 1, _delete_weekly_plan),
+    ('import_weekly_plan', 3, _import_weekly_plan),
+    ('list_weekly_plans', 1, _list_weekly_plans),
+    ('generate_grocery_list', 3, _generate_grocery_list),
+    ('plan_grocery_list', 3, _plan_grocery_list),
+    ('patch_meal_slot', 9, _patch_meal_slot),
+    ('save_store', 7, _save_store),
+    ('delete_store', 2, _delete_store),
+    ('get_stores', 2, _get_stores),
+    ('assign_sections', 6, _assign_sections),
+    ('categorized_grocery_list', 2, _categorized_grocery_list),
+]
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('name, budget, setup', QUERY_BUDGETS, ids=[entry[0] for entry in QUERY_BUDGETS])
+def test_query_budget(app, client, count_queries, name, budget, setup, size):
+    request = setup(app, client, size)
+
+    with count_queries() as statements:
+        response = request()
+
+    assert response.status_code < 400, response.get_data(as_text=True)
+    assert len(statements) <= budget, (
+        f"{name} issued {len(statements)} queries (budget {budget}) at size {size}:\n"
+        + "\n".join(statements)
+    )
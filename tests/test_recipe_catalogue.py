@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from app.database_utils import sum_meal_ingredients
+from app.recipe_catalogue import RecipeCatalogue, get_recipe_catalogue
+
+
+@pytest.fixture
+def catalogue_app(app):
+    app.config['RECIPE_CATALOGUE_ENABLED'] = True
+    return app
+
+
+def _random_meals(rng, count):
+    return [
+        {'recipe_id': rng.randint(1, 42), 'servings': rng.choice([None, 1, 2, 6])}
+        for _ in range(count)
+    ]
+
+
+def test_catalogue_grocery_totals_match_sql(app):
+    rng = random.Random(3)
+    with app.app_context():
+        catalogue = RecipeCatalogue.load()
+        for _ in range(20):
+            meals = _random_meals(rng, rng.randint(1, 21))
+            expected = sum_meal_ingredients(meals)
+            totals = catalogue.sum_meal_ingredients(meals)
+            assert list(totals) == list(expected)
+            assert totals == pytest.approx(expected)
+
+
+def test_catalogue_applies_recipe_writes_incrementally(catalogue_app, client, count_queries):
+    before = client.get('/api/recipes').get_json()
+
+    recipe = client.post('/api/recipes', json={
+        'name': 'Aardvark Stew', 'cook_time': '', 'servings': '2', 'instructions': '',
+        'ingredients': [{'item_name': 'Leeks', 'quantity': '3', 'unit': 'Each'}],
+    }).get_json()
+    listed = client.get('/api/recipes').get_json()
+    assert listed[0] == {'id': recipe['id'], 'name': 'Aardvark Stew', 'cook_time': None, 'servings': 2}
+    assert len(listed) == len(before) + 1
+
+    client.put(f"/api/recipes/{recipe['id']}", json={
+        **recipe, 'ingredients': [{'item_name': 'Leek', 'quantity': '5', 'unit': 'Each'}],
+    })
+    meals = {'meals': [{'day': 'Monday', 'meal_type': 'dinner', 'recipe_id': recipe['id'], 'servings': 4}]}
+    with count_queries() as statements:
+        generated = client.post('/api/generate_grocery_list', json=meals).get_json()
+    assert generated['grocery_list'] == [{'item_name': 'Leeks', 'unit': 'Each', 'quantity': 10.0}]
+    assert len(statements) == 3  # Change log, then the changed recipe and its ingredients
+
+    with count_queries() as statements:
+        client.post('/api/generate_grocery_list', json=meals)
+    assert len(statements) == 1
+
+    client.delete(f"/api/recipes/{recipe['id']}")
+    assert client.get('/api/recipes').get_json() == before
+    with catalogue_app.app_context():
+        assert len(get_recipe_catalogue()) == len(before)
+        assert get_recipe_catalogue().listing() == before
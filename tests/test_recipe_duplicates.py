@@ -0,0 +1,62 @@
+from app import db
+from app.models import RecipeSignature, RecipeSignatureBand
+from app.recipe_duplicates import BANDS, minhash, recipe_tokens, similarity
+
+INGREDIENTS = ['Chuck Roast', 'Carrots', 'Yellow Onion', 'Garlic Cloves', 'Beef Stock', 'Tomato Paste',
+               'Red Wine', 'Thyme', 'Bay Leaves', 'Celery']
+
+
+def _save(client, name, items):
+    return client.post('/api/recipes', json={
+        'name': name, 'cook_time': '', 'servings': '4', 'instructions': '',
+        'ingredients': [{'item_name': item, 'quantity': '1', 'unit': 'Cup'} for item in items],
+    }).get_json()
+
+
+def test_signatures_estimate_jaccard_similarity():
+    tokens = {f"i:item {i}" for i in range(100)}
+    overlapping = {f"i:item {i}" for i in range(25, 125)}  # Jaccard 75 / 125 = 0.6
+    assert similarity(minhash(tokens), minhash(tokens)) == 1.0
+    assert abs(similarity(minhash(tokens), minhash(overlapping)) - 0.6) < 0.2
+    assert minhash(set()) is None
+
+    # Spellings of one ingredient and numbered copies of a title give the same tokens
+    assert recipe_tokens("Pot Roast 2", ["garlic"]) == recipe_tokens("pot roasts", ["garlic"])
+
+
+def test_new_recipes_are_flagged_and_reported_as_duplicates(app, client):
+    original = _save(client, 'Sunday Pot Roast', INGREDIENTS)
+    assert original['possible_duplicates'] == []
+
+    # The same recipe imported again with one ingredient swapped and others respelled
+    copy = _save(client, 'Sunday pot roast (imported)', ['garlic', 'carrot'] + INGREDIENTS[0:3:2] + INGREDIENTS[4:9] + ['Parsley'])
+    flagged = {duplicate['id']: duplicate for duplicate in copy['possible_duplicates']}
+    assert original['id'] in flagged
+    assert flagged[original['id']]['similarity'] >= 0.7
+
+    unrelated = _save(client, 'Lemon Sorbet', ['Lemons', 'Sugar', 'Water'])
+    assert unrelated['possible_duplicates'] == []
+
+    pairs = client.get('/api/recipes/duplicates').get_json()['pairs']
+    assert [original['id'], copy['id']] in [pair['ids'] for pair in pairs]
+    found = client.get(f"/api/recipes/duplicates?recipe_id={copy['id']}").get_json()['duplicates']
+    assert original['id'] in [duplicate['id'] for duplicate in found]
+    assert client.get('/api/recipes/duplicates?threshold=2').status_code == 400
+
+    # Deleting a recipe removes its signature and buckets
+    client.delete(f"/api/recipes/{original['id']}")
+    with app.app_context():
+        assert db.session.get(RecipeSignature, original['id']) is None
+        assert RecipeSignatureBand.query.filter_by(recipe_id=original['id']).count() == 0
+        assert RecipeSignatureBand.query.filter_by(recipe_id=copy['id']).count() == BANDS
+
+
+def test_find_duplicate_recipes_command(app, client):
+    _save(client, 'Sunday Pot Roast', INGREDIENTS)
+    _save(client, 'Sunday Pot Roast', INGREDIENTS)
+
+    runner = app.test_cli_runner()
+    assert 'Recomputed signatures' in runner.invoke(args=['rebuild-recipe-signatures']).output
+    result = runner.invoke(args=['find-duplicate-recipes', '--threshold', '0.95'])
+    assert result.exit_code == 0
+    assert '1.00' in result.output and 'Sunday Pot Roast' in result.output
@@ -0,0 +1,89 @@
+import pytest
+
+from app import db
+from app.models import Food, FoodPortion, MeasureUnit, Nutrient
+
+
+@pytest.fixture
+def quinoa(app):
+    """A USDA food with known nutrients and a cup weighing 185 g."""
+    with app.app_context():
+        cup = MeasureUnit.query.filter_by(name='cup').one()
+        db.session.add(Food(fdc_id=90001, description="Zquinoa, cooked"))
+        db.session.add(FoodPortion(fdc_id=90001, amount=1.0, measure_unit_id=cup.id, gram_weight=185.0))
+        db.session.add_all(
+            Nutrient(food_id=90001, name=name, unit_name=unit, amount_per_100g=amount)
+            for name, unit, amount in [("Energy", "KCAL", 120.0), ("Energy", "kJ", 502.1), ("Protein", "G", 4.4),
+                                        ("Total lipid (fat)", "G", 1.9)]
+        )
+        db.session.commit()
+    return 90001
+
+
+def _save(client, name, servings, ingredients):
+    return client.post('/api/recipes', json={
+        'name': name, 'cook_time': '', 'servings': str(servings), 'instructions': '', 'ingredients': ingredients,
+    }).get_json()
+
+
+def test_recipe_nutrition_is_stored_on_save_and_searchable(app, client, quinoa):
+    bowl = _save(client, 'Zquinoa Bowl', 2, [
+        {'item_name': 'Zquinoa', 'quantity': '200', 'unit': 'Gram (g)'},
+        {'item_name': 'Zquinoa', 'quantity': '1', 'unit': 'Cup'},
+        {'item_name': 'Mystery Sauce', 'quantity': '1', 'unit': 'Cup'},
+    ])
+    # New ingredients get their USDA food from the rebuild, not on save
+    assert client.get('/api/recipes/search?calories_min=230&calories_max=232&protein_min=8').get_json()['total'] == 0
+    result = app.test_cli_runner().invoke(args=['rebuild-recipe-nutrition'])
+    assert result.exit_code == 0, result.output
+    # (200 g + 185 g) / 2 servings
+    expected = {'calories': 231.0, 'protein': 8.47, 'fat': 3.66, 'carbohydrate': 0.0}
+
+    found = client.get('/api/recipes/search?calories_min=230&calories_max=232&protein_min=8').get_json()
+    assert found['total'] == 1
+    assert found['recipes'][0]['id'] == bowl['id']
+    assert found['recipes'][0]['nutrition'] == expected
+    assert (found['recipes'][0]['matched_ingredients'], found['recipes'][0]['ingredient_count']) == (2, 3)
+
+    # Saving again recomputes the vector
+    client.put(f"/api/recipes/{bowl['id']}", json={
+        **bowl, 'ingredients': [{'item_name': 'Zquinoa', 'quantity': '100', 'unit': 'Gram (g)'}],
+    })
+    found = client.get('/api/recipes/search?calories_min=59&calories_max=61').get_json()
+    assert [recipe['id'] for recipe in found['recipes']] == [bowl['id']]
+
+
+def test_search_sorts_and_paginates(client):
+    first = client.get('/api/recipes/search?sort=protein&order=desc&per_page=5').get_json()
+    second = client.get('/api/recipes/search?sort=protein&order=desc&per_page=5&page=2').get_json()
+    proteins = [recipe['nutrition']['protein'] for recipe in first['recipes'] + second['recipes']]
+    assert proteins == sorted(proteins, reverse=True)
+    assert first['total'] == second['total'] > 5
+    assert not {recipe['id'] for recipe in first['recipes']} & {recipe['id'] for recipe in second['recipes']}
+
+    assert client.get('/api/recipes/search?sort=sodium').status_code == 400
+    assert client.get('/api/recipes/search?protein_min=lots').status_code == 400
+
+
+def test_foods_with_energy_only_in_kj_are_left_out(app, client, quinoa):
+    with app.app_context():
+        db.session.add(Food(fdc_id=90002, description="Zfarro, cooked"))
+        db.session.add_all([
+            Nutrient(food_id=90002, name="Energy", unit_name="kJ", amount_per_100g=598.0),
+            Nutrient(food_id=90002, name="Protein", unit_name="G", amount_per_100g=5.0),
+        ])
+        db.session.commit()
+
+    bowl = _save(client, 'Zgrain Bowl', 1, [
+        {'item_name': 'Zquinoa', 'quantity': '100', 'unit': 'Gram (g)'},
+        {'item_name': 'Zfarro', 'quantity': '100', 'unit': 'Gram (g)'},
+    ])
+    assert app.test_cli_runner().invoke(args=['rebuild-recipe-nutrition']).exit_code == 0
+    with app.app_context():
+        from app.models import CanonicalIngredient
+        assert CanonicalIngredient.query.filter_by(key='zfarro').one().fdc_id == 90002
+
+    found = client.get('/api/recipes/search?calories_min=119&calories_max=121').get_json()
+    [recipe] = [recipe for recipe in found['recipes'] if recipe['id'] == bowl['id']]
+    assert recipe['nutrition']['protein'] == 4.4  # Farro's protein is not counted without its calories
+    assert (recipe['matched_ingredients'], recipe['ingredient_count']) == (1, 2)
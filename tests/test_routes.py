@@ -0,0 +1,480 @@
+def test_batch_recipes_keeps_order_and_selects_fields(client):
+    response = client.get('/api/recipes?ids=3,1,999&fields=name,ingredients')
+
+    data = response.get_json()
+    assert [recipe['id'] for recipe in data['recipes']] == [3, 1]
+    assert data['missing'] == [999]
+    assert set(data['recipes'][0]) == {'id', 'name', 'ingredients'}
+    assert all(ingredient['recipe_id'] == 3 for ingredient in data['recipes'][0]['ingredients'])
+
+    posted = client.post('/api/recipes/batch', json={'ids': [1, 3]}).get_json()
+    assert posted['recipes'][0]['instructions'] == client.get('/api/recipes/1').get_json()['instructions']
+
+    assert client.post('/api/recipes/batch', json={'ids': [1], 'fields': ['calories']}).status_code == 400
+
+
+def test_grocery_lists_scale_by_slot_servings(client):
+    recipe = client.post('/api/recipes', json={
+        'name': 'Pancakes', 'cook_time': '20', 'servings': '4', 'instructions': '',
+        'ingredients': [{'item_name': 'Flour', 'quantity': '2', 'unit': 'Cup'}],
+    }).get_json()
+    meals = [
+        {'day': 'Monday', 'meal_type': 'breakfast', 'recipe_id': recipe['id'], 'servings': 6},
+        {'day': 'Tuesday', 'meal_type': 'breakfast', 'recipe_id': recipe['id']},
+    ]
+    expected = [{'item_name': 'Flour', 'unit': 'Cup', 'quantity': 5.0}]
+
+    generated = client.post('/api/generate_grocery_list', json={'meals': meals}).get_json()
+    assert generated['grocery_list'] == expected
+
+    plan = client.post('/api/weekly_plan', json={'name': 'Brunch', 'meals': meals}).get_json()
+    assert client.get(f"/api/grocery_list?weekly_plan_id={plan['id']}").get_json() == expected
+
+
+def test_meal_slot_patch_returns_grocery_delta(app, client):
+    def recipe(name, ingredients):
+        return client.post('/api/recipes', json={
+            'name': name, 'cook_time': '', 'servings': '2', 'instructions': '',
+            'ingredients': [{'item_name': item, 'quantity': quantity, 'unit': 'Cup'} for item, quantity in ingredients],
+        }).get_json()['id']
+
+    soup = recipe('Soup', [('Stock', '2'), ('Salt', '')])
+    salad = recipe('Salad', [('Lettuce', '1'), ('Stock', '1')])
+    plan = client.post('/api/weekly_plan', json={'meals': [
+        {'day': 'Monday', 'meal_type': 'Dinner', 'recipe_id': soup},
+        {'day': 'Tuesday', 'meal_type': 'Dinner', 'recipe_id': soup},
+    ]}).get_json()
+    with app.app_context():
+        from app.models import MealSlot
+        slot_id = MealSlot.query.filter_by(weekly_plan_id=plan['id'], day='Tuesday').one().id
+
+    response = client.patch(f'/api/meal_slots/{slot_id}', json={'recipe_id': salad, 'servings': 4})
+    delta = response.get_json()['grocery_list_delta']
+    assert delta['added'] == [{'item_name': 'Lettuce', 'unit': 'Cup', 'quantity': 2.0}]
+    assert delta['changed'] == []  # Stock: 2 + 2 before, 2 + 1 * 2 (salad at 4 servings) after
+    assert delta['removed'] == []
+
+    # Salt disappears once no slot uses the soup
+    delta = client.patch(f'/api/meal_slots/{slot_id - 1}', json={'recipe_id': salad}).get_json()['grocery_list_delta']
+    assert delta['changed'] == [
+        {'item_name': 'Lettuce', 'unit': 'Cup', 'quantity': 3.0, 'previous_quantity': 2.0},
+        {'item_name': 'Stock', 'unit': 'Cup', 'quantity': 3.0, 'previous_quantity': 4.0},
+    ]
+    assert delta['removed'] == [{'item_name': 'Salt', 'unit': 'Cup', 'quantity': 0.0}]
+
+    with app.app_context():
+        from app.database_utils import sum_plan_ingredients
+        from app.models import PlanGroceryItem
+        stored = {(item.item_name, item.unit): round(item.quantity, 2)
+                  for item in PlanGroceryItem.query.filter_by(weekly_plan_id=plan['id'])}
+        recomputed = {key: round(quantity, 2) for key, quantity in sum_plan_ingredients(plan['id']).items()}
+    assert stored == recomputed == {('Lettuce', 'Cup'): 3.0, ('Stock', 'Cup'): 3.0}
+
+    assert client.patch(f'/api/meal_slots/{slot_id}', json={'recipe_id': 99999}).status_code == 404
+
+
+def test_meal_slot_patch_rejects_bad_and_taken_slots(app, client):
+    plan = client.post('/api/weekly_plan', json={'meals': [
+        {'day': 'Monday', 'meal_type': 'dinner', 'recipe_id': 1},
+        {'day': 'Tuesday', 'meal_type': 'dinner', 'recipe_id': 2},
+    ]}).get_json()
+    with app.app_context():
+        from app.models import MealSlot
+        slot_id = MealSlot.query.filter_by(weekly_plan_id=plan['id'], day='Tuesday').one().id
+
+    assert client.patch(f'/api/meal_slots/{slot_id}', json={'day': 'Someday'}).status_code == 400
+    assert client.patch(f'/api/meal_slots/{slot_id}', json={'day': 'Monday'}).status_code == 409
+    assert client.patch(f'/api/meal_slots/{slot_id}', json={'day': 'Tuesday', 'recipe_id': 3}).status_code == 200
+    response = client.patch(f'/api/meal_slots/{slot_id}', json={'day': 'Monday', 'meal_type': 'lunch'})
+    assert response.status_code == 200 and response.get_json()['slot']['day'] == 'Monday'
+
+    with app.app_context():
+        from app.models import MealSlot
+        slots = MealSlot.query.filter_by(weekly_plan_id=plan['id']).order_by(MealSlot.id)
+        assert [(slot.day, slot.meal_type, slot.recipe_id) for slot in slots] == [
+            ('Monday', 'dinner', 1), ('Monday', 'lunch', 3),
+        ]
+
+
+def test_weekly_plan_put_diffs_slots(app, client):
+    plan = client.post('/api/weekly_plan', json={'name': 'Week', 'meals': [
+        {'day': 'Monday', 'meal_type': 'Dinner', 'recipe_id': 1},
+        {'day': 'Tuesday', 'meal_type': 'Dinner', 'recipe_id': 2},
+        {'day': 'Wednesday', 'meal_type': 'Dinner', 'recipe_id': 3},
+    ]}).get_json()
+    with app.app_context():
+        from app.models import MealSlot
+        monday_id = MealSlot.query.filter_by(weekly_plan_id=plan['id'], day='Monday').one().id
+
+    response = client.put(f"/api/weekly_plan/{plan['id']}", json={'name': 'Week 2', 'meals': [
+        {'day': 'Monday', 'meal_type': 'Dinner', 'recipe_id': 1},
+        {'day': 'Tuesday', 'meal_type': 'Dinner', 'recipe_id': 4, 'servings': 2},
+        {'day': 'Friday', 'meal_type': 'Lunch', 'recipe_id': 5},
+    ]})
+    assert response.status_code == 200
+    assert {key: response.get_json()[key] for key in ('inserted', 'updated', 'deleted')} == \
+        {'inserted': 1, 'updated': 1, 'deleted': 1}
+
+    with app.app_context():
+        slots = {(slot.day, slot.meal_type): slot for slot in MealSlot.query.filter_by(weekly_plan_id=plan['id'])}
+        assert set(slots) == {('Monday', 'Dinner'), ('Tuesday', 'Dinner'), ('Friday', 'Lunch')}
+        assert slots[('Monday', 'Dinner')].id == monday_id
+        assert (slots[('Tuesday', 'Dinner')].recipe_id, slots[('Tuesday', 'Dinner')].servings) == (4, 2)
+
+    duplicate = [{'day': 'Monday', 'meal_type': 'Dinner', 'recipe_id': 1}] * 2
+    assert client.put(f"/api/weekly_plan/{plan['id']}", json={'meals': duplicate}).status_code == 400
+    assert client.put('/api/weekly_plan/99999', json={'meals': []}).status_code == 404
+
+
+def test_clone_weekly_plan_shifts_days_and_applies_overrides(app, client):
+    plan = client.post('/api/weekly_plan', json={'name': 'Week', 'meals': [
+        {'day': 'Monday', 'meal_type': 'Dinner', 'recipe_id': 1, 'servings': 3},
+        {'day': 'Sunday', 'meal_type': 'Dinner', 'recipe_id': 2},
+    ]}).get_json()
+
+    template = client.post(f"/api/weekly_plan/{plan['id']}/clone", json={'name': 'Base week', 'as_template': True})
+    assert template.status_code == 201
+    assert client.get('/api/plan_templates').get_json() == [{'id': template.get_json()['id'], 'name': 'Base week'}]
+    assert 'Base week' not in {entry['name'] for entry in client.get('/api/weekly_plan_list').get_json()}
+
+    copy = client.post(f"/api/weekly_plan/{template.get_json()['id']}/clone", json={
+        'day_shift': 1,
+        'overrides': [{'day': 'Monday', 'meal_type': 'Dinner', 'recipe_id': 5}],
+    }).get_json()
+
+    with app.app_context():
+        from app.models import MealSlot
+        slots = {(slot.day, slot.meal_type): (slot.recipe_id, slot.servings)
+                 for slot in MealSlot.query.filter_by(weekly_plan_id=copy['id'])}
+    assert slots == {('Tuesday', 'Dinner'): (1, 3), ('Monday', 'Dinner'): (5, None)}
+
+    assert client.post('/api/weekly_plan/99999/clone', json={}).status_code == 404
+
+
+def test_import_weekly_plan_resolves_names_case_insensitively(app, client, tmp_path):
+    for name in ('Braised Short Ribs', 'Aglio e Olio'):
+        client.post('/api/recipes', json={
+            'name': name, 'cook_time': '', 'servings': '', 'instructions': '',
+            'ingredients': [{'item_name': 'Salt', 'quantity': '1', 'unit': 'Pinch'}],
+        })
+    plan = {
+        'Monday': {'Breakfast': 'BRAISED SHORT RIBS', 'Dinner': 'AGLIO E OLIO'},
+        'Tuesday': {'Lunch': 'BEEF TENDERLOIN AU POIVRE', 'Dinner': 'aglio e olio'},
+    }
+
+    rejected = client.post('/api/weekly_plan/import', json={'plan': plan})
+    assert rejected.status_code == 400
+    assert rejected.get_json()['unknown'] == ['BEEF TENDERLOIN AU POIVRE']
+
+    imported = client.post('/api/weekly_plan/import', json={'name': 'Imported', 'plan': plan, 'skip_unknown': True})
+    assert imported.status_code == 201
+    assert imported.get_json()['slots'] == 3
+    grocery_list = client.get(f"/api/grocery_list?weekly_plan_id={imported.get_json()['id']}").get_json()
+    assert grocery_list == [{'item_name': 'Salt', 'unit': 'Pinch', 'quantity': 3.0}]
+
+    path = tmp_path / 'plan.json'
+    path.write_text('{"Friday": {"Dinner": "AGLIO E OLIO"}}')
+    result = app.test_cli_runner().invoke(args=['import-plan', str(path), '--name', 'From file'])
+    assert result.exit_code == 0, result.output
+    assert 'with 1 meals' in result.output
+
+
+def test_export_grocery_list_streams_text_csv_and_html(app, client):
+    recipe = client.post('/api/recipes', json={
+        'name': 'Omelette', 'cook_time': '', 'servings': '', 'instructions': '',
+        'ingredients': [
+            {'item_name': 'Eggs', 'quantity': '3', 'unit': 'Piece'},
+            {'item_name': 'Milk', 'quantity': '0.25', 'unit': 'Cup'},
+            {'item_name': 'Pepper', 'quantity': '', 'unit': ''},
+        ],
+    }).get_json()
+    plan = client.post('/api/weekly_plan', json={'name': 'Omelettes', 'meals': [
+        {'day': 'Monday', 'meal_type': 'breakfast', 'recipe_id': recipe['id']},
+        {'day': 'Tuesday', 'meal_type': 'breakfast', 'recipe_id': recipe['id']},
+    ]}).get_json()
+
+    with app.app_context():
+        from app import db
+        from app.models import IngredientSection, Section, Store
+        store = Store(name='Corner shop')
+        db.session.add(store)
+        db.session.flush()
+        produce = Section(name='Produce', order=2, store_id=store.id)
+        dairy = Section(name='Dairy', order=1, store_id=store.id)
+        db.session.add_all([produce, dairy])
+        db.session.flush()
+        ingredient_ids = {ingredient['item_name']: ingredient['id'] for ingredient in recipe['ingredients']}
+        db.session.add_all([
+            IngredientSection(ingredient_id=ingredient_ids['Eggs'], section_id=produce.id),
+            IngredientSection(ingredient_id=ingredient_ids['Milk'], section_id=dairy.id),
+        ])
+        db.session.commit()
+        store_id = store.id
+
+    url = f"/api/grocery_list/export?weekly_plan_id={plan['id']}&store_id={store_id}"
+    text = client.get(url)
+    assert text.is_streamed
+    assert text.get_data(as_text=True) == "0.50 Cup of Milk\n6 Piece of Eggs\n0 unitless of Pepper\n"
+
+    csv_body = client.get(url + '&format=csv').get_data(as_text=True)
+    assert csv_body.splitlines() == [
+        'section,item_name,quantity,unit', 'Dairy,Milk,0.5,Cup', 'Produce,Eggs,6.0,Piece', ',Pepper,0.0,unitless',
+    ]
+
+    html = client.get(url + '&format=html').get_data(as_text=True)
+    assert html.index('<h2>Dairy</h2>') < html.index('<li>0.50 Cup of Milk</li>') < html.index('<h2>Produce</h2>')
+    assert '<h2>Other</h2>' in html
+
+    assert client.get(url + '&format=pdf').status_code == 400
+
+
+def test_store_save_reorders_renames_and_lists_sections(client):
+    store = client.post('/stores/api/stores', json={
+        'name': 'Market', 'sections': [{'name': 'Produce'}, {'name': 'Dairy'}, {'name': 'Bakery'}],
+    }).get_json()
+    sections = next(s for s in client.get('/stores/api/stores').get_json() if s['id'] == store['store_id'])['sections']
+    produce, _, bakery = sections
+
+    client.post('/stores/api/stores', json={'id': store['store_id'], 'name': 'Market', 'sections': [
+        {'id': bakery['id'], 'name': 'Bread'}, {'name': 'Frozen'}, {'id': produce['id'], 'name': 'Produce'},
+    ]})
+
+    saved = next(s for s in client.get('/stores/api/stores').get_json() if s['id'] == store['store_id'])
+    assert [(section['name'], section['order']) for section in saved['sections']] == \
+        [('Bread', 0), ('Frozen', 1), ('Produce', 2)]
+    assert saved['sections'][0]['id'] == bakery['id']
+
+    # Sections of another store cannot be claimed
+    response = client.post('/stores/api/stores', json={'id': 1, 'name': 'Store 1', 'sections': [{'id': produce['id'], 'name': 'x'}]})
+    assert response.status_code == 400
+
+
+def test_categorized_list_uses_cached_layout_until_sections_change(app, client, count_queries):
+    recipe = client.post('/api/recipes', json={
+        'name': 'Toast', 'cook_time': '', 'servings': '', 'instructions': '',
+        'ingredients': [{'item_name': 'Sourdough', 'quantity': '2', 'unit': 'Piece'}],
+    }).get_json()
+    plan = client.post('/api/weekly_plan', json={'meals': [
+        {'day': 'Monday', 'meal_type': 'breakfast', 'recipe_id': recipe['id']},
+    ]}).get_json()
+    store = client.post('/stores/api/stores', json={'name': 'Bakery', 'sections': [{'name': 'Bread'}]}).get_json()
+    url = f"/grocery/api/grocery_list?weekly_plan_id={plan['id']}&store_id={store['store_id']}"
+
+    def sections():
+        return {entry['section']: entry['items'] for entry in client.get(url).get_json()}
+
+    assert sections()['Uncategorized'] == [{'name': 'Sourdough', 'quantity': 2.0, 'unit': 'Piece'}]
+    with count_queries() as statements:
+        client.get(url)
+    assert not any('FROM section' in statement for statement in statements)
+
+    bread = client.get('/stores/api/stores').get_json()[-1]['sections'][0]
+    client.post(f"/ingredients/api/ingredients/{recipe['ingredients'][0]['id']}/assign_section",
+                json={'section_id': bread['id']})
+    categorized = sections()
+    assert categorized['Bread'] == [{'name': 'Sourdough', 'quantity': 2.0, 'unit': 'Piece'}]
+    assert 'Uncategorized' not in categorized
+
+
+def test_assign_sections_in_bulk_by_id_and_name(app, client):
+    ingredients = []
+    for name in ('Butter Cake', 'Butter Toast'):
+        recipe = client.post('/api/recipes', json={
+            'name': name, 'cook_time': '', 'servings': '', 'instructions': '',
+            'ingredients': [{'item_name': 'Test Kitchen Butter', 'quantity': '1', 'unit': 'Stick'},
+                            {'item_name': 'Flour', 'quantity': '1', 'unit': 'Cup'}],
+        }).get_json()
+        ingredients += recipe['ingredients']
+    store = client.post('/stores/api/stores', json={'name': 'Grocer', 'sections': [{'name': 'Dairy'}, {'name': 'Baking'}]}).get_json()
+    dairy, baking = client.get('/stores/api/stores').get_json()[-1]['sections']
+    flour_id = next(ingredient['id'] for ingredient in ingredients if ingredient['item_name'] == 'Flour')
+
+    response = client.post('/ingredients/api/assign_sections', json={'assignments': [
+        {'item_name': '  test kitchen BUTTER ', 'section_id': dairy['id']},
+        {'ingredient_id': flour_id, 'section_id': dairy['id']},
+        {'item_name': 'saffron', 'section_id': dairy['id']},
+    ]}).get_json()
+    assert (response['created'], response['updated'], response['unmatched_names']) == (3, 0, ['saffron'])
+
+    # Moving within the same store updates the existing assignment
+    response = client.post('/ingredients/api/assign_sections', json={'assignments': [
+        {'ingredient_id': flour_id, 'section_id': baking['id']},
+    ]}).get_json()
+    assert (response['created'], response['updated']) == (0, 1)
+
+    with app.app_context():
+        from app.models import IngredientSection
+        assignments = {(row.ingredient_id, row.section_id) for row in IngredientSection.query.filter(
+            IngredientSection.section_id.in_([dairy['id'], baking['id']]))}
+    butter_ids = {ingredient['id'] for ingredient in ingredients if ingredient['item_name'] == 'Test Kitchen Butter'}
+    assert assignments == {(butter_id, dairy['id']) for butter_id in butter_ids} | {(flour_id, baking['id'])}
+
+    assert client.post('/ingredients/api/assign_sections', json={'assignments': [
+        {'ingredient_id': flour_id, 'section_id': 99999}]}).status_code == 400
+
+
+def test_deletes_cascade_in_the_database(app, client):
+    recipe = client.post('/api/recipes', json={
+        'name': 'Short-lived', 'cook_time': '', 'servings': '2', 'instructions': '',
+        'ingredients': [{'item_name': 'Flour', 'quantity': '1', 'unit': 'Cup'},
+                        {'item_name': 'Milk', 'quantity': '1', 'unit': 'Cup'}],
+    }).get_json()
+    store = client.post('/stores/api/stores', json={'name': 'Grocer', 'sections': [{'name': 'Baking'}]}).get_json()
+    section = client.get('/stores/api/stores').get_json()[-1]['sections'][0]
+    assert client.post('/ingredients/api/assign_sections', json={'assignments': [
+        {'ingredient_id': ingredient['id'], 'section_id': section['id']} for ingredient in recipe['ingredients']
+    ]}).get_json()['created'] == 2
+    plan = client.post('/api/weekly_plan', json={'name': 'Week', 'meals': [
+        {'day': 'Monday', 'meal_type': 'Dinner', 'recipe_id': recipe['id']},
+        {'day': 'Tuesday', 'meal_type': 'Dinner', 'recipe_id': 1},
+    ]}).get_json()
+
+    from app import db
+    from app.models import IngredientSection, Ingredient, MealSlot, PlanGroceryItem, RecipeNutrition, Section
+    assert client.delete(f"/api/recipes/{recipe['id']}").status_code == 200
+    with app.app_context():
+        assert Ingredient.query.filter_by(recipe_id=recipe['id']).count() == 0
+        assert IngredientSection.query.filter_by(section_id=section['id']).count() == 0
+        assert db.session.get(RecipeNutrition, recipe['id']) is None
+        slots = dict(db.session.query(MealSlot.day, MealSlot.recipe_id).filter_by(weekly_plan_id=plan['id']))
+        assert slots == {'Monday': None, 'Tuesday': 1}
+    assert client.delete(f"/api/recipes/{recipe['id']}").status_code == 404
+
+    with app.app_context():
+        tuesday_id = MealSlot.query.filter_by(weekly_plan_id=plan['id'], day='Tuesday').one().id
+    client.patch(f'/api/meal_slots/{tuesday_id}', json={'servings': 2})  # Stores the plan's aggregate
+    with app.app_context():
+        assert PlanGroceryItem.query.filter_by(weekly_plan_id=plan['id']).count() > 0
+    assert client.delete(f"/stores/api/stores/{store['store_id']}").status_code == 200
+    assert client.delete(f"/api/weekly_plan/{plan['id']}").status_code == 200
+    with app.app_context():
+        assert Section.query.filter_by(store_id=store['store_id']).count() == 0
+        assert MealSlot.query.filter_by(weekly_plan_id=plan['id']).count() == 0
+        assert PlanGroceryItem.query.filter_by(weekly_plan_id=plan['id']).count() == 0
+    assert client.delete(f"/api/weekly_plan/{plan['id']}").status_code == 404
+
+
+def test_categorize_suggests_and_applies_sections(app, client):
+    recipe = client.post('/api/recipes', json={
+        'name': 'Caprese', 'cook_time': '', 'servings': '', 'instructions': '',
+        'ingredients': [{'item_name': 'Meyer Lemons', 'quantity': '2', 'unit': ''}],
+    }).get_json()
+    plan = client.post('/api/weekly_plan', json={'meals': [
+        {'day': 'Monday', 'meal_type': 'lunch', 'recipe_id': recipe['id']},
+    ]}).get_json()
+    store = client.post('/stores/api/stores', json={'name': 'Farm shop', 'sections': [{'name': 'Produce Section'}]}).get_json()
+
+    response = client.post('/grocery/api/categorize', json={
+        'weekly_plan_id': plan['id'], 'store_id': store['store_id'], 'apply': True, 'min_confidence': 0,
+    }).get_json()
+    assert [(p['item_name'], p['section']) for p in response['predictions']] == [('Meyer Lemons', 'Produce Section')]
+    assert response['applied'] == 1
+
+    categorized = client.get(f"/grocery/api/grocery_list?weekly_plan_id={plan['id']}&store_id={store['store_id']}").get_json()
+    assert categorized[0]['section'] == 'Produce Section'
+    assert [item['name'] for item in categorized[0]['items']] == ['Meyer Lemons']
+
+    for body in ({'min_confidence': 'high'}, {'min_confidence': 1.5}, {'min_confidence': None}, {'weekly_plan_id': 'x'}):
+        response = client.post('/grocery/api/categorize', json={'item_names': ['Kale'], 'apply': True, **body})
+        assert response.status_code == 400
+
+
+def test_train_categorizer_command(app, tmp_path):
+    app.config['CATEGORIZER_MODEL_PATH'] = str(tmp_path / 'categorizer.npz')
+    result = app.test_cli_runner().invoke(args=['train-categorizer'])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / 'categorizer.npz').exists()
+
+
+def test_grocery_list_merges_spellings_of_one_ingredient(client):
+    recipe = client.post('/api/recipes', json={
+        'name': 'Garlic Bread', 'cook_time': '15', 'servings': '2', 'instructions': '',
+        'ingredients': [
+            {'item_name': 'Elephant Garlic', 'quantity': '2', 'unit': 'Each'},
+            {'item_name': 'elephant garlic', 'quantity': '1', 'unit': 'Each'},
+            {'item_name': 'Elephant garlic cloves', 'quantity': '3', 'unit': 'Each'},
+        ],
+    }).get_json()
+    assert len({ingredient['canonical_id'] for ingredient in recipe['ingredients']}) == 1
+
+    meals = [{'day': 'Monday', 'meal_type': 'dinner', 'recipe_id': recipe['id']}]
+    generated = client.post('/api/generate_grocery_list', json={'meals': meals}).get_json()
+    assert generated['grocery_list'] == [{'item_name': 'Elephant Garlic', 'unit': 'Each', 'quantity': 6.0}]
+
+
+def test_food_nutrients_from_the_memory_mapped_matrix(app, client, tmp_path):
+    app.config['NUTRIENT_MATRIX_DIR'] = str(tmp_path / 'nutrients')
+    assert client.get('/ingredients/api/foods/nutrients?ids=1').status_code == 503
+
+    result = app.test_cli_runner().invoke(args=['build-nutrient-matrix'])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        from app import db
+        from app.models import Nutrient
+        expected = {}
+        for name, unit, amount in db.session.query(Nutrient.name, Nutrient.unit_name, Nutrient.amount_per_100g).filter(
+            Nutrient.food_id == 3, Nutrient.name.in_(['Protein', 'Energy'])
+        ):
+            expected.setdefault(name, {})[unit] = round(amount, 2)
+
+    data = client.get('/ingredients/api/foods/nutrients?ids=3,9999&nutrients=Protein,Energy').get_json()
+    assert data['missing'] == [9999]
+    assert data['foods']['3'] == expected and set(expected['Energy']) == {'KCAL', 'kJ'}
+    assert client.get('/ingredients/api/foods/nutrients?ids=3&nutrients=Vitamin Q').status_code == 400
+
+    # A rebuild switches every file at once and keeps only the previous build besides the new one
+    import os
+    import numpy as np
+    from app.nutrient_matrix import NutrientMatrix
+    directory = app.config['NUTRIENT_MATRIX_DIR']
+    before = NutrientMatrix.open(directory)
+    for _ in range(2):
+        assert app.test_cli_runner().invoke(args=['build-nutrient-matrix']).exit_code == 0
+    builds = [name for name in os.listdir(directory) if name.startswith('build-')]
+    assert len(builds) == 2 and sorted(os.listdir(directory)) == sorted(builds + ['CURRENT'])
+    after = NutrientMatrix.open(directory)
+    assert after.nutrients == before.nutrients and (after.values == before.values)[~np.isnan(before.values)].all()
+
+
+def test_typeahead_ranks_by_use_and_sees_new_recipes(app, client):
+    def save(name, item_names):
+        client.post('/api/recipes', json={
+            'name': name, 'cook_time': '', 'servings': '', 'instructions': '',
+            'ingredients': [{'item_name': item_name, 'quantity': '1', 'unit': 'Cup'} for item_name in item_names],
+        })
+
+    save('Zucchini Bread', ['Zzyzx Flour', 'Zzyzx Sugar'])
+    save('Zucchini Cake', ['Zzyzx Sugar'])
+    suggestions = client.get('/ingredients/api/typeahead?q=ZZY').get_json()
+    assert suggestions['ingredient'] == [{'name': 'Zzyzx Sugar', 'count': 2}, {'name': 'Zzyzx Flour', 'count': 1}]
+
+    # A new recipe is visible right away in this worker
+    save('Zucchini Muffins', ['Zzyzx Flour', 'Zzyzx Flour', 'Zzyzx Butter'])
+    names = [item['name'] for item in client.get('/ingredients/api/typeahead?q=zzyzx&limit=2').get_json()['ingredient']]
+    assert names == ['Zzyzx Flour', 'Zzyzx Sugar']
+
+    units = client.get('/ingredients/api/typeahead?q=cu&kinds=unit').get_json()
+    assert set(units) == {'unit'}
+    assert units['unit'][0]['name'] == 'Cup'
+    assert client.get('/ingredients/api/typeahead?q=a&kinds=recipes').status_code == 400
+
+
+def test_store_layouts_follow_writes_from_other_workers(app, client, count_queries):
+    app.config['STORE_LAYOUT_CHECK_SECONDS'] = 0
+    url = '/grocery/api/grocery_list?weekly_plan_id=1&store_id=1'
+    client.get(url)  # Compile the store layout
+    with count_queries() as statements:
+        client.get(url)
+    assert not any('FROM section' in statement for statement in statements)
+
+    # Another worker renames a section: it logs the change but cannot reach this worker's cache
+    with app.app_context():
+        from app import db
+        from app.models import Section
+        from app.store_layouts import record_store_changes
+        section = Section.query.filter_by(store_id=1).first()
+        section.name = 'Renamed Aisle'
+        record_store_changes()
+        db.session.commit()
+
+    assert 'Renamed Aisle' in [entry['section'] for entry in client.get(url).get_json()]
@@ -0,0 +1,85 @@
+import math
+from collections import defaultdict
+
+import pytest
+
+from app import db
+from app import similar_recipes as similar
+from app.models import Ingredient, RecipeNeighbor
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    """Score a few recipes at a time so the tests cross chunk boundaries."""
+    monkeypatch.setattr(similar, 'CHUNK_CELLS', 100)
+
+
+def _stored_scores():
+    scores = defaultdict(list)
+    for recipe_id, score in db.session.query(RecipeNeighbor.recipe_id, RecipeNeighbor.score).order_by(
+            RecipeNeighbor.recipe_id, RecipeNeighbor.rank):
+        scores[recipe_id].append(score)
+    return dict(scores)
+
+
+def _brute_force_scores(k):
+    items = defaultdict(set)
+    for recipe_id, canonical_id in db.session.query(Ingredient.recipe_id, Ingredient.canonical_id):
+        items[recipe_id].add(canonical_id)
+    scores = {}
+    for recipe_id, own in items.items():
+        found = sorted(
+            (len(own & other) / math.sqrt(len(own) * len(other)) for other_id, other in items.items()
+             if other_id != recipe_id and own & other),
+            reverse=True
+        )
+        if found:
+            scores[recipe_id] = [round(score, 4) for score in found[:k]]
+    return scores
+
+
+def test_full_refresh_matches_brute_force(app):
+    with app.app_context():
+        result = similar.refresh_similar_recipes(k=5, metric='cosine')
+        db.session.commit()
+        assert result['full'] and result['recipes'] == 40
+
+        assert _stored_scores() == _brute_force_scores(5)
+        # Nothing changed, so the next refresh recomputes nothing
+        assert similar.refresh_similar_recipes(k=5, metric='cosine')['recipes'] == 0
+
+
+def test_incremental_refresh_follows_recipe_changes(app, client):
+    with app.app_context():
+        similar.refresh_similar_recipes(k=3, metric='cosine')
+        db.session.commit()
+        first = client.get('/api/recipes/1').get_json()
+
+    # A near copy of recipe 1, an edit to recipe 2 and a deleted recipe 3
+    copy = client.post('/api/recipes', json={
+        'name': 'Copy', 'cook_time': '', 'servings': '', 'instructions': '',
+        'ingredients': [{'item_name': i['item_name'], 'quantity': '1', 'unit': 'Cup'} for i in first['ingredients']],
+    }).get_json()
+    second = client.get('/api/recipes/2').get_json()
+    client.put('/api/recipes/2', json={**second, 'ingredients': second['ingredients'][:2]})
+    client.delete('/api/recipes/3')
+
+    with app.app_context():
+        result = similar.refresh_similar_recipes(k=3, metric='cosine')
+        db.session.commit()
+        assert not result['full'] and result['recipes'] < 40
+        assert _stored_scores() == _brute_force_scores(3)
+
+    response = client.get('/api/recipes/1/similar?limit=1').get_json()
+    assert response['similar'][0]['id'] == copy['id']
+    assert response['similar'][0]['score'] == 1.0
+    assert client.get('/api/recipes/99999/similar').status_code == 404
+
+
+def test_refresh_similar_recipes_command(app):
+    runner = app.test_cli_runner()
+    assert 'Rebuilt similar recipes for 40 recipes' in runner.invoke(args=['refresh-similar-recipes']).output
+    assert 'Refreshed similar recipes for 0 recipes' in runner.invoke(args=['refresh-similar-recipes']).output
+    # A different metric rebuilds everything
+    output = runner.invoke(args=['refresh-similar-recipes', '--metric', 'jaccard']).output
+    assert output.startswith('Rebuilt')
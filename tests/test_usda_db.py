@@ -0,0 +1,43 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db
+from app.models import Food, MeasureUnit, Recipe
+from app.usda_db import USDA_BIND
+
+
+def test_usda_models_read_from_an_immutable_bind(tmp_path):
+    usda_path = tmp_path / 'usda.db'
+    with sqlite3.connect(usda_path) as connection:
+        connection.execute("CREATE TABLE food (fdc_id INTEGER PRIMARY KEY, description VARCHAR(255) NOT NULL)")
+        connection.execute("CREATE TABLE measure_unit (id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL)")
+        connection.execute("INSERT INTO food VALUES (1, 'Garlic, raw')")
+        connection.execute("INSERT INTO measure_unit VALUES (1000, 'cup')")
+    connection.close()
+
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'kitchen.db'}",
+        'USDA_DATABASE_PATH': str(usda_path),
+        'USDA_MMAP_MB': 16,
+    })
+    with app.app_context():
+        db.create_all(bind_key=None)  # The USDA file is never written
+        assert db.session.get(Food, 1).description == 'Garlic, raw'
+        assert MeasureUnit.query.filter_by(name='cup').one().id == 1000
+
+        with db.engines[USDA_BIND].connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA mmap_size").scalar() == 16 * 1024 * 1024
+
+        db.session.add(Recipe(name='Toast'))
+        db.session.commit()  # Recipe writes go to the main database
+
+        with pytest.raises(OperationalError):
+            db.session.execute(insert(Food), [{'fdc_id': 2, 'description': 'Onions, raw'}])
+        db.session.rollback()
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()